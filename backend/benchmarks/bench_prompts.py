@@ -0,0 +1,80 @@
+"""
+Micro-benchmark: per-turn prompt and greeting assembly, the old inline
+build (config read, datetime formatting, new messages list each turn) vs
+services.prompts (compiled per config version, minute-granular shared clock).
+
+Run from backend/:  python -m benchmarks.bench_prompts
+"""
+import os
+import timeit
+from datetime import datetime
+
+from benchmarks import fakes
+
+# ~6 KB, the size of a real admin system prompt
+SYSTEM_PROMPT = "You are a reservation assistant for a restaurant in Dhaka. Speak Bengali. " * 80
+
+os.environ["DATABASE_URL"] = fakes.create_database(settings={"SYSTEM_PROMPT": SYSTEM_PROMPT})
+
+import pytz
+
+from services import phrases, prompts
+from services.config import get_config_value
+from services.llm import build_messages
+
+
+def legacy_build(user_text: str, history: list) -> list:
+    """The old build_messages: everything recomputed on every turn."""
+    system_prompt = get_config_value("SYSTEM_PROMPT", "")
+    now_str = datetime.now().strftime("%A, %d-%m-%Y %I:%M %p")
+    context = f"CURRENT CONTEXT:\n- Today is: {now_str}\n- Assume the current year is {datetime.now().year} unless specified."
+    history.append({"role": "user", "content": user_text})
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "system", "content": context},
+    ]
+    return messages + list(history)
+
+
+def legacy_greeting() -> str:
+    """The old send_greeting: a new pytz zone per connection."""
+    bd_tz = pytz.timezone("Asia/Dhaka")
+    return phrases.greeting_text_for_hour(datetime.now(bd_tz).hour)
+
+
+def bench(label: str, fn, number: int):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"  {label:<48} {seconds * 1e6:9.2f} us")
+
+
+def main():
+    # Both paths read the same warm config snapshot
+    get_config_value("SYSTEM_PROMPT")
+
+    print("Per turn (history grows to 20 messages, then restarts):")
+    state = {"legacy": [], "current": []}
+
+    def legacy_turn():
+        if len(state["legacy"]) >= 20:
+            state["legacy"] = []
+        legacy_build("দুইজন, সন্ধ্যা সাতটায়", state["legacy"])
+
+    def current_turn():
+        if len(state["current"]) >= 20:
+            state["current"] = []
+        build_messages("দুইজন, সন্ধ্যা সাতটায়", state["current"])
+
+    bench("legacy build_messages", legacy_turn, 5000)
+    bench("prompts.prompt_prefix + history", current_turn, 5000)
+
+    print("Per connection (greeting):")
+    bench("legacy pytz.timezone + datetime.now", legacy_greeting, 5000)
+    bench("prompts.greeting_text", prompts.greeting_text, 5000)
+
+    prefix = [m["content"] for m in prompts.prompt_prefix()]
+    print(f"Prefix identical across turns this minute: {prefix == [m['content'] for m in prompts.prompt_prefix()]}")
+    print(f"Stats: {prompts.get_prompt_stats()}")
+
+
+if __name__ == "__main__":
+    main()
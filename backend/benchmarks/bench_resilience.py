@@ -0,0 +1,80 @@
+"""
+Micro-benchmark: services.resilience.call against a fake upstream with a
+heavy latency tail, occasional errors and an outage of the primary target.
+Compares tail latency with and without hedging/retries, and time per call
+before and after the primary's circuit opens.
+
+Run from backend/:  python -m benchmarks.bench_resilience
+"""
+import time
+import random
+import asyncio
+
+from benchmarks.fakes import Latency, FakeUpstreamError
+from services import resilience
+
+CALLS = 2000
+CONCURRENCY = 10
+# Scaled-down upstream: 40 ms median, 150 ms p95, lognormal tail beyond
+LATENCY = Latency(0.04, 0.15)
+TIMEOUT = 2.0
+
+
+def fake_call(error_rate: float = 0.0, down: bool = False):
+    async def attempt(timeout: float):
+        if down:
+            await asyncio.sleep(0.2)  # an outage: slow, then an error
+            raise FakeUpstreamError("unavailable")
+        await asyncio.sleep(LATENCY.sample())
+        if random.random() < error_rate:
+            raise FakeUpstreamError("injected upstream failure")
+        return b"ok"
+    return attempt
+
+
+async def run(label: str, alternatives, hedge: bool, retries: int, calls: int = CALLS):
+    resilience.UPSTREAM_HEDGE = hedge
+    resilience.UPSTREAM_RETRIES = retries
+    resilience._targets.clear()
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await resilience.call("tts", alternatives, TIMEOUT)
+            except resilience.UpstreamError:
+                failures += 1
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    ordered = sorted(latencies)
+    q = {p: ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000 for p in (0.5, 0.95, 0.99)}
+    hedged = sum(t.stats["hedged"] for t in resilience._targets.values())
+    print(f"  {label:<34} p50 {q[0.5]:7.1f}  p95 {q[0.95]:7.1f}  p99 {q[0.99]:7.1f} ms"
+          f"  failed {failures:4d}  hedged {hedged:4d}")
+
+
+async def main():
+    print(f"{CALLS} calls, {CONCURRENCY} at a time, upstream median {LATENCY.median * 1000:.0f} ms / "
+          f"p95 {LATENCY.p95 * 1000:.0f} ms:")
+    healthy = [("tts:primary", fake_call())]
+    await run("plain (no hedge, no retry)", healthy, hedge=False, retries=0)
+    await run("hedged at p95", healthy, hedge=True, retries=0)
+
+    print("With 5% errors:")
+    flaky = [("tts:primary", fake_call(error_rate=0.05))]
+    await run("plain (no hedge, no retry)", flaky, hedge=False, retries=0)
+    await run("hedged + 1 jittered retry", flaky, hedge=True, retries=1)
+
+    print("Primary down, fallback healthy:")
+    outage = [("tts:primary", fake_call(down=True)), ("tts:fallback", fake_call())]
+    await run("retry primary, then fail over", outage, hedge=True, retries=1, calls=200)
+    print(f"  primary circuit: {resilience._targets['tts:primary'].snapshot()['circuit']}, "
+          f"short-circuited {resilience._targets['tts:primary'].stats['short_circuited']} calls")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
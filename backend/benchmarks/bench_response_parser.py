@@ -0,0 +1,92 @@
+"""
+Micro-benchmark: incremental ResponseScanner vs the old find('{')/rfind('}')
+handling in main.py.
+
+Run from backend/:  python -m benchmarks.bench_response_parser
+"""
+import json
+import timeit
+
+from services.response_parser import ResponseScanner, ReservationState
+
+REVIEW = {"name": "রহিম উদ্দিন", "phone": "01712345678", "date": "24-10-2026", "time": "07:30 PM", "people": "4"}
+
+# Realistic assistant turns from a reservation call
+REPLIES = [
+    "জি অবশ্যই! আপনার নামটা বলবেন কি?",
+    "ধন্যবাদ রহিম সাহেব। আপনার ফোন নম্বরটা দিন, প্লিজ।",
+    "কোন তারিখে আসতে চান? আর কয়টায়?",
+    "একটু দেখে নিচ্ছি। জি, শুক্রবার সন্ধ্যা ৭টা ৩০ মিনিটে টেবিল খালি আছে। কতজন আসবেন?",
+    "[REVIEW_DETAILS] আপনার তথ্যগুলো একবার মিলিয়ে নিন। " + json.dumps(REVIEW, ensure_ascii=False) + " সব ঠিক থাকলে কনফার্ম করব?",
+]
+CONFIRM = "[CONFIRM_RESERVATION] আপনার রিজার্ভেশন কনফার্ম করা হয়েছে। ধন্যবাদ, আবার আসবেন!"
+# Typical streamed delta size in characters
+DELTA = 6
+
+
+def legacy_turn(text: str):
+    """The old per-turn handling: whole-text search once the reply is complete."""
+    if "[REVIEW_DETAILS]" in text:
+        start, end = text.find("{"), text.rfind("}")
+        if start != -1 and end > start:
+            json_str = text[start:end + 1]
+            spoken = text.replace(json_str, "").replace("[REVIEW_DETAILS]", "").replace("*", "").strip()
+            return spoken, json.loads(json_str)
+    return text, None
+
+
+def legacy_confirm(history: list):
+    """The old fallback: walk every assistant message, slicing and parsing JSON."""
+    for msg in reversed(history):
+        if msg.get("role") == "assistant":
+            content = msg.get("content", "")
+            if "{" in content and "}" in content:
+                try:
+                    start, end = content.find("{"), content.rfind("}")
+                    parsed = json.loads(content[start:end + 1])
+                    if all(k in parsed for k in ["name", "phone"]):
+                        return parsed
+                except json.JSONDecodeError:
+                    continue
+    return None
+
+
+def scanner_turn(text: str, state: ReservationState):
+    scanner = ResponseScanner()
+    for i in range(0, len(text), DELTA):
+        for kind, value in scanner.feed(text[i:i + DELTA]):
+            if kind == "json" and value:
+                state.set_review(value)
+    scanner.flush()
+
+
+def build_history(turns: int) -> list:
+    history = []
+    for i in range(turns):
+        history.append({"role": "user", "content": "হ্যাঁ, ঠিক আছে"})
+        # The review is early in the call; later turns are chit-chat
+        history.append({"role": "assistant", "content": REPLIES[4] if i == 0 else REPLIES[i % 4]})
+    return history
+
+
+def bench(label: str, fn, number: int):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5)) / number
+    print(f"  {label:<48} {seconds * 1e6:9.2f} us")
+
+
+def main():
+    print("Per reply (all 6 reply shapes):")
+    bench("legacy whole-text find/rfind", lambda: [legacy_turn(r) for r in REPLIES + [CONFIRM]], 2000)
+    state = ReservationState()
+    bench(f"ResponseScanner, streamed in {DELTA}-char deltas", lambda: [scanner_turn(r, state) for r in REPLIES + [CONFIRM]], 2000)
+
+    print("Confirmation lookup (review data missing, history rescan):")
+    state.set_review(REVIEW)
+    for turns in (10, 50, 200):
+        history = build_history(turns)
+        bench(f"legacy history rescan, {turns} turns", lambda: legacy_confirm(history), 2000)
+        bench(f"ReservationState.confirmation_data, {turns} turns", state.confirmation_data, 2000)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Local stand-ins for Google STT/TTS, OpenAI and MySQL, for load tests that
+cost nothing and need no network.
+
+The fakes sit at the lowest seams (the blocking _recognize/_synthesize
+calls and the OpenAI client), so everything above them runs for real:
+the upstream executor, the TTS cache, the response scanner, the slot index
+over a SQLite copy of the schema, the write-behind reservation writer and
+the session store.
+
+install() must run before main/services are imported, because
+DATABASE_URL is read at import time.
+"""
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import sqlite3
+import tempfile
+from types import SimpleNamespace
+
+# Audio sent by the load driver is this prefix + the utterance (UTF-8),
+# padded past main.py's 1000-byte noise filter
+FAKE_AUDIO_PREFIX = b"FAKEAUDIO:"
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS Reservation (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, "
+    "phone TEXT NOT NULL, date TEXT NOT NULL, time TEXT NOT NULL, people TEXT NOT NULL, "
+    "createdAt DATETIME DEFAULT CURRENT_TIMESTAMP, idempotencyKey TEXT UNIQUE)",
+    "CREATE INDEX IF NOT EXISTS Reservation_date_time_idx ON Reservation (date, time)",
+    "CREATE TABLE IF NOT EXISTS SystemConfig (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+    "updatedAt DATETIME DEFAULT CURRENT_TIMESTAMP)",
+]
+
+
+class Latency:
+    """
+    Log-normal latency from a median and a p95 (seconds), which is roughly
+    how hosted speech/LLM APIs behave. p95 == median gives a fixed delay.
+    """
+
+    def __init__(self, median: float, p95: float = None):
+        self.median = median
+        self.p95 = p95 if p95 is not None else median
+
+    def sample(self) -> float:
+        if self.median <= 0:
+            return 0.0
+        if self.p95 <= self.median:
+            return self.median
+        sigma = math.log(self.p95 / self.median) / 1.645
+        return random.lognormvariate(math.log(self.median), sigma)
+
+    @classmethod
+    def parse(cls, spec: str):
+        """'0.3' or '0.3:0.9' (median:p95, seconds)."""
+        median, _, p95 = spec.partition(":")
+        return cls(float(median), float(p95) if p95 else None)
+
+
+def encode_audio(utterance: str) -> bytes:
+    data = FAKE_AUDIO_PREFIX + utterance.encode()
+    return data + b"\0" * max(0, 1200 - len(data))
+
+
+class FakeUpstreamError(Exception):
+    """Injected failure (error_rate); retried like a 5xx."""
+
+
+def _maybe_fail(error_rate: float):
+    if error_rate and random.random() < error_rate:
+        raise FakeUpstreamError("injected upstream failure")
+
+
+def fake_recognize(latency: Latency, error_rate: float = 0.0):
+    def _recognize(audio_bytes: bytes, timeout: float, model: str = None) -> str:
+        time.sleep(latency.sample())  # blocking, like the gRPC call; runs in the executor
+        _maybe_fail(error_rate)
+        if not audio_bytes.startswith(FAKE_AUDIO_PREFIX):
+            return ""
+        return audio_bytes[len(FAKE_AUDIO_PREFIX):].rstrip(b"\0").decode()
+    return _recognize
+
+
+def fake_synthesize(latency: Latency, bytes_per_char: int = 400, error_rate: float = 0.0):
+    def _synthesize(text: str, timeout: float, encoding: str = "MP3", voice: str = None) -> bytes:
+        time.sleep(latency.sample())
+        _maybe_fail(error_rate)
+        # About the size of a 32 kbps MP3 of the sentence; Opus at ~16 kbps is half
+        size = len(text.encode()) * bytes_per_char // 3
+        if encoding == "OGG_OPUS":
+            return b"OggS" + b"\0" * (size // 2)
+        return b"ID3" + b"\0" * size
+    return _synthesize
+
+
+class FakeStream:
+    """AsyncStream stand-in: async iteration plus close()."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._chunks.__aiter__()
+
+    async def close(self):
+        await self._chunks.aclose()
+
+
+class FakeOpenAI:
+    """
+    Enough of AsyncOpenAI for llm.stream_ai_response: chat.completions.create
+    with stream=True, text deltas and tool calls. The reply is chosen from the
+    scripted dialogue by how many user turns the conversation has.
+    """
+
+    def __init__(self, first_token: Latency, per_delta: float, replies: list, tool_turns: set = frozenset(),
+                 error_rate: float = 0.0):
+        self.first_token = first_token
+        self.error_rate = error_rate
+        self.per_delta = per_delta
+        self.replies = replies
+        self.tool_turns = tool_turns
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def close(self):
+        pass
+
+    async def _create(self, model, messages, stream=True, tools=None, **kwargs):
+        turn = sum(1 for m in messages if m.get("role") == "user")
+        answered_tool = messages[-1].get("role") == "tool"
+        if tools and turn in self.tool_turns and not answered_tool:
+            args = json.dumps({"date": "24-10-2026", "time": "07:30 PM", "people": 4})
+            return FakeStream(self._stream([], tool_call=("call_%d" % turn, "check_availability", args)))
+        reply = self.replies[min(turn, len(self.replies)) - 1]
+        return FakeStream(self._stream([reply[i:i + 6] for i in range(0, len(reply), 6)]))
+
+    async def _stream(self, deltas: list, tool_call=None):
+        await asyncio.sleep(self.first_token.sample())
+        _maybe_fail(self.error_rate)
+        if tool_call:
+            call_id, name, args = tool_call
+            fn = SimpleNamespace(name=name, arguments=args)
+            tc = SimpleNamespace(index=0, id=call_id, function=fn)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None, tool_calls=[tc]))])
+            return
+        for delta in deltas:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta, tool_calls=None))])
+            await asyncio.sleep(self.per_delta)
+
+
+def create_database(path: str = None, settings: dict = None) -> str:
+    """SQLite file with the Reservation/SystemConfig tables (plus any settings); returns its URL."""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="voice-bench-"), "bench.db")
+    conn = sqlite3.connect(path)
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        for key, value in (settings or {}).items():
+            conn.execute("INSERT OR REPLACE INTO SystemConfig (key, value) VALUES (?, ?)", (key, value))
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+def install(stt: Latency, tts: Latency, llm_first_token: Latency, llm_per_delta: float,
+            replies: list, tool_turns: set = frozenset(), database_url: str = None, settings: dict = None,
+            error_rate: float = 0.0):
+    """
+    Points the backend at the fakes. Call before importing main.
+    error_rate is the fraction of upstream calls that fail after their latency.
+    """
+    os.environ["DATABASE_URL"] = database_url or create_database(settings=settings)
+    # Keep the on-disk TTS cache out of the working tree
+    os.environ.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="voice-bench-tts-"))
+
+    from services import stt as stt_service, tts as tts_service, llm as llm_service
+
+    stt_service._recognize = fake_recognize(stt, error_rate=error_rate)
+    tts_service._synthesize = fake_synthesize(tts, error_rate=error_rate)
+    fake_client = FakeOpenAI(llm_first_token, llm_per_delta, replies, tool_turns, error_rate=error_rate)
+    llm_service.get_client = lambda: fake_client
+    return fake_client
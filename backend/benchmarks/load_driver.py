@@ -0,0 +1,251 @@
+"""
+Load driver for /ws with local stand-ins for every paid or remote service.
+
+Starts the backend in-process on a free port (fake STT/TTS/LLM, SQLite DB),
+opens N concurrent WebSocket sessions that each replay a scripted
+reservation call, and reports throughput, time-to-first-audio, turn latency
+percentiles and event-loop lag. A loop-lag spike or a TTFA that grows with
+--sessions points at blocking work on the event loop or a concurrency cap.
+
+Run from backend/:
+    python -m benchmarks.load_driver --sessions 50 --stt 0.3:0.8 --llm 0.5:1.5
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import statistics
+
+from benchmarks import fakes
+from services import framing
+
+# One caller's side of a reservation call, and the scripted model replies.
+# Turn 2 makes the model check availability first (tool round over SQLite).
+DIALOGUE = [
+    "আমি একটা টেবিল বুক করতে চাই",
+    "শুক্রবার সন্ধ্যা সাড়ে সাতটায়, চারজন",
+    "আমার নাম রহিম, নম্বর ০১৭১২৩৪৫৬৭৮",
+    "হ্যাঁ, কনফার্ম করুন",
+]
+REPLIES = [
+    "জি অবশ্যই! কোন দিন, কয়টায় এবং কতজন আসবেন?",
+    "জি, শুক্রবার সন্ধ্যা ৭টা ৩০ মিনিটে চারজনের টেবিল খালি আছে। আপনার নাম আর ফোন নম্বরটা বলবেন?",
+    "[REVIEW_DETAILS] আপনার তথ্যগুলো একবার মিলিয়ে নিন। "
+    + json.dumps({"name": "রহিম", "phone": "01712345678", "date": "24-10-2026", "time": "07:30 PM", "people": "4"},
+                 ensure_ascii=False)
+    + " সব ঠিক থাকলে কনফার্ম করব?",
+    "[CONFIRM_RESERVATION] আপনার রিজার্ভেশন কনফার্ম করা হয়েছে। ধন্যবাদ, আবার আসবেন!",
+]
+TOOL_TURNS = {2}
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _receive_until_turn_end(ws, sent_at: float, result: dict):
+    """Reads one turn; the server's `timings` message marks its end."""
+    first_audio = None
+    while True:
+        message = await ws.recv()
+        now = time.perf_counter()
+        if isinstance(message, bytes):
+            if first_audio is None:
+                first_audio = now - sent_at
+            result["audio_bytes"] += len(message)
+            continue
+        data = json.loads(message)
+        if data["type"] == "reservation_confirmed":
+            result["saving"] = data.get("saving", False)
+        elif data["type"] == "reservation_saved":
+            result["saving"] = False
+            result["booking_id"] = data.get("booking_id")
+        elif data["type"] == "timings":
+            return first_audio, now - sent_at
+
+
+async def _receive_booking(ws, result: dict, timeout: float = 10.0):
+    """The booking id comes in `reservation_saved`, which may follow the last turn."""
+    deadline = time.perf_counter() + timeout
+    while result["saving"]:
+        message = await asyncio.wait_for(ws.recv(), max(0.0, deadline - time.perf_counter()))
+        if isinstance(message, bytes):
+            continue
+        data = json.loads(message)
+        if data["type"] == "reservation_saved":
+            result["saving"] = False
+            result["booking_id"] = data.get("booking_id")
+
+
+async def run_session(url: str, index: int, think_time: float, result_list: list, codec: str = None):
+    import websockets
+
+    result = {"turns": [], "ttfa": [], "audio_bytes": 0, "booking_id": None, "saving": False, "error": None,
+              "busy": False}
+    started = time.perf_counter()
+    query = "?timings=1" + (f"&protocol={framing.PROTOCOL_VERSION}&codec={codec}" if codec else "")
+    try:
+        async with websockets.connect(url + query, max_size=None) as ws:
+            # Session message (or `busy` when over capacity), greeting text, greeting audio
+            if json.loads(await ws.recv())["type"] == "busy":
+                result["busy"] = True
+                result_list.append(result)
+                return
+            await ws.recv()
+            while True:
+                message = await ws.recv()
+                if not codec or framing.unpack_frame(message).final:
+                    break
+            for turn, utterance in enumerate(DIALOGUE, 1):
+                await asyncio.sleep(think_time)
+                sent_at = time.perf_counter()
+                audio = fakes.encode_audio(utterance)
+                if codec:
+                    audio = framing.pack_frame("webm_opus", turn, 0, audio, final=True)
+                await ws.send(audio)
+                ttfa, turn_seconds = await _receive_until_turn_end(ws, sent_at, result)
+                result["turns"].append(turn_seconds)
+                if ttfa is not None:
+                    result["ttfa"].append(ttfa)
+            await _receive_booking(ws, result)
+    except Exception as e:
+        result["error"] = f"session {index}: {e!r}"
+    result["seconds"] = time.perf_counter() - started
+    result_list.append(result)
+
+
+async def _monitor_loop_lag(samples: list, interval: float = 0.01):
+    """How late the loop wakes a 10 ms sleeper; blocking calls show up here."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - started - interval)
+
+
+async def main(args):
+    fakes.install(
+        stt=fakes.Latency.parse(args.stt),
+        tts=fakes.Latency.parse(args.tts),
+        llm_first_token=fakes.Latency.parse(args.llm),
+        llm_per_delta=args.llm_delta,
+        replies=REPLIES,
+        tool_turns=TOOL_TURNS,
+        settings={"LLM_RESPONSE_CACHE": "true"} if args.llm_cache else None,
+        error_rate=args.error_rate,
+    )
+    import uvicorn
+    import main as backend
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(backend.app, host="127.0.0.1", port=port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    from services import warmup
+    # What /ready waits for: the load balancer would not route to this worker before it
+    while not (server.started and warmup.is_ready()):
+        await asyncio.sleep(0.05)
+
+    lag = []
+    lag_task = asyncio.create_task(_monitor_loop_lag(lag))
+    results = []
+    url = f"ws://127.0.0.1:{port}/ws"
+    started = time.perf_counter()
+    sessions = []
+    for i in range(args.sessions):
+        sessions.append(asyncio.create_task(run_session(url, i, args.think, results, args.codec)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.sessions)
+    await asyncio.gather(*sessions)
+    wall = time.perf_counter() - started
+
+    lag_task.cancel()
+    server.should_exit = True
+    await server_task
+
+    report(args, results, lag, wall)
+
+
+def report(args, results: list, lag: list, wall: float):
+    turns = [t for r in results for t in r["turns"]]
+    ttfa = [t for r in results for t in r["ttfa"]]
+    errors = [r["error"] for r in results if r["error"]]
+    booked = sum(1 for r in results if r["booking_id"])
+    busy = sum(1 for r in results if r["busy"])
+
+    def ms(values, q):
+        return f"{percentile(values, q) * 1000:8.1f}"
+
+    print(f"\nSessions: {args.sessions} concurrent, {len(DIALOGUE)} turns each "
+          f"(stt {args.stt}s, llm first token {args.llm}s, tts {args.tts}s)")
+    print(f"Wall time:        {wall:8.2f} s")
+    print(f"Turns completed:  {len(turns):8d}  ({len(turns) / wall:.1f} turns/s)")
+    print(f"Calls booked:     {booked:8d} / {len(results)}")
+    audio_bytes = sum(r["audio_bytes"] for r in results)
+    print(f"Audio received:   {audio_bytes / 1024:8.0f} KiB  ({args.codec or 'protocol 1, mp3'})")
+    print(f"Rejected (busy):  {busy:8d}")
+    print(f"Errors:           {len(errors):8d}")
+    for error in errors[:5]:
+        print(f"  {error}")
+    print(f"{'':20s}{'p50':>8s} {'p95':>8s} {'p99':>8s}   (ms)")
+    print(f"{'time to 1st audio':20s}{ms(ttfa, 0.5)} {ms(ttfa, 0.95)} {ms(ttfa, 0.99)}")
+    print(f"{'turn latency':20s}{ms(turns, 0.5)} {ms(turns, 0.95)} {ms(turns, 0.99)}")
+    print(f"{'event-loop lag':20s}{ms(lag, 0.5)} {ms(lag, 0.95)} {ms(lag, 0.99)}"
+          f"   max {max(lag, default=0) * 1000:.1f}")
+    if turns:
+        print(f"Mean turn latency {statistics.mean(turns) * 1000:.1f} ms")
+
+    if args.llm_cache:
+        from services.response_cache import get_response_cache_stats
+        cache = get_response_cache_stats()
+        print(f"LLM reply cache:  {cache['hits']} hits / {cache['hits'] + cache['misses']} lookups "
+              f"({cache['skipped_personal']} personal turns skipped)")
+
+    from services.resilience import get_upstream_call_stats
+    print("Upstream calls:")
+    for name, t in get_upstream_call_stats()["targets"].items():
+        print(f"  {name:24s} calls {t['calls']:5d}  failed {t['failures']:4d}  retries {t['retries']:4d}  "
+              f"hedged {t['hedged']:4d} (won {t['hedge_wins']})  failovers {t['failovers']:4d}  circuit {t['circuit']}")
+
+    from services.warmup import get_startup_report
+    startup = get_startup_report()
+    print(f"Startup:          import {startup['import_ms']} ms, warm-up {startup['warmup_ms']} ms {startup['steps']}")
+
+    from services.metrics import get_latency_stats
+    print("\nServer-side stages (ms):")
+    for name, stats in get_latency_stats().items():
+        print(f"  {name:24s} n={stats['count']:<6d} p50 {stats['p50_ms']:8.2f}  p95 {stats['p95_ms']:8.2f}  p99 {stats['p99_ms']:8.2f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test for the /ws voice endpoint")
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent calls")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which calls are opened")
+    parser.add_argument("--think", type=float, default=0.2, help="caller pause before each utterance (s)")
+    parser.add_argument("--stt", default="0.3:0.8", help="fake STT latency, median[:p95] seconds")
+    parser.add_argument("--tts", default="0.15:0.4", help="fake TTS latency per sentence, median[:p95]")
+    parser.add_argument("--llm", default="0.5:1.2", help="fake LLM time to first token, median[:p95]")
+    parser.add_argument("--llm-delta", type=float, default=0.02, help="fake LLM delay between deltas (s)")
+    parser.add_argument("--codec", choices=sorted(framing.TTS_ENCODINGS),
+                        help="use the framed protocol with this output codec (default: protocol 1, whole MP3s)")
+    parser.add_argument("--llm-cache", action="store_true", help="enable the LLM response cache")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake upstream calls that fail")
+    parser.add_argument("--no-tts-cache", action="store_true", help="synthesize every sentence (no memory cache)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.no_tts_cache:
+        os.environ["TTS_CACHE_MEMORY_BYTES"] = "0"
+    sys.exit(asyncio.run(main(args)))
@@ -1,24 +1,71 @@
+import time
+_import_started = time.perf_counter()
+
 import os
+import hmac
 import json
 import asyncio
 import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 
 # Load environment variables explicitly before importing services that use them
 load_dotenv()
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Header, HTTPException
+from fastapi.responses import PlainTextResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from services.stt import transcribe_audio
-from services.llm import get_ai_response
-from services.tts import synthesize_speech
+from services.stt import transcribe_audio, StreamingTranscriber
+from services.llm import stream_ai_response
+from services.tts import synthesize_speech, speculate
+from services.pipeline import OrderedSender, TurnRunner, AudioInbox, send_audio
+from services.framing import Protocol, FrameError
+from services.response_parser import ResponseScanner, REVIEW_TAG, CONFIRM_TAG
+from services import phrases, prompts
+from services.reservations import save_reservation
+from services.session_store import new_session, resume_session, save_session, delete_session
+from services.metrics import start_turn, finish_turn, current_trace, span
+from services.executor import run_blocking
+from services.vad import filter_speech, UtteranceSegmenter
+from services import warmup, admission, resilience
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Bangla AI Voice Reservation Backend")
+# Recorded utterances a session may have waiting; older ones are dropped first
+INBOUND_QUEUE_SIZE = int(os.getenv("INBOUND_QUEUE_SIZE", "2"))
+# An utterance still waiting after this many seconds is stale and skipped
+INBOUND_MAX_AGE = float(os.getenv("INBOUND_MAX_AGE", "8"))
+# Longest the VAD may take on a clip before it goes to STT unfiltered (seconds)
+VAD_TIMEOUT = float(os.getenv("VAD_TIMEOUT", "2"))
+
+# Google/OpenAI SDKs and the DB engine load on first use, so this stays small
+warmup.set_import_time(time.perf_counter() - _import_started)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info(f"Backend imported in {warmup.get_startup_report()['import_ms']} ms")
+    # Config, SDKs, clients and the TTS cache warm up without delaying startup; /ready reports when done
+    warmup_task = asyncio.create_task(warmup.warm_up())
+    # Expired resumable sessions are dropped in the background
+    from services.session_store import purge_loop
+    purge_task = asyncio.create_task(purge_loop())
+    from services.reservations import start_writer, stop_writer
+    start_writer()
+    yield
+    warmup_task.cancel()
+    purge_task.cancel()
+    # Flush bookings still queued before the engine goes away
+    await stop_writer()
+    # Close pooled Google/OpenAI clients so gRPC channels and HTTP pools shut down cleanly
+    from services.clients import close_all
+    from services.executor import shutdown_executor
+    await close_all()
+    shutdown_executor()
+
+app = FastAPI(title="Bangla AI Voice Reservation Backend", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -33,46 +80,345 @@ app.add_middleware(
 async def root():
     return {"message": "Voice Backend is Running"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 503 until warm-up has finished, so new workers get traffic only once warm."""
+    report = warmup.get_startup_report()
+    if not warmup.is_ready():
+        return JSONResponse({"status": "warming", **report}, status_code=503)
+    return {"status": "ready", **report}
+
 @app.get("/debug")
 async def debug_config():
-    from services.config import get_config_value
+    from services.config import get_config_value, get_config_cache_stats
+    from services.slots import get_slot_index_stats
+    from services.clients import get_client_stats
+    from services.executor import get_executor_stats
+    from services.tts_cache import get_tts_cache_stats
+    from services.tts import get_tts_stats
+    from services.session_store import get_session_store_stats
+    from services.reservations import get_reservation_writer_stats
+    from services.metrics import get_latency_stats
+    from services.vad import get_vad_stats
+    from services.response_cache import get_response_cache_stats
+    from services.admission import get_admission_stats
+    from services.prompts import get_prompt_stats
+    from services.resilience import get_upstream_call_stats
     openai_key = get_config_value("OPENAI_API_KEY")
     google_creds = get_config_value("GOOGLE_TTS_CREDENTIALS")
     
     return {
         "database_connection": "OK" if openai_key is not None or google_creds is not None else "UNKNOWN (Check DB logs)",
         "openai_api_key": "FOUND" if openai_key and len(openai_key) > 5 else "MISSING or EMPTY",
-        "google_tts_creds": "FOUND" if google_creds and len(google_creds) > 5 else "MISSING or EMPTY"
+        "google_tts_creds": "FOUND" if google_creds and len(google_creds) > 5 else "MISSING or EMPTY",
+        "config_cache": get_config_cache_stats(),
+        "slot_index": get_slot_index_stats(),
+        "clients": get_client_stats(),
+        "upstream_executor": get_executor_stats(),
+        "tts_cache": get_tts_cache_stats(),
+        "tts": get_tts_stats(),
+        "sessions": get_session_store_stats(),
+        "reservation_writer": get_reservation_writer_stats(),
+        "latency": get_latency_stats(),
+        "vad": get_vad_stats(),
+        "llm_response_cache": get_response_cache_stats(),
+        "admission": get_admission_stats(),
+        "prompts": get_prompt_stats(),
+        "upstream_calls": get_upstream_call_stats(),
+        "startup": warmup.get_startup_report()
     }
 
-@app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    logger.info("WebSocket connected")
-    
-    conversation_history = []
-    last_review_data = None  # Store review data for confirmation
-    
-    # Send initial greeting with time-based salutation
-    from datetime import datetime
-    import pytz
-    
-    # Use Bangladesh timezone (UTC+6) regardless of server timezone
-    bd_tz = pytz.timezone('Asia/Dhaka')
-    current_hour = datetime.now(bd_tz).hour
-    
-    # Bengali greetings based on time of day
-    if 5 <= current_hour < 12:
-        greeting = "সুপ্রভাত"  # Good morning (5 AM - 12 PM)
-    elif 12 <= current_hour < 17:
-        greeting = "শুভ অপরাহ্ন"  # Good afternoon (12 PM - 5 PM)
-    elif 17 <= current_hour < 21:
-        greeting = "শুভ সন্ধ্যা"  # Good evening (5 PM - 9 PM)
+@app.get("/metrics")
+async def metrics():
+    """Pipeline latency (p50/p95/p99 per stage) in Prometheus text format."""
+    from services.metrics import render_prometheus
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.post("/config/invalidate")
+async def invalidate_config(x_config_secret: str = Header(default="")):
+    """
+    Called by the admin UI after settings are saved so new values apply immediately.
+    Needs the shared CONFIG_INVALIDATE_SECRET in the X-Config-Secret header.
+    """
+    from services.config import invalidate_config_cache, get_config_version
+    secret = os.getenv("CONFIG_INVALIDATE_SECRET", "")
+    if not secret or not hmac.compare_digest(x_config_secret.encode(), secret.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    # The reload is a DB round-trip; keep it off the event loop
+    await asyncio.to_thread(invalidate_config_cache)
+    return {"status": "ok", "version": get_config_version()}
+
+def begin_turn(session: dict):
+    """Opens the latency trace for the session's next turn."""
+    session["turn_count"] = session.get("turn_count", 0) + 1
+    return start_turn(session["session_id"], session["turn_count"])
+
+_background_tasks = set()  # keeps detached booking writes referenced
+
+async def send_booking_result(websocket: WebSocket, data: dict, idempotency_key: str):
+    """
+    Waits for the write-behind batch holding this booking and sends its id
+    as `reservation_saved` (None means the browser saves it). Runs detached
+    from the turn so the goodbye and end_session never wait on the DB.
+    """
+    booking_id = await save_reservation(data, idempotency_key)
+    logger.info(f"Reservation {idempotency_key} stored as booking {booking_id}")
+    try:
+        await websocket.send_json({
+            "type": "reservation_saved",
+            "booking_id": booking_id,
+            "data": data,
+            "idempotency_key": idempotency_key
+        })
+    except Exception:
+        pass  # Caller already hung up; the browser saves it on close
+
+async def handle_turn(websocket: WebSocket, session: dict, transcript: str):
+    """
+    handle_transcript inside the turn's trace. Logs the per-stage timings
+    and, if the client asked for them (?timings=1), sends a `timings` message.
+    """
+    trace = current_trace() or begin_turn(session)
+    try:
+        with resilience.deadline():
+            await handle_transcript(websocket, session, transcript)
+    finally:
+        finish_turn(trace)
+        logger.info(f"Turn {trace.session_id}/{trace.turn_id} timings (ms): {trace.summary()}")
+        if session.get("send_timings"):
+            try:
+                await websocket.send_json(trace.to_message())
+            except Exception:
+                pass  # Socket already gone
+
+async def handle_transcript(websocket: WebSocket, session: dict, transcript: str):
+    """
+    Runs one conversation turn for a transcript, from either the blob or
+    the streaming recognition path.
+
+    The LLM reply is streamed and cut into sentences; each sentence's TTS
+    starts as soon as it is complete and audio goes out in order as it is
+    ready, so the caller hears sentence 1 while the rest is still generated.
+    """
+    if transcript and len(transcript.strip()) > 0:
+        logger.info(f"User: {transcript}")
+
+        # Send buffer transcript to UI
+        await websocket.send_json({
+            "type": "text",
+            "role": "user",
+            "content": transcript
+        })
+
+        # Get AI Response
+        logger.info("Calling LLM...")
+        history = session["conversation_history"]
+        reservation = history.reservation
+        protocol = session["protocol"]
+        sender = OrderedSender(websocket, protocol)
+        scanner = ResponseScanner()
+        spoken_parts = []
+        tags = []
+        review_json = []
+        spoken_before_confirm = 0
+
+        def send_review():
+            # Needs both the tag and the JSON; whichever arrives second sends it
+            if REVIEW_TAG in tags and review_json:
+                review_data = review_json.pop()
+                reservation.set_review(review_data)  # Store for confirmation
+                sender.send_json({
+                    "type": "review_details",
+                    "data": review_data
+                })
+                logger.info(f"Review Data: {review_data}")
+
+        def handle_events(events):
+            nonlocal spoken_before_confirm
+            for kind, value in events:
+                if kind == "sentence":
+                    spoken_parts.append(value)
+                    sender.speak(value)
+                elif kind == "json":
+                    if isinstance(value, dict):
+                        review_json[:] = [value]
+                        send_review()
+                elif value == REVIEW_TAG:
+                    tags.append(value)
+                    send_review()
+                elif value == CONFIRM_TAG:
+                    tags.append(value)
+                    session["confirmed"] = True  # no barge-in past this point
+                    spoken_before_confirm = len(spoken_parts)
+                    # Confirm right away; the thank-you sentences keep streaming behind it
+                    confirmation_data = reservation.confirmation_data()
+
+                    # Still no data? Log error but don't crash
+                    if confirmation_data is None:
+                        logger.error("CRITICAL: Could not find reservation data anywhere!")
+
+                    # Send confirmation trigger WITH the stored review data. The booking
+                    # is written behind the voice loop; reservation_saved follows with its id
+                    sender.send_json({
+                        "type": "reservation_confirmed",
+                        "data": confirmation_data,
+                        "saving": confirmation_data is not None,
+                        "idempotency_key": session["session_id"]
+                    })
+                    logger.info(f"Sent confirmation trigger with data: {confirmation_data}")
+                    if confirmation_data is not None:
+                        task = asyncio.create_task(send_booking_result(websocket, confirmation_data, session["session_id"]))
+                        _background_tasks.add(task)
+                        task.add_done_callback(_background_tasks.discard)
+
+                    # Send end session signal to stop the loop
+                    sender.send_json({
+                        "type": "end_session"
+                    })
+
+        turn_stats = {}
+        try:
+            async for delta in stream_ai_response(transcript, history, turn_stats):
+                handle_events(scanner.feed(delta))
+            handle_events(scanner.flush())
+
+            if turn_stats.get("cache_hit"):
+                logger.info("LLM reply served from the response cache")
+            if turn_stats.get("tool_calls"):
+                tool_seconds = sum(call["seconds"] for call in turn_stats["tool_calls"])
+                logger.info(f"Tool calls this turn: {turn_stats['tool_calls']} (total {tool_seconds * 1000:.1f} ms)")
+
+            logger.info(f"AI: {scanner.text}")
+
+            if REVIEW_TAG in tags and reservation.review is None:
+                logger.error("No JSON found in REVIEW_DETAILS response")
+
+            # Speak a default if the model only sent control output
+            if CONFIRM_TAG in tags:
+                # Default confirmation message if AI is silent after the tag
+                if len(spoken_parts) == spoken_before_confirm:
+                    spoken_parts.append(phrases.CONFIRM_DEFAULT_TEXT)
+                    sender.speak(phrases.CONFIRM_DEFAULT_TEXT, persist=True)
+            elif REVIEW_TAG in tags and not spoken_parts:
+                spoken_parts.append(phrases.REVIEW_DEFAULT_TEXT)
+                sender.speak(phrases.REVIEW_DEFAULT_TEXT, persist=True)
+
+            # Text goes out directly; it does not need to wait behind the audio
+            await websocket.send_json({
+                "type": "text",
+                "role": "ai",
+                "content": " ".join(spoken_parts)
+            })
+        except asyncio.CancelledError:
+            # Barge-in: drop this reply's queued audio and pending synthesis
+            sender.abort()
+            raise
+        finally:
+            await sender.close()
+
+        # Persist the turn so a reconnect can resume on any worker; a
+        # confirmed call is finished and can no longer be resumed
+        if CONFIRM_TAG in tags:
+            await delete_session(session)
+        else:
+            await save_session(session)
+            # While the caller talks, get the prompts the next turn may need ready
+            speculate(phrases.likely_next(reservation.review is not None), encoding=protocol.tts_encoding)
+
     else:
-        greeting = "শুভ রাত্রি"  # Good night (9 PM - 5 AM)
-    
-    greeting_text = f"{greeting}! আমি আপনার রিজার্ভেশন অ্যাসিস্ট্যান্ট। আমি আপনাকে কীভাবে সাহায্য করতে পারি?"
-    greeting_audio = await synthesize_speech(greeting_text)
+        # Transcription failed or empty - ask user to repeat
+        logger.warning("Empty or failed transcription, asking user to repeat")
+        retry_text = phrases.RETRY_TEXT
+        # TTS for retry prompt, synthesized while the text goes out
+        protocol = session["protocol"]
+        retry_task = asyncio.create_task(synthesize_speech(retry_text, persist=True, encoding=protocol.tts_encoding))
+
+        await websocket.send_json({
+            "type": "text",
+            "role": "ai",
+            "content": retry_text
+        })
+
+        retry_audio = await retry_task
+        if retry_audio:
+            await send_audio(websocket, protocol, retry_audio)
+
+async def handle_audio(websocket: WebSocket, session: dict, audio_data: bytes, transcribed: asyncio.Event):
+    """A blob-mode turn: STT, then the reply. Sets `transcribed` once STT is done."""
+    # The turn's trace starts here so it includes STT
+    begin_turn(session)
+    # One deadline for the whole turn, STT included
+    with resilience.deadline():
+        try:
+            transcript = await transcribe_audio(audio_data)
+        finally:
+            transcribed.set()
+        logger.info(f"Transcription result: '{transcript}'")
+        await handle_turn(websocket, session, transcript)
+
+async def barge_in(websocket: WebSocket, session: dict, turns: TurnRunner):
+    """
+    A new utterance supersedes the reply in progress: cancel its LLM/TTS
+    work and tell the client to stop playing what it already has.
+    """
+    if await turns.cancel():
+        logger.info("Barge-in: cancelled the reply in progress")
+        await websocket.send_json({"type": "stop_audio"})
+
+async def process_inbox(websocket: WebSocket, session: dict, inbox: AudioInbox, turns: TurnRunner):
+    """
+    Turns queued recordings into turns, one STT call per session at a time:
+    the next utterance is taken once the current one is transcribed.
+    """
+    while True:
+        audio_data = await inbox.get()
+
+        # Drop silence/noise before paying for STT; trim the rest to the speech.
+        # Decoding a clip is CPU work, so it runs off the event loop.
+        with span("vad"):
+            try:
+                audio_data, vad_info = await run_blocking("vad", filter_speech, audio_data, timeout=VAD_TIMEOUT)
+            except asyncio.TimeoutError:
+                vad_info = {"kept_ms": None}  # Let STT decide
+        if audio_data is None:
+            logger.info(f"No speech in audio chunk ({vad_info}), skipping STT")
+            await websocket.send_json({"type": "no_speech"})
+            continue
+        if vad_info["kept_ms"] is not None:
+            logger.info(f"VAD: {vad_info}")
+        if session.get("confirmed"):
+            continue  # Call is over; the confirmation must not be cut off
+
+        await barge_in(websocket, session, turns)
+        transcribed = asyncio.Event()
+        task = turns.start(handle_audio(websocket, session, audio_data, transcribed))
+        # A turn cancelled before it reaches STT never sets the event itself
+        task.add_done_callback(lambda _: transcribed.set())
+        await transcribed.wait()
+
+async def handle_stream(websocket: WebSocket, session: dict, stream):
+    """
+    Relays interim results as partial_transcript messages and starts the
+    turn as soon as Google reports the end of the utterance.
+    """
+    transcript = ""
+    async for kind, text in stream.events():
+        if kind == "partial":
+            await websocket.send_json({
+                "type": "partial_transcript",
+                "content": text
+            })
+        else:
+            transcript = text
+    logger.info(f"Transcription result (stream): '{transcript}'")
+    await handle_turn(websocket, session, transcript)
+
+async def send_greeting(websocket: WebSocket, protocol: Protocol):
+    """Opens a new call with the time-based salutation."""
+    # Bangladesh time regardless of server timezone; shared, minute-granular clock
+    greeting_text = prompts.greeting_text()
+    # Synthesize while the text goes out
+    greeting_task = asyncio.create_task(synthesize_speech(greeting_text, persist=True, encoding=protocol.tts_encoding))
     
     await websocket.send_json({
         "type": "text",
@@ -80,209 +426,143 @@ async def websocket_endpoint(websocket: WebSocket):
         "content": greeting_text
     })
     
+    greeting_audio = await greeting_task
     if greeting_audio:
          # Send audio as bytes
-        await websocket.send_bytes(greeting_audio)
+        await send_audio(websocket, protocol, greeting_audio)
+
+@app.websocket("/ws")
+async def websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    logger.info("WebSocket connected")
+
+    # Over capacity: tell the caller when to try again instead of degrading every call
+    if not admission.try_admit():
+        logger.warning("Session limit reached, rejecting call")
+        await websocket.send_json(admission.busy_message("sessions"))
+        await websocket.close(code=1013)  # Try Again Later
+        return
+    try:
+        await serve_call(websocket)
+    finally:
+        admission.release()
+
+async def serve_call(websocket: WebSocket):
+    """One admitted call, from greeting to hang-up."""
+    # A reconnecting client passes ?resume=<token> to continue its call
+    session = None
+    resume_token = websocket.query_params.get("resume")
+    if resume_token:
+        session = await resume_session(resume_token)
+        if session is None:
+            logger.info("Resume token unknown or expired, starting a new session")
+    resumed = session is not None
+    if not resumed:
+        session = new_session()
+    logger.info(f"Session {session['session_id']} ({'resumed' if resumed else 'new'})")
+    # Per-turn timings for the client are opt-in
+    session["send_timings"] = websocket.query_params.get("timings") == "1"
+    # Binary framing and output codec (?protocol=2&codec=ogg_opus); plain bytes otherwise
+    protocol = session["protocol"] = Protocol.negotiate(websocket.query_params)
+
+    await websocket.send_json({
+        "type": "session",
+        "session_id": session["session_id"],
+        "resume_token": session["resume_token"],
+        "resumed": resumed,
+        **protocol.describe()
+    })
+
+    if not resumed:
+        await send_greeting(websocket, protocol)
+    speculate(phrases.likely_next(session["conversation_history"].reservation.review is not None),
+              encoding=protocol.tts_encoding)
+
+    # Streaming recognition state: set between "stream_start" and "stream_end"
+    stream = None
+    segmenter = None
+    # The turn in progress runs as a task so the next utterance can interrupt it
+    turns = TurnRunner()
+    # Recordings wait here (bounded) while the previous one is being transcribed
+    inbox = AudioInbox(INBOUND_QUEUE_SIZE, INBOUND_MAX_AGE)
+    inbox_task = asyncio.create_task(process_inbox(websocket, session, inbox, turns))
 
     try:
         while True:
             message = await websocket.receive()
-            
-            if "bytes" in message:
-                audio_data = message["bytes"]
+
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    logger.warning("Ignoring non-JSON text frame")
+                    continue
+
+                if control.get("type") == "stream_start":
+                    if session.get("confirmed"):
+                        continue  # Call is over; the confirmation must not be cut off
+                    # Streaming mode: audio chunks that follow go straight to Google
+                    if stream is not None:
+                        stream.finish()
+                    await barge_in(websocket, session, turns)
+                    stream = StreamingTranscriber().start()
+                    # Local endpointing: close the stream as soon as the caller stops talking
+                    segmenter = UtteranceSegmenter()
+                    turns.start(handle_stream(websocket, session, stream))
+                    logger.info("Streaming recognition started")
+                elif control.get("type") == "stream_end":
+                    if stream is not None:
+                        stream.finish()
+                        stream = None
+                continue
+
+            if message.get("bytes"):
+                try:
+                    audio_data, final = protocol.read_audio(message["bytes"])
+                except FrameError as e:
+                    logger.warning(f"Ignoring bad audio frame: {e}")
+                    continue
+                if audio_data is None:
+                    continue  # Repeated or out-of-order chunk
+
+                if stream is not None:
+                    stream.feed(audio_data)
+                    try:
+                        vad_events = await run_blocking("vad", segmenter.feed, audio_data, timeout=VAD_TIMEOUT)
+                    except asyncio.TimeoutError:
+                        segmenter.ended = True  # Leave endpointing to STT
+                        vad_events = []
+                    if "speech_end" in vad_events:
+                        # Later chunks until stream_end are dropped by the closed stream
+                        logger.info("End of utterance detected, closing recognition stream")
+                        stream.finish()
+                    elif final and protocol.version > 1:
+                        stream.finish()  # The client's final frame ends the utterance
+                    continue
+
+                # Blob mode: chunked uploads are reassembled first
+                try:
+                    audio_data = protocol.collect(audio_data, final)
+                except FrameError as e:
+                    logger.warning(f"Dropping oversized recording: {e}")
+                    continue
+                if audio_data is None:
+                    continue
+
+                # Blob mode (fallback): one complete recording per message
                 logger.info(f"Received audio chunk: {len(audio_data)} bytes")
                 
                 # Check if audio is too small (likely noise or incomplete)
                 if len(audio_data) < 1000:
                     logger.warning(f"Audio chunk too small ({len(audio_data)} bytes), skipping")
                     continue
-                
-                transcript = await transcribe_audio(audio_data)
-                logger.info(f"Transcription result: '{transcript}'")
-                
-                if transcript and len(transcript.strip()) > 0:
-                    logger.info(f"User: {transcript}")
-                    
-                    # Send buffer transcript to UI
-                    await websocket.send_json({
-                        "type": "text",
-                        "role": "user",
-                        "content": transcript
-                    })
-                    
-                    # Get AI Response
-                    logger.info("Calling LLM...")
-                    intermediate_text, ai_response_text, updated_history = await get_ai_response(transcript, conversation_history)
-                    logger.info(f"LLM response received: {ai_response_text[:100]}...")
-                    conversation_history = updated_history
-                    
-                    # 1. Handle Intermediate "Checking" Message (if any)
-                    # Skip TTS if the final response has special tags (to prevent double-speak)
-                    has_special_tags = "[REVIEW_DETAILS]" in ai_response_text or "[CONFIRM_RESERVATION]" in ai_response_text
-                    
-                    if intermediate_text:
-                        logger.info(f"Intermediate AI: {intermediate_text}")
-                        # Send text (always)
-                        await websocket.send_json({
-                            "type": "text",
-                            "role": "ai",
-                            "content": intermediate_text
-                        })
-                        # TTS for intermediate part ONLY if no special tags follow
-                        if not has_special_tags:
-                            audio_partial = await synthesize_speech(intermediate_text)
-                            if audio_partial:
-                                await websocket.send_bytes(audio_partial)
-
-                    # 2. Handle Final Response
-                    logger.info(f"AI: {ai_response_text}")
-
-                    # Track if we handled the response via special tags
-                    handled = False
-
-                    # Check for REVIEW_DETAILS (Before confirmation)
-                    if "[REVIEW_DETAILS]" in ai_response_text:
-                        handled = True
-                        # Robust "Extract & Subtract" Strategy
-                        # 1. capture JSON
-                        json_str = ""
-                        start_idx = ai_response_text.find('{')
-                        end_idx = ai_response_text.rfind('}')
-                        
-                        if start_idx != -1 and end_idx != -1 and end_idx > start_idx:
-                            json_str = ai_response_text[start_idx : end_idx + 1]
-                        
-                        # 2. construct spoken text by removing JSON and Tag
-                        spoken_text = ai_response_text
-                        if json_str:
-                            spoken_text = spoken_text.replace(json_str, "")
-                        
-                        spoken_text = spoken_text.replace("[REVIEW_DETAILS]", "")
-                        spoken_text = spoken_text.replace("*", "") # Remove markdown bolds
-                        spoken_text = spoken_text.strip()
-
-                        if not spoken_text:
-                            spoken_text = "Here are the details. Shall I confirm?" # Default fallback
-
-                        # Send text
-                        await websocket.send_json({
-                            "type": "text",
-                            "role": "ai",
-                            "content": spoken_text
-                        })
-                        
-                        # TTS for spoken part
-                        audio_response = await synthesize_speech(spoken_text)
-                        if audio_response:
-                            await websocket.send_bytes(audio_response)
-                        
-                        # Parse JSON and send event
-                        if json_str:
-                            try:
-                                review_data = json.loads(json_str)
-                                last_review_data = review_data  # Store for confirmation
-                                await websocket.send_json({
-                                    "type": "review_details",
-                                    "data": review_data
-                                })
-                                logger.info(f"Review Data: {review_data}")
-                            except json.JSONDecodeError:
-                                logger.error(f"Failed to parse review JSON: {json_str[:20]}...")
-                        else:
-                             logger.error("No JSON found in REVIEW_DETAILS response")
-                             # Attempt fallback: Look for ANY json in the history if not found here?
-                             # For now, just log. The modal won't show, but text will speak.
-
-                    # Check for CONFIRM_RESERVATION (Final)
-                    if "[CONFIRM_RESERVATION]" in ai_response_text:
-                        handled = True
-                        parts = ai_response_text.split("[CONFIRM_RESERVATION]")
-                        # Get text AFTER the tag (AI puts thank you message after)
-                        spoken_text = parts[1].strip() if len(parts) > 1 else ""
-                        
-                        # Default confirmation message if AI is silent
-                        if not spoken_text:
-                            spoken_text = "রিজার্ভেশন কনফার্ম করা হয়েছে। ধন্যবাদ।"
-
-                        # FALLBACK: If we don't have review data, try to extract from history
-                        if last_review_data is None:
-                            logger.warning("last_review_data is None, attempting extraction from history...")
-                            # Search ALL AI messages for JSON with reservation fields
-                            for msg in reversed(conversation_history):
-                                if isinstance(msg, dict) and msg.get('role') == 'assistant':
-                                    content = msg.get('content', '')
-                                    if '{' in content and '}' in content:
-                                        try:
-                                            start = content.find('{')
-                                            end = content.rfind('}')
-                                            if start != -1 and end > start:
-                                                json_str = content[start:end+1]
-                                                parsed = json.loads(json_str)
-                                                # Check if it has required reservation fields
-                                                if all(k in parsed for k in ['name', 'phone']):
-                                                    last_review_data = parsed
-                                                    logger.info(f"Recovered review data from history: {last_review_data}")
-                                                    break
-                                        except json.JSONDecodeError:
-                                            continue
-                        
-                        # Still no data? Log error but don't crash
-                        if last_review_data is None:
-                            logger.error("CRITICAL: Could not find reservation data anywhere!")
-
-                        # Send text message
-                        await websocket.send_json({
-                            "type": "text",
-                            "role": "ai",
-                            "content": spoken_text
-                        })
-                        
-                        # Send confirmation trigger WITH the stored review data
-                        await websocket.send_json({
-                            "type": "reservation_confirmed",
-                            "data": last_review_data
-                        })
-                        logger.info(f"Sent confirmation trigger with data: {last_review_data}")
-                        
-                        # Send end session signal to stop the loop
-                        await websocket.send_json({
-                            "type": "end_session"
-                        })
-                        
-                        # TTS for confirmation (plays last)
-                        audio_response = await synthesize_speech(spoken_text)
-                        if audio_response:
-                            await websocket.send_bytes(audio_response)
-                            
-                    # Normal response (Only if not handled by special tags)
-                    if not handled:
-                        await websocket.send_json({
-                            "type": "text",
-                            "role": "ai",
-                            "content": ai_response_text
-                        })
-                        
-                        # TTS
-                        audio_response = await synthesize_speech(ai_response_text)
-                        if audio_response:
-                            await websocket.send_bytes(audio_response)
-                
-                else:
-                    # Transcription failed or empty - ask user to repeat
-                    logger.warning("Empty or failed transcription, asking user to repeat")
-                    retry_text = "দুঃখিত, আমি বুঝতে পারিনি। অনুগ্রহ করে আবার বলুন।"
-                    
-                    await websocket.send_json({
-                        "type": "text",
-                        "role": "ai",
-                        "content": retry_text
-                    })
-                    
-                    # TTS for retry prompt
-                    retry_audio = await synthesize_speech(retry_text)
-                    if retry_audio:
-                        await websocket.send_bytes(retry_audio)
-                        
+
+                if not inbox.put(audio_data):
+                    logger.warning("Inbound audio queue full, dropped the oldest utterance")
+
     except WebSocketDisconnect:
         logger.info("Client disconnected")
     except Exception as e:
@@ -291,3 +571,8 @@ async def websocket_endpoint(websocket: WebSocket):
             await websocket.close()
         except:
             pass  # Already closed
+    finally:
+        if stream is not None:
+            stream.finish()
+        inbox_task.cancel()
+        await turns.cancel()
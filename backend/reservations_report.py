@@ -0,0 +1,108 @@
+"""
+Reservation analytics and export.
+
+Streams the Reservation table in batches (server-side cursor) and prints
+bookings per slot, average party size, peak hours and repeat same-day bookings.
+Optionally writes the rows to CSV or Parquet as they stream. Every run
+records a createdAt watermark; --incremental only reads rows added since.
+
+Run from backend/:
+    python reservations_report.py
+    python reservations_report.py --export reservations.parquet
+    python reservations_report.py --incremental --export new.csv --json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from services import analytics
+
+DEFAULT_STATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".report_watermark.json")
+
+
+def run(args) -> dict:
+    since = analytics.load_watermark(args.state) if args.incremental else None
+    stats = analytics.ReservationStats()
+    export = analytics.open_export(args.export, args.format) if args.export else None
+    started = time.perf_counter()
+    try:
+        for batch in analytics.stream_reservations(since, args.batch_size):
+            stats.add_batch(batch)
+            if export is not None:
+                export.write_batch(batch)
+    finally:
+        if export is not None:
+            export.close()
+
+    report = stats.summary(args.top)
+    report["repeat_same_day_bookings"] = analytics.duplicate_bookings(since, args.top)
+    report["since"] = since
+    report["seconds"] = round(time.perf_counter() - started, 3)
+
+    # The next --incremental run starts after the last row read here
+    watermark = stats.watermark or since
+    if watermark:
+        analytics.save_watermark(args.state, watermark)
+    report["watermark"] = watermark
+    return report
+
+
+def print_report(report: dict, args):
+    scope = f"since {report['since']['createdAt']}" if report["since"] else "all time"
+    print(f"Reservations ({scope}): {report['reservations']}  in {report['seconds']} s")
+    print(f"Average party size: {report['average_party_size']}  ({report['guests']} guests)")
+    if report["unparsed_times"]:
+        print(f"Rows with an unreadable time: {report['unparsed_times']}")
+
+    print("\nBusiest slots:")
+    for slot in report["busiest_slots"]:
+        print(f"  {slot['date']} {slot['time']}  {slot['bookings']:4d} bookings  {slot['guests']:4d} guests")
+    print("\nPeak booked hours:")
+    for row in report["peak_booked_hours"]:
+        print(f"  {row['hour']:02d}:00  {row['bookings']:5d}")
+    print("\nPeak hours for calls (when bookings were made):")
+    for row in report["peak_call_hours"]:
+        print(f"  {row['hour']:02d}:00  {row['bookings']:5d}")
+    print("\nRepeat same-day bookings (same phone, several bookings on one date):")
+    for row in report["repeat_same_day_bookings"] or []:
+        print(f"  {row['phone']}  {row['date']}  {row['bookings']} bookings (ids {row['first_id']}..{row['last_id']})")
+    if not report["repeat_same_day_bookings"]:
+        print("  none")
+    if args.export:
+        print(f"\nExported to {args.export}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Reservation analytics and export")
+    parser.add_argument("--export", metavar="PATH", help="write the rows read to a .csv or .parquet file")
+    parser.add_argument("--format", choices=("csv", "parquet"), help="export format (default: from the file extension)")
+    parser.add_argument("--incremental", action="store_true", help="only rows created since the last run's watermark")
+    parser.add_argument("--state", default=DEFAULT_STATE, help="watermark file (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=analytics.REPORT_BATCH_SIZE, help="rows per fetch")
+    parser.add_argument("--top", type=int, default=10, help="entries per ranking")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    try:
+        report = run(args)
+    except RuntimeError as e:
+        print(f"Report Error: {e}")
+        return 1
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
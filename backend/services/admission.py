@@ -0,0 +1,151 @@
+import os
+import time
+import random
+import asyncio
+
+# Admission control for /ws and the upstream APIs behind it.
+# Under a burst of callers the excess is told to come back later (a `busy`
+# message) and upstream calls wait in a bounded queue, instead of every
+# call in progress slowing down together.
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "100"))
+# Retry hint sent with `busy`, in seconds (jittered so rejected callers spread out)
+BUSY_RETRY_AFTER = float(os.getenv("BUSY_RETRY_AFTER", "5"))
+# Longest an upstream call waits for a concurrency slot or a rate-limit token
+UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "5"))
+
+# Per provider: max calls in flight, and a token bucket (requests/second,
+# burst). A rate of 0 means no rate limit.
+PROVIDER_DEFAULTS = {
+    "stt": {"concurrency": 16, "rate": 0, "burst": 10},
+    "tts": {"concurrency": 16, "rate": 0, "burst": 20},
+    "llm": {"concurrency": 32, "rate": 0, "burst": 20},
+}
+
+
+class UpstreamBusy(Exception):
+    """No slot or token became available within UPSTREAM_MAX_WAIT."""
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, deadline: float) -> float:
+        """Takes one token, sleeping until one accrues; returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        started = time.monotonic()
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return now - started
+            wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                raise UpstreamBusy("rate limit")
+            await asyncio.sleep(wait)
+
+
+class ProviderLimit:
+    """
+    `async with upstream("tts"): ...` holds one of the provider's
+    concurrency slots (after taking a rate-limit token) for the call.
+    """
+
+    def __init__(self, name: str, concurrency: int, rate: float, burst: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.stats = {"calls": 0, "in_flight": 0, "waiting": 0, "max_in_flight": 0,
+                      "throttled": 0, "rejected": 0, "wait_seconds": 0.0}
+
+    async def __aenter__(self):
+        deadline = time.monotonic() + UPSTREAM_MAX_WAIT
+        self.stats["waiting"] += 1
+        started = time.monotonic()
+        try:
+            if await self.bucket.acquire(deadline) > 0:
+                self.stats["throttled"] += 1
+            await asyncio.wait_for(self._semaphore.acquire(), max(0.0, deadline - time.monotonic()))
+        except (UpstreamBusy, asyncio.TimeoutError):
+            self.stats["rejected"] += 1
+            raise UpstreamBusy(f"{self.name}: no capacity within {UPSTREAM_MAX_WAIT}s")
+        finally:
+            self.stats["waiting"] -= 1
+            self.stats["wait_seconds"] += time.monotonic() - started
+        self.stats["calls"] += 1
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        return self
+
+    async def __aexit__(self, *exc):
+        self.stats["in_flight"] -= 1
+        self._semaphore.release()
+        return False
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "max_concurrency": self.concurrency,
+            "rate_per_second": self.bucket.rate,
+            "burst": self.bucket.burst,
+        }
+
+
+def _provider(name: str, defaults: dict) -> ProviderLimit:
+    prefix = name.upper()
+    return ProviderLimit(
+        name,
+        int(os.getenv(f"{prefix}_MAX_CONCURRENCY", str(defaults["concurrency"]))),
+        float(os.getenv(f"{prefix}_RATE_LIMIT", str(defaults["rate"]))),
+        int(os.getenv(f"{prefix}_RATE_BURST", str(defaults["burst"]))),
+    )
+
+
+_providers = {name: _provider(name, defaults) for name, defaults in PROVIDER_DEFAULTS.items()}
+_sessions = {"active": 0, "max_active": 0, "admitted": 0, "rejected": 0}
+
+
+def upstream(name: str) -> ProviderLimit:
+    return _providers[name]
+
+
+def try_admit() -> bool:
+    """Claims a session slot; False when MAX_SESSIONS calls are already running."""
+    if _sessions["active"] >= MAX_SESSIONS:
+        _sessions["rejected"] += 1
+        return False
+    _sessions["active"] += 1
+    _sessions["admitted"] += 1
+    _sessions["max_active"] = max(_sessions["max_active"], _sessions["active"])
+    return True
+
+
+def release():
+    _sessions["active"] -= 1
+
+
+def busy_message(reason: str) -> dict:
+    return {
+        "type": "busy",
+        "reason": reason,
+        "retry_after": round(BUSY_RETRY_AFTER * random.uniform(0.8, 1.5), 1),
+    }
+
+
+def get_admission_stats() -> dict:
+    return {
+        "sessions": {**_sessions, "max_sessions": MAX_SESSIONS},
+        "upstream_max_wait": UPSTREAM_MAX_WAIT,
+        "providers": {name: p.snapshot() for name, p in _providers.items()},
+    }
@@ -0,0 +1,204 @@
+import os
+import csv
+import json
+from collections import Counter
+
+from services.config import get_engine, sqlalchemy
+from services.db import normalize_date, parse_time_minutes, format_time_minutes
+from services.slots import parse_people
+
+# Reporting over the Reservation table. Rows are read through a server-side
+# cursor in fixed-size batches and folded into running aggregates batch by
+# batch, so memory stays flat however many bookings there are.
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "5000"))
+
+COLUMNS = ("id", "name", "phone", "date", "time", "people", "createdAt")
+
+
+def stream_reservations(since: dict = None, batch_size: int = REPORT_BATCH_SIZE):
+    """
+    Yields lists of row tuples (COLUMNS order), oldest first by (createdAt, id).
+    With `since` ({"createdAt", "id"} from a previous run) only newer rows are read.
+    """
+    engine = get_engine()
+    if engine is None:
+        raise RuntimeError("No database engine")
+    query = f"SELECT {', '.join(COLUMNS)} FROM Reservation"
+    params = {}
+    if since:
+        query += " WHERE createdAt > :created OR (createdAt = :created AND id > :id)"
+        params = {"created": since["createdAt"], "id": since["id"]}
+    query += " ORDER BY createdAt, id"
+
+    with engine.connect() as conn:
+        # stream_results: a server-side cursor (SSCursor on MySQL), not fetchall()
+        result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+            sqlalchemy.text(query), params
+        )
+        for batch in result.partitions(batch_size):
+            yield [tuple(row) for row in batch]
+
+
+def duplicate_bookings(since: dict = None, limit: int = 50) -> list:
+    """
+    Repeat same-day bookings: one phone holding several bookings for the
+    same date (double bookings, or one call per party). Grouped in the
+    database.
+    """
+    engine = get_engine()
+    if engine is None:
+        raise RuntimeError("No database engine")
+    having = "COUNT(*) > 1"
+    params = {"limit": limit}
+    if since:
+        # Only groups that gained a booking since the last run
+        having += " AND MAX(createdAt) > :created"
+        params["created"] = since["createdAt"]
+    with engine.connect() as conn:
+        rows = conn.execute(sqlalchemy.text(
+            "SELECT phone, date, COUNT(*) AS bookings, MIN(id), MAX(id) FROM Reservation "
+            f"GROUP BY phone, date HAVING {having} ORDER BY bookings DESC, MAX(id) DESC LIMIT :limit"
+        ), params).fetchall()
+    return [
+        {"phone": _mask_phone(r[0]), "date": r[1], "bookings": r[2], "first_id": r[3], "last_id": r[4]}
+        for r in rows
+    ]
+
+
+def _mask_phone(phone: str) -> str:
+    phone = phone or ""
+    return "*" * max(0, len(phone) - 3) + phone[-3:]
+
+
+def _slot_label(minutes):
+    return format_time_minutes(minutes) if minutes is not None else None
+
+
+def _mapped(fn, values, memo: dict) -> list:
+    """fn over a column, evaluated once per distinct value (slots and sizes repeat a lot)."""
+    missing = set(values).difference(memo)
+    for value in missing:
+        memo[value] = fn(value)
+    return list(map(memo.__getitem__, values))
+
+
+class ReservationStats:
+    """Running aggregates; add_batch() takes one batch of rows at a time."""
+
+    def __init__(self):
+        self.rows = 0
+        self.by_slot = Counter()          # (date, "hh:mm AM") -> bookings
+        self.covers_by_slot = Counter()   # (date, "hh:mm AM") -> guests
+        self.by_hour = Counter()          # booked hour of day -> bookings
+        self.calls_by_hour = Counter()    # hour the booking was made -> bookings
+        self.party_sum = 0
+        self.party_count = 0
+        self.unparsed = 0
+        self.watermark = None             # {"createdAt", "id"} of the last row seen
+        self._dates = {}   # memo: stored value -> parsed value
+        self._times = {}
+        self._sizes = {}
+        self._labels = {}
+
+    def add_batch(self, rows: list):
+        if not rows:
+            return
+        ids, _, _, dates, times, people, created = zip(*rows)
+        self.rows += len(rows)
+
+        dates = _mapped(normalize_date, dates, self._dates)
+        minutes = _mapped(parse_time_minutes, times, self._times)
+        # Same reading of "people" as the capacity check ("4 জন" -> 4)
+        sizes = _mapped(parse_people, people, self._sizes)
+
+        labels = _mapped(_slot_label, minutes, self._labels)
+        slots = [(d, t) if t is not None else None for d, t in zip(dates, labels)]
+        self.unparsed += slots.count(None)
+        self.by_slot.update(slot for slot in slots if slot is not None)
+        self.by_hour.update(m // 60 for m in minutes if m is not None)
+        self.calls_by_hour.update(_hour(c) for c in created if c is not None)
+
+        for slot, size in zip(slots, sizes):
+            if slot is not None:
+                self.covers_by_slot[slot] += size
+        self.party_sum += sum(sizes)
+        self.party_count += len(sizes)
+
+        self.watermark = {"createdAt": str(created[-1]), "id": ids[-1]}
+
+    def summary(self, top: int = 10) -> dict:
+        return {
+            "reservations": self.rows,
+            "average_party_size": round(self.party_sum / self.party_count, 2) if self.party_count else None,
+            "guests": self.party_sum,
+            "busiest_slots": [
+                {"date": d, "time": t, "bookings": n, "guests": self.covers_by_slot[(d, t)]}
+                for (d, t), n in self.by_slot.most_common(top)
+            ],
+            "peak_booked_hours": [{"hour": h, "bookings": n} for h, n in self.by_hour.most_common(top)],
+            "peak_call_hours": [{"hour": h, "bookings": n} for h, n in self.calls_by_hour.most_common(top)],
+            "unparsed_times": self.unparsed,
+        }
+
+
+def _hour(created) -> int:
+    # datetime from MySQL, "YYYY-MM-DD HH:MM:SS" text from SQLite
+    return created.hour if hasattr(created, "hour") else int(str(created)[11:13])
+
+
+class CsvExport:
+    def __init__(self, path: str):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write_batch(self, rows: list):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExport:
+    """One row group per batch. Needs pyarrow (pip install pyarrow)."""
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._schema = pa.schema([
+            ("id", pa.int64()), ("name", pa.string()), ("phone", pa.string()), ("date", pa.string()),
+            ("time", pa.string()), ("people", pa.string()), ("createdAt", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write_batch(self, rows: list):
+        columns = [list(c) for c in zip(*rows)]
+        columns[-1] = [str(c) if c is not None else None for c in columns[-1]]
+        self._writer.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def open_export(path: str, fmt: str = None):
+    fmt = fmt or ("parquet" if path.endswith(".parquet") else "csv")
+    return ParquetExport(path) if fmt == "parquet" else CsvExport(path)
+
+
+def load_watermark(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_watermark(path: str, watermark: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(watermark, f)
+    os.replace(tmp, path)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import inspect
+import threading
+
+# Shared, long-lived upstream clients (Google STT/TTS, OpenAI).
+# Each kind holds exactly one live client, keyed by a fingerprint of the
+# credentials it was built with. A client is only rebuilt when the
+# fingerprint changes, so gRPC channels and HTTP connection pools are
+# reused across every WebSocket session.
+
+_lock = threading.Lock()
+_clients = {}   # kind -> (fingerprint, client)
+_retired = []   # replaced clients, closed on shutdown so in-flight calls can finish
+_stats = {"builds": 0, "reuses": 0, "rebuilds": 0, "build_errors": 0}
+
+
+def fingerprint(*parts) -> str:
+    """Stable digest of credential material; never store the raw secret as a key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()[:16]
+
+
+def get_or_create(kind: str, key: str, factory):
+    """
+    Returns the cached client for `kind` if it was built with the same `key`,
+    otherwise builds a new one with `factory()` and retires the old one.
+    Returns None (and caches nothing) if the factory fails.
+    """
+    entry = _clients.get(kind)
+    if entry and entry[0] == key:
+        _stats["reuses"] += 1
+        return entry[1]
+
+    with _lock:
+        entry = _clients.get(kind)
+        if entry and entry[0] == key:
+            _stats["reuses"] += 1
+            return entry[1]
+
+        try:
+            client = factory()
+        except Exception as e:
+            _stats["build_errors"] += 1
+            print(f"Error creating {kind} client: {e}")
+            return None
+
+        if client is None:
+            return None
+
+        if entry:
+            _stats["rebuilds"] += 1
+            _retired.append((kind, entry[1]))
+            print(f"Credentials changed, rebuilt {kind} client")
+        _stats["builds"] += 1
+        _clients[kind] = (key, client)
+        return client
+
+
+async def _close_client(kind: str, client):
+    # AsyncOpenAI exposes an async close(); Google clients close their transport
+    try:
+        close = getattr(client, "close", None)
+        if close is None and hasattr(client, "transport"):
+            close = client.transport.close
+        if close is None:
+            return
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        print(f"Error closing {kind} client: {e}")
+
+
+async def close_all():
+    """Closes every live and retired client. Called on app shutdown."""
+    with _lock:
+        entries = [(kind, client) for kind, (_, client) in _clients.items()] + _retired[:]
+        _clients.clear()
+        _retired.clear()
+    for kind, client in entries:
+        await _close_client(kind, client)
+
+
+def get_client_stats() -> dict:
+    return {
+        **_stats,
+        "live": {kind: key for kind, (key, _) in _clients.items()},
+        "retired": len(_retired),
+    }
+
+
+def get_google_credentials(credentials_json: str):
+    """Parses service-account JSON once per distinct credential string."""
+    def build():
+        from google.oauth2 import service_account
+        return service_account.Credentials.from_service_account_info(json.loads(credentials_json))
+
+    return get_or_create("google_credentials", fingerprint(credentials_json), build)
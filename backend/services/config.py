@@ -1,45 +1,214 @@
 import os
-from sqlalchemy import create_engine, text
+import time
+import asyncio
+import threading
 from dotenv import load_dotenv
 
+from services.lazy import LazyModule
+from services.metrics import timed
+
+# Loaded with the engine, on first DB use
+sqlalchemy = LazyModule("sqlalchemy")
+
 load_dotenv()
 
 # Use the same DB URL as frontend, but adapted for Python (if needed)
 # Frontend: mysql://root:@localhost:3306/ai-voice-reservation
 # Python: mysql+pymysql://root:@localhost:3306/ai-voice-reservation
 DB_URL = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost:3306/ai-voice-reservation")
+if DB_URL.startswith("mysql://"):
+    DB_URL = "mysql+pymysql://" + DB_URL[len("mysql://"):]
+
+# Pool sizing for the shared engine. Every DB caller in the backend goes through
+# this engine, so connections are reused instead of reconnecting per query.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # below MySQL wait_timeout
+
+_engine_lock = threading.Lock()
+_engine = {"engine": None, "created": False}
+
+
+def get_engine():
+    """
+    The shared engine, created on first use rather than at import so a
+    worker starts without loading the DB driver. None if it cannot be built.
+    """
+    if _engine["created"]:
+        return _engine["engine"]
+    with _engine_lock:
+        if not _engine["created"]:
+            try:
+                pool_kwargs = {} if DB_URL.startswith("sqlite") else {
+                    "pool_size": DB_POOL_SIZE,
+                    "max_overflow": DB_MAX_OVERFLOW,
+                    "pool_recycle": DB_POOL_RECYCLE,
+                }
+                _engine["engine"] = sqlalchemy.create_engine(DB_URL, pool_pre_ping=True, **pool_kwargs)
+            except Exception as e:
+                print(f"DB Engine Error: {e}")
+            _engine["created"] = True
+    return _engine["engine"]
+
+# How long (seconds) the cached SystemConfig snapshot is trusted before we
+# ask the DB whether anything changed. Admin saves call invalidate_config_cache()
+# so the TTL only bounds staleness for edits made outside the admin UI.
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", "30"))
+
+_cache_lock = threading.Lock()
+_cache = {
+    "values": {},          # key -> value, the whole SystemConfig table
+    "loaded_at": 0.0,      # monotonic time of the last successful check
+    "updated_at": None,    # MAX(updatedAt) seen at the last full load
+    "row_count": 0,        # COUNT(*) seen at the last full load (catches deletes)
+    "version": 0,          # bumped whenever the contents actually change
+}
+_stats = {"hits": 0, "misses": 0, "reloads": 0, "checks": 0, "errors": 0, "invalidations": 0}
+_listeners = []
+_refreshing = {"active": False}  # a background re-check is running
+
+
+def _load_all(conn):
+    """Loads the whole SystemConfig table in one query."""
+    rows = conn.execute(sqlalchemy.text("SELECT `key`, value FROM SystemConfig")).fetchall()
+    return {row[0]: row[1] for row in rows}
+
+
+@timed("db.config_check")
+def _refresh_locked(force: bool = False):
+    """
+    Re-validates the cached snapshot against the DB.
+    A cheap MAX(updatedAt)/COUNT(*) probe decides whether a full reload is needed.
+    Must be called with _cache_lock held.
+    """
+    changed_keys = set()
+    engine = get_engine()
+    if engine is None:
+        _cache["loaded_at"] = time.monotonic()
+        return changed_keys
+
+    try:
+        with engine.connect() as conn:
+            _stats["checks"] += 1
+            probe = conn.execute(sqlalchemy.text("SELECT MAX(updatedAt), COUNT(*) FROM SystemConfig")).fetchone()
+            updated_at, row_count = (probe[0], probe[1]) if probe else (None, 0)
+
+            if force or updated_at != _cache["updated_at"] or row_count != _cache["row_count"]:
+                values = _load_all(conn)
+                old = _cache["values"]
+                changed_keys = {k for k in set(old) | set(values) if old.get(k) != values.get(k)}
+                _cache["values"] = values
+                _cache["updated_at"] = updated_at
+                _cache["row_count"] = row_count
+                _stats["reloads"] += 1
+                if changed_keys:
+                    _cache["version"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"DB Config API Error: {e}")
+
+    # Even on error we back off for a TTL instead of hammering a dead DB every call
+    _cache["loaded_at"] = time.monotonic()
+    return changed_keys
+
+
+def _notify(changed_keys):
+    for callback in list(_listeners):
+        try:
+            callback(changed_keys)
+        except Exception as e:
+            print(f"Config listener error: {e}")
 
-try:
-    engine = create_engine(DB_URL)
-except Exception as e:
-    print(f"DB Engine Error: {e}")
-    engine = None
 
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+def _refresh_in_background():
+    try:
+        _ensure_fresh()
+    finally:
+        _refreshing["active"] = False
+
+
+def _ensure_fresh(force: bool = False) -> bool:
+    """Returns True when the snapshot was served without touching the DB."""
+    if not force and time.monotonic() - _cache["loaded_at"] < CONFIG_CACHE_TTL:
+        return True
+    if not force and _cache["loaded_at"] and _on_event_loop():
+        # Never probe the DB on the event loop (an unreachable DB would stall
+        # every session for the connect timeout): serve the stale snapshot
+        # and re-check in a worker thread
+        if not _refreshing["active"]:
+            _refreshing["active"] = True
+            asyncio.get_running_loop().run_in_executor(None, _refresh_in_background)
+        return True
+    with _cache_lock:
+        # Another thread may have refreshed while we waited for the lock
+        if not force and time.monotonic() - _cache["loaded_at"] < CONFIG_CACHE_TTL:
+            return True
+        changed_keys = _refresh_locked(force=force)
+    if changed_keys:
+        _notify(changed_keys)
+    return False
+
+
+@timed("config")
 def get_config_value(key: str, default: str = "") -> str:
     """
     Fetches a config value from the SystemConfig table.
+    Served from an in-process snapshot of the whole table; the DB is only
+    consulted once per CONFIG_CACHE_TTL or after invalidate_config_cache().
     Falls back to environment variable or default.
     """
-    # 1. Check DB
-    if engine:
-        try:
-            with engine.connect() as conn:
-                # Specify textual SQL
-                print(f"DEBUG: Querying DB for key: {key}")
-                result = conn.execute(text("SELECT value FROM SystemConfig WHERE `key` = :key"), {"key": key})
-                row = result.fetchone()
-                if row:
-                    print(f"DEBUG: Found key {key} in DB: {row[0][:5]}...")
-                    return row[0]
-                else:
-                    print(f"DEBUG: Key {key} NOT found in DB")
-        except Exception as e:
-            print(f"DB Config API Error: {e}")
+    # 1. Check cached DB snapshot
+    if _ensure_fresh():
+        _stats["hits"] += 1
     else:
-        print("DEBUG: DB Engine is None")
-    
+        _stats["misses"] += 1
+
+    val = _cache["values"].get(key)
+    if val is not None:
+        return val
+
     # 2. Fallback to Env
-    val = os.getenv(key, default)
-    if val:
-        print(f"DEBUG: Found key {key} in Env")
-    return val
+    return os.getenv(key, default)
+
+
+def invalidate_config_cache():
+    """
+    Forces the next read to reload SystemConfig from the DB.
+    Called by the admin UI after saving settings.
+    """
+    _stats["invalidations"] += 1
+    _ensure_fresh(force=True)
+
+
+def get_config_version() -> int:
+    """Monotonic counter that changes whenever any SystemConfig value changes."""
+    _ensure_fresh()
+    return _cache["version"]
+
+
+def on_config_change(callback):
+    """
+    Registers callback(changed_keys) to run after a reload that changed values.
+    """
+    _listeners.append(callback)
+    return callback
+
+
+def get_config_cache_stats() -> dict:
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / total, 4) if total else 0.0,
+        "keys": len(_cache["values"]),
+        "version": _cache["version"],
+        "age_seconds": round(time.monotonic() - _cache["loaded_at"], 2) if _cache["loaded_at"] else None,
+        "ttl_seconds": CONFIG_CACHE_TTL,
+    }
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded thread pool for blocking upstream SDK calls (Google STT/TTS).
+# Keeps them off the event loop so one slow call never stalls other /ws sessions.
+UPSTREAM_MAX_WORKERS = int(os.getenv("UPSTREAM_MAX_WORKERS", "16"))
+# Calls beyond this wait in the queue instead of piling onto the pool
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", str(UPSTREAM_MAX_WORKERS)))
+# Default per-call deadline in seconds
+UPSTREAM_CALL_TIMEOUT = float(os.getenv("UPSTREAM_CALL_TIMEOUT", "15"))
+
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_MAX_WORKERS, thread_name_prefix="upstream")
+_semaphore = asyncio.Semaphore(UPSTREAM_MAX_CONCURRENCY)
+
+_stats = {
+    "queued": 0,        # waiting for a concurrency slot
+    "in_flight": 0,     # currently running in the pool
+    "max_in_flight": 0,
+    "completed": 0,
+    "failed": 0,
+    "timeouts": 0,
+}
+_per_call = {}  # name -> {"calls", "timeouts", "failed", "total_seconds"}
+
+
+def _call_stats(name: str) -> dict:
+    stats = _per_call.get(name)
+    if stats is None:
+        stats = _per_call[name] = {"calls": 0, "timeouts": 0, "failed": 0, "total_seconds": 0.0}
+    return stats
+
+
+def _finished(future):
+    # The worker thread is done (not merely abandoned by a timed-out caller):
+    # only now is its concurrency slot free again
+    _stats["in_flight"] -= 1
+    _semaphore.release()
+    if not future.cancelled():
+        future.exception()  # retrieved, so an abandoned call's error is not logged as unhandled
+
+
+async def run_blocking(name: str, fn, *args, timeout: float = None, **kwargs):
+    """
+    Runs a blocking function in the upstream pool and awaits its result.
+    Raises asyncio.TimeoutError if it does not finish within `timeout` seconds.
+    Note the worker thread cannot be interrupted, so callers should also pass
+    the deadline to the SDK call itself (gRPC `timeout=`). A call that timed
+    out keeps its concurrency slot until the thread actually returns.
+    """
+    timeout = timeout or UPSTREAM_CALL_TIMEOUT
+    loop = asyncio.get_running_loop()
+    call_stats = _call_stats(name)
+
+    _stats["queued"] += 1
+    try:
+        await _semaphore.acquire()
+    finally:
+        _stats["queued"] -= 1
+
+    _stats["in_flight"] += 1
+    _stats["max_in_flight"] = max(_stats["max_in_flight"], _stats["in_flight"])
+    started = loop.time()
+    try:
+        # Carry context vars (the current turn trace) into the worker thread
+        context = contextvars.copy_context()
+        future = loop.run_in_executor(_executor, functools.partial(context.run, fn, *args, **kwargs))
+    except BaseException:
+        _stats["in_flight"] -= 1
+        _semaphore.release()
+        raise
+    future.add_done_callback(_finished)
+    try:
+        # Shielded: giving up on the result must not mark the future done
+        # while its thread is still running
+        result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        _stats["completed"] += 1
+        return result
+    except asyncio.TimeoutError:
+        _stats["timeouts"] += 1
+        call_stats["timeouts"] += 1
+        raise
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        _stats["failed"] += 1
+        call_stats["failed"] += 1
+        raise
+    finally:
+        call_stats["calls"] += 1
+        call_stats["total_seconds"] += loop.time() - started
+
+
+def upstream_idle() -> bool:
+    """True when nothing is waiting for a slot and at most half the slots are busy."""
+    return _stats["queued"] == 0 and _stats["in_flight"] * 2 <= UPSTREAM_MAX_CONCURRENCY
+
+
+def get_executor_stats() -> dict:
+    return {
+        **_stats,
+        "max_workers": UPSTREAM_MAX_WORKERS,
+        "max_concurrency": UPSTREAM_MAX_CONCURRENCY,
+        "timeout_seconds": UPSTREAM_CALL_TIMEOUT,
+        "calls": {
+            name: {**s, "avg_seconds": round(s["total_seconds"] / s["calls"], 4) if s["calls"] else 0.0}
+            for name, s in _per_call.items()
+        },
+    }
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
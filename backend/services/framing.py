@@ -0,0 +1,146 @@
+import os
+import struct
+from collections import namedtuple
+
+# Binary frame protocol for /ws audio, negotiated per connection.
+#
+# Version 1 (default, what existing clients speak): every binary message is
+# one complete audio file, MP3 out and WebM/Opus in, with no metadata.
+#
+# Version 2 (?protocol=2): every binary message starts with a 10-byte header
+#   version u8 | codec u8 | flags u8 | reserved u8 | stream id u16 | sequence u32
+# (big endian) followed by the payload. One stream is one clip of audio; the
+# last (or only) message of a stream has FLAG_FINAL. The client may upload a
+# recording in chunks; synthesized clips go out as a single message, because
+# the browser can only start an <audio> element on a complete file.
+# JSON control messages are unchanged in both versions.
+PROTOCOL_VERSION = 2
+HEADER = struct.Struct(">BBBxHI")
+FLAG_FINAL = 0x01
+
+CODEC_IDS = {"mp3": 1, "ogg_opus": 2, "webm_opus": 3}
+CODEC_NAMES = {v: k for k, v in CODEC_IDS.items()}
+# Output codecs a client may ask for, and the Google TTS encoding for each
+TTS_ENCODINGS = {"mp3": "MP3", "ogg_opus": "OGG_OPUS"}
+# What the recognizer accepts from the client
+INPUT_CODECS = {"webm_opus"}
+
+# Largest recording reassembled from chunks; the same cap uvicorn puts on a
+# single version-1 message (--ws-max-size, 16 MiB by default)
+MAX_UTTERANCE_BYTES = int(os.getenv("MAX_UTTERANCE_BYTES", str(16 * 1024 * 1024)))
+
+Frame = namedtuple("Frame", "codec stream_id seq final payload")
+
+
+class FrameError(ValueError):
+    pass
+
+
+def pack_frame(codec: str, stream_id: int, seq: int, payload: bytes, final: bool = False) -> bytes:
+    flags = FLAG_FINAL if final else 0
+    return HEADER.pack(PROTOCOL_VERSION, CODEC_IDS[codec], flags, stream_id & 0xFFFF, seq) + payload
+
+
+def unpack_frame(data: bytes) -> Frame:
+    if len(data) < HEADER.size:
+        raise FrameError(f"frame shorter than its {HEADER.size}-byte header")
+    version, codec_id, flags, stream_id, seq = HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise FrameError(f"unsupported frame version {version}")
+    codec = CODEC_NAMES.get(codec_id)
+    if codec is None:
+        raise FrameError(f"unknown codec id {codec_id}")
+    return Frame(codec, stream_id, seq, bool(flags & FLAG_FINAL), data[HEADER.size:])
+
+
+class Protocol:
+    """
+    The framing one connection negotiated. Defaults to version 1 and MP3, so
+    clients that send no query parameters behave exactly as before.
+    """
+
+    def __init__(self, version: int = 1, codec: str = "mp3"):
+        self.version = version
+        self.codec = codec
+        self._out_stream = 0
+        self._in_stream = None  # (stream id, next expected sequence)
+        self._in_chunks = []
+        self._in_bytes = 0
+        self._in_overflow = False  # Rest of an oversized utterance is discarded
+
+    @classmethod
+    def negotiate(cls, params):
+        """From the /ws query string: ?protocol=2&codec=ogg_opus."""
+        try:
+            version = int(params.get("protocol", "1"))
+        except ValueError:
+            version = 1
+        if version < PROTOCOL_VERSION:
+            return cls()
+        codec = params.get("codec", "mp3")
+        if codec not in TTS_ENCODINGS:
+            codec = "mp3"
+        return cls(PROTOCOL_VERSION, codec)
+
+    @property
+    def tts_encoding(self) -> str:
+        return TTS_ENCODINGS[self.codec]
+
+    def describe(self) -> dict:
+        """What was agreed, for the `session` message."""
+        return {"protocol": self.version, "codec": self.codec}
+
+    def audio_frames(self, audio: bytes) -> list:
+        """Binary messages that deliver one synthesized clip: a single final frame."""
+        if self.version < PROTOCOL_VERSION:
+            return [audio]
+        self._out_stream = (self._out_stream + 1) & 0xFFFF
+        return [pack_frame(self.codec, self._out_stream, 0, audio, final=True)]
+
+    def read_audio(self, data: bytes):
+        """
+        Unwraps an inbound binary message into (payload, final). Version 1
+        messages are a whole recording. Returns (None, False) for a repeated or
+        out-of-order chunk; raises FrameError for a malformed one.
+        """
+        if self.version < PROTOCOL_VERSION:
+            return data, True
+        frame = unpack_frame(data)
+        if frame.codec not in INPUT_CODECS:
+            raise FrameError(f"unsupported input codec {frame.codec}")
+        if self._in_stream is None or frame.stream_id != self._in_stream[0]:
+            # A new utterance; whatever was left of the previous one is dropped
+            self._reset_in()
+            if frame.seq != 0:
+                return None, False
+        elif frame.seq != self._in_stream[1]:
+            return None, False
+        self._in_stream = None if frame.final else (frame.stream_id, frame.seq + 1)
+        return frame.payload, frame.final
+
+    def collect(self, payload: bytes, final: bool):
+        """
+        Blob mode: buffers an utterance's chunks and returns it whole on the
+        final one. Raises FrameError once an utterance passes
+        MAX_UTTERANCE_BYTES; its remaining chunks are then discarded.
+        """
+        if self._in_overflow:
+            if final:
+                self._reset_in()
+            return None
+        self._in_bytes += len(payload)
+        if self._in_bytes > MAX_UTTERANCE_BYTES:
+            self._reset_in()
+            self._in_overflow = not final
+            raise FrameError(f"utterance larger than {MAX_UTTERANCE_BYTES} bytes")
+        self._in_chunks.append(payload)
+        if not final:
+            return None
+        audio = b"".join(self._in_chunks)
+        self._reset_in()
+        return audio
+
+    def _reset_in(self):
+        self._in_chunks = []
+        self._in_bytes = 0
+        self._in_overflow = False
@@ -0,0 +1,121 @@
+import os
+import json
+
+from services.response_parser import ReservationState, REVIEW_TAG
+
+# Bounded conversation history.
+# Recent turns are kept verbatim within a token budget; older turns are folded
+# into a small structured state so a long call costs about the same per turn
+# as a short one. Only turns up to the last [REVIEW_DETAILS] are folded: the
+# reviewed payload holds everything the caller said before it (the name, and
+# a date/time never passed to a tool, exist nowhere else).
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+# Most recent user turns that are always kept verbatim, even over budget
+HISTORY_MIN_TURNS = int(os.getenv("HISTORY_MIN_TURNS", "2"))
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate: ~4 ASCII chars per token, while Bengali script
+    tokenizes at roughly one token per character.
+    """
+    if not text:
+        return 0
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def _message_tokens(msg: dict) -> int:
+    tokens = 4 + estimate_tokens(msg.get("content") or "")
+    for call in msg.get("tool_calls") or []:
+        tokens += estimate_tokens(call["function"]["name"]) + estimate_tokens(call["function"]["arguments"])
+    return tokens
+
+
+class ConversationHistory:
+    """
+    List-like conversation history (append, iterate, reversed, len) with a
+    sliding window and a compact state for everything that slid out.
+    """
+
+    def __init__(self, messages: list = None, reservation: ReservationState = None, compacted_turns: int = 0):
+        self.messages = []
+        self.reservation = reservation or ReservationState()
+        self.compacted_turns = compacted_turns
+        for msg in messages or []:
+            self.append(msg)
+
+    def append(self, msg: dict):
+        self.messages.append(msg)
+        # Keep the structured state current turn by turn, not at compaction time
+        self.reservation.observe(msg)
+
+    def to_dict(self) -> dict:
+        """JSON-safe snapshot for the session store."""
+        return {
+            "messages": self.messages,
+            "reservation": self.reservation.to_dict(),
+            "compacted_turns": self.compacted_turns,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        history = cls(reservation=ReservationState.from_dict(data.get("reservation") or {}),
+                      compacted_turns=data.get("compacted_turns", 0))
+        # Restored as-is; the reservation state already reflects these messages
+        history.messages = list(data.get("messages") or [])
+        return history
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __reversed__(self):
+        return reversed(self.messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def token_count(self) -> int:
+        return sum(_message_tokens(m) for m in self.messages)
+
+    def _turn_starts(self) -> list:
+        return [i for i, m in enumerate(self.messages) if m.get("role") == "user"]
+
+    def _last_review(self) -> int:
+        """Index of the last reviewed summary in the window, -1 if none."""
+        if self.reservation.review is None:
+            return -1
+        for i in range(len(self.messages) - 1, -1, -1):
+            msg = self.messages[i]
+            if msg.get("role") == "assistant" and REVIEW_TAG in (msg.get("content") or ""):
+                return i
+        return -1
+
+    def compact(self):
+        """
+        Drops the oldest whole turns (user message plus its assistant/tool
+        replies) until the window fits the budget. Only turns up to and
+        including the last review are dropped: their details are in
+        self.reservation.review, while later turns may still correct them.
+        """
+        reviewed = self._last_review()
+        while self.token_count() > HISTORY_TOKEN_BUDGET:
+            starts = self._turn_starts()
+            if len(starts) <= HISTORY_MIN_TURNS or starts[0] > reviewed:
+                break
+            del self.messages[:starts[1]]
+            reviewed -= starts[1]
+            self.compacted_turns += 1
+
+    def state_message(self):
+        """System note carrying what was gathered in turns no longer in the window."""
+        if not self.compacted_turns:
+            return None
+        return {
+            "role": "system",
+            "content": "EARLIER IN THIS CALL (older turns omitted):\n"
+                       f"- Reservation details reviewed with the caller (and updated since): {json.dumps(self.reservation.gathered(), ensure_ascii=False)}",
+        }
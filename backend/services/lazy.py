@@ -0,0 +1,43 @@
+import time
+import importlib
+import threading
+
+# Heavy SDKs (google-cloud-speech/texttospeech pull in grpc, openai pulls in
+# hundreds of type modules) are imported on first use instead of at startup.
+_lock = threading.Lock()
+_import_seconds = {}  # module name -> seconds its first import took
+
+
+class LazyModule:
+    """
+    Stands in for a module until one of its attributes is used:
+        speech = LazyModule("google.cloud.speech_v1")
+        speech.SpeechClient(...)  # imports here, once
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            started = time.perf_counter()
+            module = importlib.import_module(self._name)
+            with _lock:
+                if self._module is None:
+                    self._module = module
+                    _import_seconds[self._name] = time.perf_counter() - started
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
+
+
+def get_import_stats() -> dict:
+    """Milliseconds each lazily imported SDK took to load."""
+    with _lock:
+        return {name: round(seconds * 1000, 1) for name, seconds in _import_seconds.items()}
@@ -1,52 +1,245 @@
 import os
 import json
-from openai import AsyncOpenAI
+import time
+import asyncio
+import contextlib
+import functools
+from services import clients, response_cache, resilience
+from services.lazy import LazyModule
 from services.config import get_config_value
+from services.phrases import LLM_ERROR_TEXT
+from services.tools import TOOLS, execute_tool_calls
+from services.history import ConversationHistory
+from services.prompts import prompt_prefix
+from services.metrics import observe
+from services.admission import upstream
+
+# Tool round trips allowed per turn before the model must answer in text
+MAX_TOOL_ROUNDS = int(os.getenv("LLM_MAX_TOOL_ROUNDS", "2"))
+# Chat model, and the one used while its circuit is open
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-3.5-turbo")
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "gpt-4o-mini")
+# Per attempt: request sent to first streamed chunk (seconds)
+LLM_FIRST_TOKEN_TIMEOUT = float(os.getenv("LLM_FIRST_TOKEN_TIMEOUT", "8"))
+
+# Imported on first use; the SDK takes ~0.5 s to load
+openai = LazyModule("openai")
 
 def get_client():
+    """
+    Returns the shared AsyncOpenAI client. Its HTTP connection pool is reused
+    across sessions; a new client is only built when the API key changes.
+    """
     api_key = get_config_value("OPENAI_API_KEY")
-    return AsyncOpenAI(api_key=api_key)
+    return clients.get_or_create(
+        "openai",
+        clients.fingerprint(api_key),
+        lambda: openai.AsyncOpenAI(api_key=api_key),
+    )
 
-# Default System Prompt
-# Default System Prompt
+class OpenStream:
+    """A completion stream whose first chunk has arrived; holds an LLM slot until closed."""
 
-async def get_ai_response(user_text: str, history: list):
+    def __init__(self, stack: contextlib.AsyncExitStack, chunks, first):
+        self._stack = stack
+        self._chunks = chunks
+        self._first = first
+
+    async def chunks(self):
+        if self._first is not None:
+            yield self._first
+        async for chunk in self._chunks:
+            yield chunk
+
+    async def close(self):
+        # Closes the HTTP response (aborting it if unread) and frees the slot
+        await self._stack.aclose()
+
+async def _open_stream(client, request: dict, timeout: float) -> OpenStream:
     """
-    Generates a response from GPT-4o-mini maintaining history.
-    No tool calls - simplified flow.
+    One attempt: takes an LLM slot, sends the request and waits for the first
+    chunk, so a hedge or retry covers time to first token.
     """
-    # Fetch dynamic prompt from Admin Dashboard Settings
-    # ABSOLUTE RULE: DO NOT use a hardcoded default here. User manages it via UI.
-    system_prompt = get_config_value("SYSTEM_PROMPT", "")
-        
-    # Inject Current Date/Time Context
-    from datetime import datetime
-    now_str = datetime.now().strftime("%A, %d-%m-%Y %I:%M %p")
-    system_prompt += f"\n\nCURRENT CONTEXT:\n- Today is: {now_str}\n- Assume the current year is {datetime.now().year} unless specified."
+    stack = contextlib.AsyncExitStack()
+    try:
+        await stack.enter_async_context(upstream("llm"))
+        stream = await client.chat.completions.create(**request, timeout=timeout)
+        stack.push_async_callback(stream.close)
+        chunks = stream.__aiter__()
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return OpenStream(stack, chunks, first)
+    except BaseException:
+        await stack.aclose()
+        raise
 
-    # Add user message to history
+def build_messages(user_text: str, history) -> list:
+    """
+    Appends the user turn to history and returns the full messages list.
+
+    The admin system prompt is sent alone as the first message so the
+    prefix stays byte-identical across turns and calls (provider-side prompt
+    caching); the time context and compacted state follow it. Both prefix
+    messages are precompiled and shared (services.prompts).
+    """
+    # Add user message to history, then slide the window if over budget
     history.append({"role": "user", "content": user_text})
     
-    messages = [
-        {"role": "system", "content": system_prompt}
-    ] + history
+    messages = prompt_prefix()
+    if isinstance(history, ConversationHistory):
+        history.compact()
+        state_message = history.state_message()
+        if state_message:
+            messages.append(state_message)
+    messages.extend(history)
+    return messages
+
+def tools_enabled() -> bool:
+    return get_config_value("LLM_TOOLS_ENABLED", "true").strip().lower() not in ("0", "false", "no", "off")
+
+async def stream_ai_response(user_text: str, history: list, turn_stats: dict = None):
+    """
+    Streams the model reply as text deltas (stream=True) so speech can start
+    on the first sentence. The full reply is appended to history once the
+    stream completes.
+
+    With tools enabled the model may call availability lookups first; calls
+    of one round run concurrently and their timings are added to turn_stats.
+    Text the model says before a tool call ("let me check...") is streamed
+    like any other reply text.
+
+    With the response cache enabled, a common turn seen before at the same
+    stage of a call is answered from the cache without calling the model.
+    """
+    turn_stats = turn_stats if turn_stats is not None else {}
+    turn_stats.setdefault("tool_calls", [])
+    cache_key = None
+    if isinstance(history, ConversationHistory) and response_cache.enabled():
+        if response_cache.is_personal(user_text):
+            response_cache.skip_personal()
+        else:
+            # Keyed on the state before this turn, the same as the lookup that stores it
+            cache_key = response_cache.cache_key(user_text, history.reservation)
+            started = time.perf_counter()
+            cached = response_cache.lookup(cache_key)
+            if cached is not None:
+                build_messages(user_text, history)  # records the user turn
+                history.append({"role": "assistant", "content": cached})
+                turn_stats["cache_hit"] = True
+                observe("llm.cache_hit", time.perf_counter() - started, started)
+                yield cached
+                return
+
+    messages = build_messages(user_text, history)
+    use_tools = tools_enabled()
+    parts = []
+    round_parts = []
+    started = time.perf_counter()
+    
+    models = [LLM_MODEL] + [m for m in (LLM_FALLBACK_MODEL,) if m and m != LLM_MODEL]
     
     try:
         client = get_client()
         
-        # Simple LLM call without tools
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            temperature=0.7
-        )
-        
-        ai_message = response.choices[0].message.content
-        history.append({"role": "assistant", "content": ai_message})
-        
-        # Return: intermediate_text (None), ai_message, history
-        # Keep the same return signature for compatibility with main.py
-        return None, ai_message, history
+        for round_index in range(MAX_TOOL_ROUNDS + 1):
+            round_started = time.perf_counter()
+            request = dict(
+                messages=messages,
+                temperature=0.7,
+                stream=True
+            )
+            # The last round must answer in text
+            if use_tools and round_index < MAX_TOOL_ROUNDS:
+                request["tools"] = TOOLS
+            # Primary model, else the fallback while its circuit is open; the
+            # stream holds an LLM slot until it has been read
+            stream = await resilience.call(
+                "llm",
+                [(f"llm:{model}", functools.partial(_open_stream, client, {**request, "model": model})) for model in models],
+                LLM_FIRST_TOKEN_TIMEOUT,
+                discard=OpenStream.close,
+            )
+            
+            round_parts = []
+            calls = {}  # index -> {"id", "name", "arguments"}
+            try:
+                async for chunk in stream.chunks():
+                    if not chunk.choices:
+                        continue
+                    choice_delta = chunk.choices[0].delta
+                    delta = choice_delta.content
+                    if delta:
+                        if not parts:
+                            observe("llm.first_token", time.perf_counter() - started, started)
+                        parts.append(delta)
+                        round_parts.append(delta)
+                        yield delta
+                    for tc in choice_delta.tool_calls or []:
+                        call = calls.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                        if tc.id:
+                            call["id"] = tc.id
+                        if tc.function and tc.function.name:
+                            call["name"] += tc.function.name
+                        if tc.function and tc.function.arguments:
+                            call["arguments"] += tc.function.arguments
+            finally:
+                # On cancellation this aborts the upstream request
+                await stream.close()
+            
+            observe("llm.round", time.perf_counter() - round_started, round_started)
+            if not calls:
+                history.append({"role": "assistant", "content": "".join(round_parts)})
+                if cache_key is not None:
+                    response_cache.store(cache_key, "".join(parts), history.reservation,
+                                         tool_calls=bool(turn_stats["tool_calls"]))
+                break
+            
+            # Tool round: record the call, run the tools, feed results back
+            ordered = [calls[i] for i in sorted(calls)]
+            call_message = {
+                "role": "assistant",
+                "content": "".join(round_parts) or None,
+                "tool_calls": [
+                    {"id": c["id"], "type": "function", "function": {"name": c["name"], "arguments": c["arguments"]}}
+                    for c in ordered
+                ],
+            }
+            results = await execute_tool_calls(ordered)
+            history.append(call_message)
+            messages.append(call_message)
+            round_parts = []  # already in call_message
+            for result in results:
+                tool_message = {"role": "tool", "tool_call_id": result["tool_call_id"], "content": result["content"]}
+                history.append(tool_message)
+                messages.append(tool_message)
+                turn_stats["tool_calls"].append({"name": result["name"], "seconds": round(result["seconds"], 4)})
+    except asyncio.CancelledError:
+        # Barge-in: keep what was said so far so the model knows where it was cut off
+        if round_parts:
+            history.append({"role": "assistant", "content": "".join(round_parts) + " ..."})
+        raise
     except Exception as e:
         print(f"LLM Error: {e}")
-        return None, "নিচে কিছু সমস্যা হয়েছে। অনুগ্রহ করে আবার বলুন।", history
+        # History must match what the caller heard, or the next turn repeats or contradicts it
+        if round_parts:
+            history.append({"role": "assistant", "content": "".join(round_parts) + " ..."})
+        elif not parts:
+            history.append({"role": "assistant", "content": LLM_ERROR_TEXT})
+            yield LLM_ERROR_TEXT
+    finally:
+        observe("llm", time.perf_counter() - started, started)
+
+async def get_ai_response(user_text: str, history: list):
+    """
+    Generates a response from the chat model (LLM_MODEL) maintaining history.
+    Non-streaming convenience wrapper around stream_ai_response.
+    """
+    ai_message = ""
+    async for delta in stream_ai_response(user_text, history):
+        ai_message += delta
+    
+    # Return: intermediate_text (None), ai_message, history
+    # Keep the same return signature for compatibility with main.py
+    return None, ai_message, history
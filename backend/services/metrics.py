@@ -0,0 +1,160 @@
+import os
+import time
+import functools
+import inspect
+import threading
+import contextvars
+from collections import deque
+
+# Latency spans for the voice pipeline.
+# span("stt") times a block and feeds a per-name histogram. A span that runs
+# inside a turn (start_turn ... finish_turn) is also recorded on that turn's
+# trace along with its session and turn id, so a slow turn can be broken down
+# into STT, LLM, TTS, config, DB and socket time. Context propagates into
+# tasks and into run_blocking worker threads.
+
+# Samples kept per span name for the quantiles (most recent first to go)
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "2048"))
+QUANTILES = (0.5, 0.95, 0.99)
+
+_lock = threading.Lock()
+_series = {}  # span name -> {"samples": deque, "count": int, "sum": float}
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class TurnTrace:
+    """Spans recorded during one conversation turn."""
+
+    def __init__(self, session_id: str, turn_id: int):
+        self.session_id = session_id
+        self.turn_id = turn_id
+        self.started = time.perf_counter()
+        self.spans = []  # (name, start offset, seconds); appended from tasks and threads
+
+    def to_message(self) -> dict:
+        """The optional per-turn `timings` message for the client."""
+        return {
+            "type": "timings",
+            "session_id": self.session_id,
+            "turn_id": self.turn_id,
+            "spans": [
+                {"name": name, "start_ms": round(offset * 1000, 1), "ms": round(seconds * 1000, 1)}
+                for name, offset, seconds in self.spans
+            ],
+        }
+
+    def summary(self) -> dict:
+        """Total milliseconds per span name, for the turn log line."""
+        totals = {}
+        for name, _, seconds in self.spans:
+            totals[name] = totals.get(name, 0.0) + seconds * 1000
+        return {name: round(ms, 1) for name, ms in totals.items()}
+
+
+def observe(name: str, seconds: float, started: float = None):
+    """Records one sample for `name` (and on the current turn, if any)."""
+    with _lock:
+        series = _series.get(name)
+        if series is None:
+            series = _series[name] = {"samples": deque(maxlen=METRICS_WINDOW), "count": 0, "sum": 0.0}
+        series["samples"].append(seconds)
+        series["count"] += 1
+        series["sum"] += seconds
+    trace = _current_trace.get()
+    if trace is not None:
+        offset = (started if started is not None else time.perf_counter() - seconds) - trace.started
+        trace.spans.append((name, offset, seconds))
+
+
+class span:
+    """Times a block: `with span("tts"): ...` (works in sync and async code)."""
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.started, self.started)
+        return False
+
+
+def timed(name: str):
+    """Decorator form of span() for sync and async functions."""
+    def decorate(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def start_turn(session_id: str, turn_id: int) -> TurnTrace:
+    """Opens a trace; spans in this task (and tasks/threads it starts) land on it."""
+    trace = TurnTrace(session_id, turn_id)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def detach_turn():
+    """Background work started from a turn: its spans no longer count toward it."""
+    _current_trace.set(None)
+
+
+def finish_turn(trace: TurnTrace):
+    observe("turn", time.perf_counter() - trace.started, trace.started)
+    _current_trace.set(None)
+
+
+def _quantiles(samples) -> dict:
+    ordered = sorted(samples)
+    if not ordered:
+        return {q: 0.0 for q in QUANTILES}
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+def get_latency_stats() -> dict:
+    """p50/p95/p99 in milliseconds per span name."""
+    with _lock:
+        snapshot = {name: (list(s["samples"]), s["count"], s["sum"]) for name, s in _series.items()}
+    stats = {}
+    for name, (samples, count, total) in sorted(snapshot.items()):
+        q = _quantiles(samples)
+        stats[name] = {
+            "count": count,
+            "mean_ms": round(total / count * 1000, 2) if count else 0.0,
+            **{f"p{int(k * 100)}_ms": round(v * 1000, 2) for k, v in q.items()},
+        }
+    return stats
+
+
+def render_prometheus() -> str:
+    """All spans as one Prometheus summary (quantiles over the recent window)."""
+    with _lock:
+        snapshot = {name: (list(s["samples"]), s["count"], s["sum"]) for name, s in _series.items()}
+    lines = [
+        "# HELP voice_span_seconds Latency of voice pipeline stages.",
+        "# TYPE voice_span_seconds summary",
+    ]
+    for name, (samples, count, total) in sorted(snapshot.items()):
+        for q, value in _quantiles(samples).items():
+            lines.append(f'voice_span_seconds{{span="{name}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'voice_span_seconds_sum{{span="{name}"}} {total:.6f}')
+        lines.append(f'voice_span_seconds_count{{span="{name}"}} {count}')
+    return "\n".join(lines) + "\n"
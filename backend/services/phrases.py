@@ -0,0 +1,41 @@
+# Fixed prompts the backend speaks itself (not generated by the LLM).
+# Kept in one place so the TTS cache can pre-warm exactly these strings.
+
+GREETING_SUFFIX = "! আমি আপনার রিজার্ভেশন অ্যাসিস্ট্যান্ট। আমি আপনাকে কীভাবে সাহায্য করতে পারি?"
+
+RETRY_TEXT = "দুঃখিত, আমি বুঝতে পারিনি। অনুগ্রহ করে আবার বলুন।"
+CONFIRM_DEFAULT_TEXT = "রিজার্ভেশন কনফার্ম করা হয়েছে। ধন্যবাদ।"
+REVIEW_DEFAULT_TEXT = "Here are the details. Shall I confirm?"
+LLM_ERROR_TEXT = "নিচে কিছু সমস্যা হয়েছে। অনুগ্রহ করে আবার বলুন।"
+
+
+def greeting_for_hour(hour: int) -> str:
+    # Bengali greetings based on time of day
+    if 5 <= hour < 12:
+        return "সুপ্রভাত"  # Good morning (5 AM - 12 PM)
+    elif 12 <= hour < 17:
+        return "শুভ অপরাহ্ন"  # Good afternoon (12 PM - 5 PM)
+    elif 17 <= hour < 21:
+        return "শুভ সন্ধ্যা"  # Good evening (5 PM - 9 PM)
+    else:
+        return "শুভ রাত্রি"  # Good night (9 PM - 5 AM)
+
+
+def greeting_text_for_hour(hour: int) -> str:
+    return f"{greeting_for_hour(hour)}{GREETING_SUFFIX}"
+
+
+def fixed_phrases() -> list:
+    """Every fixed prompt, including all four greeting variants."""
+    greetings = [greeting_text_for_hour(hour) for hour in (5, 12, 17, 21)]
+    return greetings + [RETRY_TEXT, CONFIRM_DEFAULT_TEXT, REVIEW_DEFAULT_TEXT, LLM_ERROR_TEXT]
+
+
+def likely_next(review_pending: bool) -> list:
+    """
+    Fixed prompts the caller may need on the next turn: the retry prompt
+    after any reply, and the default confirmation once details are reviewed.
+    """
+    if review_pending:
+        return [CONFIRM_DEFAULT_TEXT, RETRY_TEXT]
+    return [RETRY_TEXT, LLM_ERROR_TEXT]
@@ -0,0 +1,136 @@
+import time
+import asyncio
+from collections import deque
+
+from services.tts import synthesize_speech
+from services.metrics import span
+from services.framing import Protocol
+
+async def send_audio(websocket, protocol, audio: bytes):
+    """One clip as the connection's binary frames (a single message for protocol 1)."""
+    for frame in protocol.audio_frames(audio):
+        await websocket.send_bytes(frame)
+
+
+class OrderedSender:
+    """
+    Delivers a turn's messages to the socket in order while their audio is
+    synthesised concurrently. speak() starts TTS immediately; a single
+    writer awaits each item in turn, so sentence 2 can be synthesising while
+    sentence 1 is still being sent.
+    """
+
+    def __init__(self, websocket, protocol=None):
+        self._websocket = websocket
+        self._protocol = protocol or Protocol()
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._run())
+        self._aborted = False
+
+    def speak(self, text: str, persist: bool = False):
+        encoding = self._protocol.tts_encoding
+        self._queue.put_nowait(("audio", asyncio.create_task(synthesize_speech(text, persist=persist, encoding=encoding))))
+
+    def send_json(self, payload):
+        """payload is a dict, or an awaitable (e.g. a task) that produces one."""
+        self._queue.put_nowait(("json", payload))
+
+    async def close(self):
+        """Waits until everything queued so far has been sent."""
+        if self._aborted:
+            return
+        self._queue.put_nowait(None)
+        await self._writer
+
+    def abort(self):
+        """Drops everything not yet sent and cancels its pending synthesis."""
+        self._aborted = True
+        self._writer.cancel()  # also cancels the TTS task it is waiting on
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not None and isinstance(item[1], asyncio.Future):
+                item[1].cancel()
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            kind, value = item
+            if kind == "json":
+                if not isinstance(value, dict):
+                    value = await value
+                with span("ws_send"):
+                    await self._websocket.send_json(value)
+            else:
+                audio = await value
+                if audio:
+                    with span("ws_send"):
+                        await send_audio(self._websocket, self._protocol, audio)
+
+
+class TurnRunner:
+    """
+    Runs a session's current turn as a task, so the receive loop keeps
+    reading while a reply is generated and a new utterance can cancel a
+    stale one (barge-in).
+    """
+
+    def __init__(self):
+        self._task = None
+
+    @property
+    def busy(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, coro):
+        self._task = asyncio.create_task(coro)
+        self._task.add_done_callback(self._on_done)
+        return self._task
+
+    async def cancel(self) -> bool:
+        """Cancels the running turn and waits for it to unwind; True if one was running."""
+        task = self._task
+        if task is None or task.done():
+            return False
+        task.cancel()
+        await asyncio.wait({task})
+        return True
+
+    @staticmethod
+    def _on_done(task):
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Turn Error: {task.exception()}")
+
+
+class AudioInbox:
+    """
+    Bounded queue of a session's recorded utterances. When it is full the
+    oldest is dropped, and an utterance that waited longer than max_age is
+    skipped: the caller has moved on and a reply to it would be stale.
+    """
+
+    def __init__(self, maxsize: int, max_age: float):
+        self._items = deque(maxlen=maxsize)
+        self._ready = asyncio.Event()
+        self._max_age = max_age
+        self.dropped = 0
+
+    def put(self, audio: bytes) -> bool:
+        """Queues audio; False if an older utterance had to be dropped for it."""
+        full = len(self._items) == self._items.maxlen
+        if full:
+            self.dropped += 1
+        self._items.append((time.monotonic(), audio))
+        self._ready.set()
+        return not full
+
+    async def get(self) -> bytes:
+        while True:
+            while not self._items:
+                self._ready.clear()
+                await self._ready.wait()
+            received, audio = self._items.popleft()
+            if time.monotonic() - received <= self._max_age:
+                return audio
+            self.dropped += 1
@@ -0,0 +1,81 @@
+import time
+import threading
+from datetime import datetime
+
+import pytz
+
+from services import phrases
+from services.config import get_config_value, get_config_version
+
+# Prompt assembly for the LLM and the greeting. The system prompt is compiled
+# once per config version and the time context once per minute; both are
+# shared by every session. Stable parts go first (system prompt, then time,
+# then per-call state and history) so provider-side prefix caching can hit.
+
+# Restaurant time for both the prompt and the greeting, whatever the server's timezone
+TIMEZONE = pytz.timezone("Asia/Dhaka")
+
+_lock = threading.Lock()
+_compiled = {"version": None, "message": None}
+_clock = {"minute": None, "now": None, "message": None}
+_stats = {"compiles": 0, "time_context_builds": 0}
+
+
+def system_message() -> dict:
+    """The admin system prompt as a message, rebuilt only when settings change."""
+    version = get_config_version()
+    if _compiled["version"] != version:
+        with _lock:
+            if _compiled["version"] != version:
+                # ABSOLUTE RULE: no hardcoded default; the admin manages it via the UI
+                _compiled["message"] = {"role": "system", "content": get_config_value("SYSTEM_PROMPT", "")}
+                _compiled["version"] = version
+                _stats["compiles"] += 1
+    return _compiled["message"]
+
+
+def _refresh_clock(minute: int):
+    with _lock:
+        if _clock["minute"] == minute:
+            return
+        now = datetime.fromtimestamp(minute * 60, TIMEZONE)
+        _clock["message"] = {
+            "role": "system",
+            "content": f"CURRENT CONTEXT:\n- Today is: {now.strftime('%A, %d-%m-%Y %I:%M %p')} (Bangladesh time)\n"
+                       f"- Assume the current year is {now.year} unless specified.",
+        }
+        _clock["now"] = now
+        _clock["minute"] = minute
+        _stats["time_context_builds"] += 1
+
+
+def local_now() -> datetime:
+    """Dhaka time, to the minute."""
+    minute = int(time.time() // 60)
+    if _clock["minute"] != minute:
+        _refresh_clock(minute)
+    return _clock["now"]
+
+
+def time_context_message() -> dict:
+    local_now()
+    return _clock["message"]
+
+
+def greeting_text() -> str:
+    return phrases.greeting_text_for_hour(local_now().hour)
+
+
+def prompt_prefix() -> list:
+    """The messages every turn starts with. Shared objects: do not mutate."""
+    return [system_message(), time_context_message()]
+
+
+def get_prompt_stats() -> dict:
+    return {
+        **_stats,
+        "config_version": _compiled["version"],
+        "system_prompt_chars": len(_compiled["message"]["content"]) if _compiled["message"] else None,
+        "local_time": local_now().strftime("%d-%m-%Y %I:%M %p"),
+        "timezone": TIMEZONE.zone,
+    }
@@ -0,0 +1,203 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timezone
+
+from services import db, slots
+from services.config import get_engine, sqlalchemy
+from services.executor import run_blocking
+from services.metrics import timed
+
+# Write-behind reservation persistence.
+# Confirmed bookings go onto an async queue; one writer task drains it in
+# batches, so a burst of confirmations becomes a few multi-row INSERTs on
+# the pooled engine and the voice loop never waits on a DB round-trip.
+# Each booking carries an idempotency key (the call's session id): a
+# repeated confirm, a resumed call or a retried batch returns the booking
+# already stored instead of inserting a second row.
+
+# Rows per INSERT, and how long the writer waits to fill a batch (seconds)
+RESERVATION_BATCH_SIZE = int(os.getenv("RESERVATION_BATCH_SIZE", "50"))
+RESERVATION_BATCH_WINDOW = float(os.getenv("RESERVATION_BATCH_WINDOW", "0.02"))
+RESERVATION_WRITE_TIMEOUT = float(os.getenv("RESERVATION_WRITE_TIMEOUT", "10"))
+
+_state = {"queue": None, "worker": None}
+_pending = {}  # idempotency key -> future of the booking id
+_stats = {"submitted": 0, "deduplicated": 0, "written": 0, "batches": 0, "max_batch": 0, "failed": 0}
+
+_COLUMNS = ("name", "phone", "date", "time", "people", "createdAt", "idempotencyKey")
+
+
+def _normalize(data: dict, key: str) -> dict:
+    """Same formats the frontend's saveReservation stores."""
+    minutes = db.parse_time_minutes(str(data.get("time") or ""))
+    return {
+        "name": str(data.get("name") or ""),
+        "phone": str(data.get("phone") or ""),
+        "date": db.normalize_date(str(data.get("date") or "")),
+        "time": db.format_time_minutes(minutes) if minutes is not None else str(data.get("time") or ""),
+        "people": str(data.get("people") or ""),
+        # Prisma stores DateTime as naive UTC
+        "createdAt": datetime.now(timezone.utc).replace(tzinfo=None),
+        "idempotencyKey": key,
+    }
+
+
+@timed("db.insert_reservations")
+def _insert_batch(rows: list) -> dict:
+    """
+    One multi-row INSERT that skips keys already stored, then one SELECT for
+    the ids. Returns idempotency key -> booking id.
+    """
+    engine = get_engine()
+    if engine is None:
+        raise RuntimeError("No database engine")
+    ignore = "INSERT OR IGNORE" if engine.dialect.name == "sqlite" else "INSERT IGNORE"
+    values = []
+    params = {}
+    for i, row in enumerate(rows):
+        values.append("(" + ", ".join(f":{col}{i}" for col in _COLUMNS) + ")")
+        params.update({f"{col}{i}": row[col] for col in _COLUMNS})
+    keys = {f"key{i}": row["idempotencyKey"] for i, row in enumerate(rows)}
+
+    with engine.begin() as conn:
+        conn.execute(
+            sqlalchemy.text(f"{ignore} INTO Reservation ({', '.join(_COLUMNS)}) VALUES {', '.join(values)}"),
+            params,
+        )
+        found = conn.execute(
+            sqlalchemy.text(f"SELECT idempotencyKey, id FROM Reservation WHERE idempotencyKey IN ({', '.join(':' + k for k in keys)})"),
+            keys,
+        ).fetchall()
+    return {row[0]: row[1] for row in found}
+
+
+async def _next_batch(queue: asyncio.Queue) -> list:
+    batch = [await queue.get()]
+    deadline = time.monotonic() + RESERVATION_BATCH_WINDOW
+    while len(batch) < RESERVATION_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+def _record_bookings(booked: list):
+    for row, booking_id in booked:
+        slots.record_booking(row["date"], row["time"], row["people"], booking_id)
+
+
+def _resolve(batch: list, ids: dict):
+    for row, future in batch:
+        key = row["idempotencyKey"]
+        if _pending.get(key) is future:
+            _pending.pop(key)
+        if not future.done():
+            future.set_result(ids.get(key))
+
+
+async def _run():
+    queue = _state["queue"]
+    while True:
+        batch = await _next_batch(queue)
+        rows = [row for row, _ in batch]
+        ids = {}
+        try:
+            ids = await run_blocking("reservation_write", _insert_batch, rows, timeout=RESERVATION_WRITE_TIMEOUT)
+            _stats["batches"] += 1
+            _stats["written"] += len(batch)
+            _stats["max_batch"] = max(_stats["max_batch"], len(batch))
+        except Exception as e:
+            print(f"Reservation Write Error: {e}")
+            _stats["failed"] += len(batch)
+        finally:
+            # Even if the writer is cancelled, no caller is left waiting
+            _resolve(batch, ids)
+
+        # New bookings count against capacity right away. A miss here only
+        # delays it to the next index reload, so it never stops the writer.
+        booked = [(row, ids[row["idempotencyKey"]]) for row in rows if row["idempotencyKey"] in ids]
+        if booked:
+            try:
+                await run_blocking("slot_index", _record_bookings, booked, timeout=RESERVATION_WRITE_TIMEOUT)
+            except Exception as e:
+                print(f"Slot Index Update Error: {e}")
+
+
+def start_writer():
+    """Starts the writer task on the running loop (idempotent)."""
+    worker = _state["worker"]
+    if worker is not None and not worker.done():
+        return
+    if worker is not None and not worker.cancelled() and worker.exception() is not None:
+        print(f"Reservation Writer Error: {worker.exception()}")
+    # A restarted writer keeps the queue, so rows queued meanwhile are not lost
+    if _state["queue"] is None:
+        _state["queue"] = asyncio.Queue()
+    _state["worker"] = asyncio.create_task(_run())
+
+
+async def stop_writer():
+    """Flushes queued bookings, then stops the writer."""
+    queue, worker = _state["queue"], _state["worker"]
+    if worker is None:
+        return
+    deadline = time.monotonic() + RESERVATION_WRITE_TIMEOUT
+    while (not queue.empty() or _pending) and not worker.done() and time.monotonic() < deadline:
+        await asyncio.sleep(RESERVATION_BATCH_WINDOW)
+    # Repeated until it lands: wait_for (Python < 3.12) swallows a cancel
+    # that arrives as the call it waits on completes
+    while not worker.done():
+        worker.cancel()
+        await asyncio.wait([worker], timeout=RESERVATION_BATCH_WINDOW or 0.01)
+    if not worker.cancelled() and worker.exception() is not None:
+        print(f"Reservation Writer Error: {worker.exception()}")
+    _state["worker"] = None
+    # Whatever could not be flushed is left to the browser (booking id None)
+    while not queue.empty():
+        queue.get_nowait()
+    for key, future in list(_pending.items()):
+        _pending.pop(key)
+        if not future.done():
+            future.set_result(None)
+
+
+def submit_reservation(data: dict, idempotency_key: str) -> asyncio.Future:
+    """
+    Queues a confirmed booking and returns a future of its booking id
+    (None if it could not be stored). Never waits on the DB.
+    """
+    _stats["submitted"] += 1
+    future = _pending.get(idempotency_key)
+    if future is not None:
+        _stats["deduplicated"] += 1
+        return future
+    start_writer()
+    future = asyncio.get_running_loop().create_future()
+    _pending[idempotency_key] = future
+    _state["queue"].put_nowait((_normalize(data, idempotency_key), future))
+    return future
+
+
+async def save_reservation(data: dict, idempotency_key: str):
+    """Submits and waits for the booking id; None on failure."""
+    try:
+        # Shielded: a barge-in must not cancel a booking the caller confirmed
+        return await asyncio.shield(submit_reservation(data, idempotency_key))
+    except Exception as e:
+        print(f"Reservation Save Error: {e}")
+        return None
+
+
+def get_reservation_writer_stats() -> dict:
+    return {
+        **_stats,
+        "queued": _state["queue"].qsize() if _state["queue"] else 0,
+        "pending": len(_pending),
+        "batch_size": RESERVATION_BATCH_SIZE,
+        "batch_window_seconds": RESERVATION_BATCH_WINDOW,
+    }
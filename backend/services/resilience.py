@@ -0,0 +1,311 @@
+import os
+import time
+import random
+import asyncio
+import functools
+import contextlib
+import contextvars
+from collections import deque
+
+from services.admission import upstream, UpstreamBusy
+from services.metrics import observe
+
+# Resilient upstream calls for STT, TTS and the LLM.
+# call() tries each alternative (primary voice/model first) whose circuit is
+# closed: an attempt that runs past the target's recent p95 gets a hedged
+# duplicate, failed attempts are retried with jittered backoff, and a target
+# that keeps failing has its circuit opened so calls fail over to the next
+# alternative at once instead of waiting out another timeout. Everything
+# stays within the caller's deadline.
+
+# Retries per alternative after the first attempt (errors and timeouts)
+UPSTREAM_RETRIES = int(os.getenv("UPSTREAM_RETRIES", "1"))
+# Backoff before retry n is uniform(0, UPSTREAM_BACKOFF * 2**n) seconds
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.2"))
+# Set to 0 to disable hedged requests
+UPSTREAM_HEDGE = os.getenv("UPSTREAM_HEDGE", "1") != "0"
+# Hedges allowed, as a fraction of calls (caps the extra upstream load)
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.1"))
+# Latency samples needed before hedging starts, and the floor on its delay
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+HEDGE_WINDOW = 200
+# Consecutive failures that open a circuit, and how long it stays open
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+# Whole-turn budget propagated to every upstream call made for the turn
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "25"))
+
+_deadline = contextvars.ContextVar("upstream_deadline", default=None)
+
+
+class UpstreamError(Exception):
+    """Every alternative failed, timed out or had its circuit open."""
+
+
+class CircuitBreaker:
+    """closed -> open after BREAKER_FAILURES in a row -> half_open (one probe) after BREAKER_COOLDOWN."""
+
+    def __init__(self):
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < BREAKER_COOLDOWN:
+                return False
+            self.state = "half_open"
+            self._probing = False
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= BREAKER_FAILURES):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.opens += 1
+
+    def abandon(self):
+        # A probe cancelled by barge-in proved nothing; let the next call probe
+        self._probing = False
+
+
+class Target:
+    """One voice, model or config of a provider: its circuit, latency window and counters."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self._samples = deque(maxlen=HEDGE_WINDOW)
+        self._recorded = 0
+        self._p95 = None
+        self.stats = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0, "retries": 0,
+                      "hedged": 0, "hedge_wins": 0, "failovers": 0, "short_circuited": 0}
+
+    def record(self, seconds: float):
+        """Time an attempt took, whatever its outcome; slow failures are the tail too."""
+        self._samples.append(seconds)
+        self._recorded += 1
+        # Re-sorting every 10 samples is plenty for a hedge threshold
+        if self._p95 is None or (len(self._samples) >= HEDGE_MIN_SAMPLES and self._recorded % 10 == 0):
+            ordered = sorted(self._samples)
+            self._p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+    def hedge_delay(self):
+        if len(self._samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self._p95)
+
+    def snapshot(self) -> dict:
+        delay = self.hedge_delay()
+        return {
+            **self.stats,
+            "circuit": self.breaker.state,
+            "circuit_opens": self.breaker.opens,
+            "consecutive_failures": self.breaker.failures,
+            "p95_ms": round(self._p95 * 1000, 1) if self._p95 is not None else None,
+            "hedge_after_ms": round(delay * 1000, 1) if delay is not None else None,
+        }
+
+
+_targets = {}
+_discarding = set()  # keeps cleanup tasks referenced
+
+
+def _target(name: str) -> Target:
+    target = _targets.get(name)
+    if target is None:
+        target = _targets[name] = Target(name)
+    return target
+
+
+@contextlib.contextmanager
+def deadline(seconds: float = TURN_DEADLINE):
+    """Upstream calls inside the block (and tasks it starts) finish within `seconds`."""
+    current = _deadline.get()
+    token = _deadline.set(min(current or float("inf"), time.monotonic() + seconds))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def detach_deadline():
+    """Background work started from a turn: the turn's deadline no longer applies."""
+    _deadline.set(None)
+
+
+def _retryable(error: Exception) -> bool:
+    # 4xx from OpenAI (status_code) or Google (code) will fail the same way
+    # again, except timeouts and rate limiting
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int) and 400 <= status < 500 and status not in (408, 429):
+        return False
+    return True
+
+
+def _may_hedge(provider: str, target: Target) -> bool:
+    if not UPSTREAM_HEDGE or target.breaker.state != "closed":
+        return False
+    # Never hedge into a queue: a duplicate would only wait behind the original
+    if upstream(provider).stats["waiting"] > 0:
+        return False
+    return target.stats["hedged"] < HEDGE_BUDGET * target.stats["calls"] + 1
+
+
+async def _discard(task, discard):
+    """Releases a result nobody will use (a losing hedge that also finished)."""
+    if discard is None or task.cancelled() or task.exception() is not None:
+        return
+    try:
+        await discard(task.result())
+    except Exception as e:
+        print(f"Upstream discard error: {e}")
+
+
+def _discard_later(task, discard):
+    if not task.cancelled() and task.exception() is None:
+        cleanup = asyncio.ensure_future(_discard(task, discard))
+        _discarding.add(cleanup)
+        cleanup.add_done_callback(_discarding.discard)
+
+
+async def _attempt(provider: str, target: Target, fn, timeout: float, discard):
+    """fn(timeout), hedged with a second fn(timeout) once it runs past the target's p95."""
+    started = time.perf_counter()
+    ends = time.monotonic() + timeout
+    target.stats["calls"] += 1
+    tasks = [asyncio.create_task(fn(timeout))]
+    pending = set(tasks)
+    winner = None
+    error = None
+    try:
+        delay = target.hedge_delay() if _may_hedge(provider, target) else None
+        if delay is not None and delay < timeout:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                target.stats["hedged"] += 1
+                tasks.append(asyncio.create_task(fn(max(0.0, ends - time.monotonic()))))
+                pending.add(tasks[-1])
+            else:
+                pending = done
+        while winner is None and pending:
+            done, pending = await asyncio.wait(pending, timeout=max(0.0, ends - time.monotonic()),
+                                               return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                error = asyncio.TimeoutError(f"{target.name}: no response within {timeout:.1f}s")
+                target.stats["timeouts"] += 1
+                break
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    winner = winner or task
+                else:
+                    error = task.exception()
+    except asyncio.CancelledError:
+        target.breaker.abandon()
+        raise
+    finally:
+        for task in tasks:
+            if task is winner:
+                continue
+            if not task.done():
+                task.cancel()
+                if discard is not None:
+                    # The cancel can be swallowed (wait_for racing a result);
+                    # a loser that still succeeds is released when it ends
+                    task.add_done_callback(functools.partial(_discard_later, discard=discard))
+            else:
+                await _discard(task, discard)
+
+    if winner is None:
+        error = error or asyncio.TimeoutError(f"{target.name}: cancelled")
+        if isinstance(error, UpstreamBusy):
+            target.breaker.abandon()
+            raise error  # no capacity is not a provider failure
+        target.record(time.perf_counter() - started)
+        target.stats["failures"] += 1
+        target.breaker.failure()
+        raise error
+
+    seconds = time.perf_counter() - started
+    target.stats["successes"] += 1
+    if winner is not tasks[0]:
+        target.stats["hedge_wins"] += 1
+    target.breaker.success()
+    target.record(seconds)
+    observe(f"upstream.{target.name}", seconds, started)
+    return winner.result()
+
+
+async def call(provider: str, alternatives: list, timeout: float, budget: float = None, discard=None):
+    """
+    Runs one upstream request. alternatives is [(target name, fn)], primary
+    first; fn(timeout) makes the request and must finish within timeout.
+    All attempts together take at most `budget` (default twice timeout) and
+    end by the turn's deadline. Raises UpstreamError once every alternative
+    has failed or is short-circuited, or time is up.
+    discard(result) releases the result of a losing hedge, if needed.
+    """
+    ends = time.monotonic() + (budget if budget is not None else 2 * timeout)
+    turn_deadline = _deadline.get()
+    if turn_deadline is not None:
+        ends = min(ends, turn_deadline)
+
+    last_error = None
+    for index, (name, fn) in enumerate(alternatives):
+        if ends - time.monotonic() <= 0:
+            break
+        target = _target(name)
+        if not target.breaker.allow():
+            target.stats["short_circuited"] += 1
+            continue
+        if index > 0:
+            target.stats["failovers"] += 1
+        for attempt in range(UPSTREAM_RETRIES + 1):
+            remaining = ends - time.monotonic()
+            if remaining <= 0:
+                target.breaker.abandon()
+                break
+            try:
+                return await _attempt(provider, target, fn, min(timeout, remaining), discard)
+            except UpstreamBusy:
+                raise
+            except Exception as e:
+                last_error = e
+                if attempt == UPSTREAM_RETRIES or not _retryable(e) or target.breaker.state != "closed":
+                    break
+                target.stats["retries"] += 1
+                backoff = random.uniform(0, UPSTREAM_BACKOFF * 2 ** attempt)
+                await asyncio.sleep(min(backoff, max(0.0, ends - time.monotonic())))
+
+    if last_error is None:
+        raise UpstreamError(f"{provider}: all circuits open or deadline passed")
+    raise UpstreamError(f"{provider}: {last_error}") from last_error
+
+
+def get_upstream_call_stats() -> dict:
+    return {
+        "retries": UPSTREAM_RETRIES,
+        "hedging": UPSTREAM_HEDGE,
+        "hedge_budget": HEDGE_BUDGET,
+        "breaker_failures": BREAKER_FAILURES,
+        "breaker_cooldown_seconds": BREAKER_COOLDOWN,
+        "turn_deadline_seconds": TURN_DEADLINE,
+        "targets": {name: t.snapshot() for name, t in sorted(_targets.items())},
+    }
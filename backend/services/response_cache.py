@@ -0,0 +1,135 @@
+import os
+import re
+import time
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from services.config import get_config_value, get_config_version, on_config_change
+from services.prompts import local_now
+from services.response_parser import REVIEW_TAG, CONFIRM_TAG
+
+# Cache of model replies for common turns ("I want to book a table", "two
+# people", "yes"). Keyed on the normalized utterance plus a digest of the
+# dialogue state, so the same words at a different stage of the call miss.
+# Enabled from the admin settings (LLM_RESPONSE_CACHE=true); off by default.
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "512"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+
+# Fields that identify the caller: only whether they are known enters the
+# key, never their values
+PERSONAL_FIELDS = ("name", "phone")
+# A turn whose utterance matches this is about the caller's identity and is
+# never looked up or stored. Names themselves cannot be detected, so the
+# words that introduce them ("my name is ...") and long numbers are matched.
+_PERSONAL_HINTS = re.compile(r"নাম|name|নম্বর|নাম্বার|মোবাইল|ফোন|phone|number|\d{4,}", re.IGNORECASE)
+# Bengali vowel signs and the virama are not \w; keep the whole Bengali block
+_PUNCTUATION = re.compile(r"[^\w\s\u0980-\u09ff]|_")
+_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # key -> (expires_at, reply)
+_stats = {"hits": 0, "misses": 0, "stores": 0, "expired": 0, "evictions": 0,
+          "skipped_personal": 0, "skipped_uncacheable": 0}
+
+
+def enabled() -> bool:
+    return get_config_value("LLM_RESPONSE_CACHE", "false").strip().lower() in ("1", "true", "yes", "on")
+
+
+def normalize(utterance: str) -> str:
+    """Case, punctuation (incl. the danda), digit script and spacing folded away."""
+    text = (utterance or "").translate(_DIGITS).lower()
+    return " ".join(_PUNCTUATION.sub(" ", text).split())
+
+
+def is_personal(utterance: str) -> bool:
+    return bool(_PERSONAL_HINTS.search(normalize(utterance)))
+
+
+def state_digest(reservation) -> dict:
+    """
+    What the reply may depend on besides the words: booking details so far
+    (identity fields only as present/absent), whether details were reviewed,
+    the settings version and today's date.
+    """
+    gathered = reservation.gathered() if reservation is not None else {}
+    return {
+        "fields": {k: (True if k in PERSONAL_FIELDS else v) for k, v in sorted(gathered.items())},
+        "reviewed": reservation is not None and reservation.review is not None,
+        "config": get_config_version(),
+        "day": local_now().date().isoformat(),
+    }
+
+
+def cache_key(utterance: str, reservation) -> str:
+    payload = json.dumps([normalize(utterance), state_digest(reservation)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def lookup(key: str):
+    """The cached reply for key, or None."""
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            _stats["misses"] += 1
+            return None
+        expires_at, reply = entry
+        if expires_at < now:
+            del _entries[key]
+            _stats["expired"] += 1
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        _stats["hits"] += 1
+        return reply
+
+
+def store(key: str, reply: str, reservation=None, tool_calls: bool = False):
+    """
+    Caches reply unless it must not be reused: tool answers depend on live
+    availability, tagged replies carry review data or confirm a booking, and
+    replies quoting the caller's details are personal.
+    """
+    if tool_calls or not reply or REVIEW_TAG in reply or CONFIRM_TAG in reply:
+        _stats["skipped_uncacheable"] += 1
+        return
+    known = [str(v) for k, v in (reservation.fields.items() if reservation is not None else ()) if k in PERSONAL_FIELDS and v]
+    if any(value in reply for value in known) or re.search(r"\d{5,}", reply.translate(_DIGITS)):
+        _stats["skipped_personal"] += 1
+        return
+    with _lock:
+        _entries[key] = (time.monotonic() + LLM_CACHE_TTL, reply)
+        _entries.move_to_end(key)
+        _stats["stores"] += 1
+        while len(_entries) > LLM_CACHE_SIZE:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def skip_personal():
+    _stats["skipped_personal"] += 1
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+@on_config_change
+def _on_config_change(changed_keys):
+    # A new system prompt or model setting makes every cached reply stale
+    clear()
+
+
+def get_response_cache_stats() -> dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "hit_rate": round(_stats["hits"] / lookups, 4) if lookups else 0.0,
+        "entries": len(_entries),
+        "max_entries": LLM_CACHE_SIZE,
+        "ttl_seconds": LLM_CACHE_TTL,
+    }
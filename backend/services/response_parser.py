@@ -0,0 +1,223 @@
+import re
+import json
+
+# Single-pass, incremental parser for streamed LLM replies.
+# One scan over each delta separates speakable sentences, control tags and
+# the {...} reservation JSON, so nothing ever re-scans a reply or the history.
+
+REVIEW_TAG = "[REVIEW_DETAILS]"
+CONFIRM_TAG = "[CONFIRM_RESERVATION]"
+CONTROL_TAGS = (REVIEW_TAG, CONFIRM_TAG)
+
+# Sentence boundaries for Bengali and English. '.' only counts when followed
+# by whitespace so times like "7.30" are not split.
+SENTENCE_ENDINGS = "।?!"
+# An unknown "[...]" longer than this is treated as plain text
+MAX_TAG_LENGTH = 32
+# Characters that need the slow path in text mode; everything else is copied in bulk
+_TEXT_SPECIAL = re.compile(r"[\[{*।?!.]")
+_JSON_SPECIAL = re.compile(r'["\\{}]')
+
+RESERVATION_FIELDS = ("name", "phone", "date", "time", "people")
+
+_BENGALI_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+_PHONE_RE = re.compile(r"(?:\+?88)?0?1[3-9]\d{8}")
+
+
+class ResponseScanner:
+    """
+    Incremental scanner over a streamed reply.
+
+    feed() returns events in stream order:
+      ("sentence", text)  speakable text, tags/JSON/markdown removed
+      ("tag", tag)        a control tag such as [REVIEW_DETAILS]
+      ("json", obj)       a complete top-level {...} (None if it is not valid JSON)
+    JSON is matched by brace depth with string/escape awareness, so braces
+    inside quoted values do not end the object early.
+    """
+
+    def __init__(self):
+        self._chunks = []   # raw reply so far
+        self._buf = []      # speakable text of the current sentence
+        self._tag = None    # partial "[...]" being read
+        self._period = False  # last char was '.', sentence ends if whitespace follows
+        self._json = None   # partial {...} being read
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chunks)
+
+    def feed(self, delta: str) -> list:
+        self._chunks.append(delta)
+        events = []
+        i, n = 0, len(delta)
+        while i < n:
+            if self._json is not None:
+                i = self._scan_json(delta, i, events)
+                continue
+
+            ch = delta[i]
+            if self._tag is not None:
+                self._tag.append(ch)
+                i += 1
+                if ch == "]":
+                    tag = "".join(self._tag)
+                    self._tag = None
+                    if tag in CONTROL_TAGS:
+                        self._emit_sentence(events)
+                        events.append(("tag", tag))
+                    else:
+                        self._buf.append(tag)
+                elif len(self._tag) > MAX_TAG_LENGTH:
+                    self._buf.append("".join(self._tag))
+                    self._tag = None
+                continue
+
+            if self._period:
+                self._period = False
+                if ch.isspace():
+                    self._emit_sentence(events)
+
+            # Copy plain text up to the next special character in one go
+            match = _TEXT_SPECIAL.search(delta, i)
+            end = match.start() if match else n
+            if end > i:
+                self._buf.append(delta[i:end])
+                i = end
+                continue
+
+            i += 1
+            if ch == "{":
+                self._emit_sentence(events)
+                self._json = ["{"]
+                self._depth = 1
+            elif ch == "[":
+                self._tag = [ch]
+            elif ch == "*":
+                continue  # Remove markdown bolds
+            elif ch in SENTENCE_ENDINGS:
+                self._buf.append(ch)
+                self._emit_sentence(events)
+            else:
+                self._buf.append(ch)
+                self._period = ch == "."
+        return events
+
+    def _scan_json(self, delta: str, i: int, events: list) -> int:
+        start = i
+        n = len(delta)
+        if self._escape and i < n:
+            # Escaped char split across deltas
+            self._escape = False
+            i += 1
+        while i < n:
+            # Jump to the next quote, backslash or brace
+            match = _JSON_SPECIAL.search(delta, i)
+            if match is None:
+                i = n
+                break
+            ch = match.group()
+            i = match.end()
+            if self._in_string:
+                if ch == "\\":
+                    if i < n:
+                        i += 1  # skip the escaped char
+                    else:
+                        self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._json.append(delta[start:i])
+                    raw = "".join(self._json)
+                    self._json = None
+                    try:
+                        events.append(("json", json.loads(raw)))
+                    except json.JSONDecodeError:
+                        print(f"Failed to parse reply JSON: {raw[:20]}...")
+                        events.append(("json", None))
+                    return i
+        self._json.append(delta[start:i])
+        return i
+
+    def flush(self) -> list:
+        """Emits whatever is left once the stream has ended."""
+        events = []
+        if self._tag is not None:
+            self._buf.append("".join(self._tag))
+            self._tag = None
+        if self._json is not None:
+            # Unterminated object: drop it rather than speak raw JSON
+            print("Reply ended inside a JSON object")
+            self._json = None
+        self._emit_sentence(events)
+        return events
+
+    def _emit_sentence(self, events: list):
+        sentence = "".join(self._buf).strip()
+        self._buf = []
+        if sentence:
+            events.append(("sentence", sentence))
+
+
+def scan_response(text: str) -> list:
+    """Parses a complete reply; same events as feeding it in one delta."""
+    scanner = ResponseScanner()
+    return scanner.feed(text) + scanner.flush()
+
+
+class ReservationState:
+    """
+    Reservation details for one call, updated as each turn arrives so that
+    confirmation is a lookup instead of a history rescan.
+    """
+
+    def __init__(self, fields: dict = None, review: dict = None):
+        self.fields = dict(fields or {})
+        self.review = review  # last [REVIEW_DETAILS] payload shown to the caller
+
+    def set_review(self, data: dict):
+        self.review = data
+        self.fields.update({k: data[k] for k in RESERVATION_FIELDS if data.get(k)})
+
+    def observe(self, msg: dict):
+        """Picks up fields from a history message (caller phone, tool arguments)."""
+        role = msg.get("role")
+        if role == "user":
+            content = (msg.get("content") or "").translate(_BENGALI_DIGITS)
+            phone = _PHONE_RE.search(content.replace(" ", "").replace("-", ""))
+            if phone:
+                self.fields["phone"] = phone.group()
+        elif role == "assistant":
+            for call in msg.get("tool_calls") or []:
+                try:
+                    args = json.loads(call["function"]["arguments"] or "{}")
+                except json.JSONDecodeError:
+                    continue
+                self.fields.update({k: args[k] for k in ("date", "time", "people") if args.get(k)})
+
+    def confirmation_data(self):
+        """Data to confirm: the reviewed payload, else gathered fields if complete enough."""
+        if self.review is not None:
+            return self.review
+        if all(self.fields.get(k) for k in ("name", "phone")):
+            return {k: self.fields[k] for k in RESERVATION_FIELDS if k in self.fields}
+        return None
+
+    def gathered(self) -> dict:
+        return {k: self.fields[k] for k in RESERVATION_FIELDS if self.fields.get(k)}
+
+    def to_dict(self) -> dict:
+        return {"fields": self.fields, "review": self.review}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(data.get("fields"), data.get("review"))
@@ -0,0 +1,226 @@
+import os
+import json
+import asyncio
+import time
+import uuid
+import hashlib
+import secrets
+import sqlite3
+import threading
+
+from services.executor import run_blocking
+from services.history import ConversationHistory
+from services.metrics import timed
+
+# Call state outside the worker process.
+# Each /ws call gets a session id and a resume token; the conversation is
+# saved after every turn, so a reconnect carrying ?resume=<token> picks the
+# call up again on any worker that shares the store.
+#
+# SESSION_STORE=memory  per-process dict (single worker, the default)
+# SESSION_STORE=sqlite  one SQLite file shared by all workers on the host
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+SESSION_STORE_PATH = os.getenv(
+    "SESSION_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".sessions.db"),
+)
+# A dropped call can be resumed for this long after its last turn (seconds)
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+
+_stats = {"created": 0, "resumed": 0, "resume_misses": 0, "saves": 0, "deletes": 0, "errors": 0}
+
+
+def _token_key(token: str) -> str:
+    # Only a hash of the token is stored, so a leaked store cannot resume calls
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class MemorySessionStore:
+    """Sessions in this process only; resume works while the worker lives."""
+
+    name = "memory"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}  # token key -> (expires_at, payload json)
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            if row[0] < time.time():
+                del self._rows[key]
+                return None
+            return row[1]
+
+    def put(self, key: str, payload: str):
+        with self._lock:
+            self._rows[key] = (time.time() + SESSION_TTL, payload)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._rows.pop(key, None)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [k for k, row in self._rows.items() if row[0] < now]
+            for k in expired:
+                del self._rows[k]
+        return len(expired)
+
+    def count(self) -> int:
+        return len(self._rows)
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite file (WAL mode) so every uvicorn worker on the host
+    sees the same calls.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "token_key TEXT PRIMARY KEY, expires_at REAL NOT NULL, payload TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT payload FROM sessions WHERE token_key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, payload: str):
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (token_key, expires_at, payload) VALUES (?, ?, ?)",
+                (key, time.time() + SESSION_TTL, payload),
+            )
+
+    def delete(self, key: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM sessions WHERE token_key = ?", (key,))
+
+    def purge_expired(self) -> int:
+        with self._conn() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at < ?", (time.time(),)).rowcount
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def _create_store():
+    if SESSION_STORE == "sqlite":
+        try:
+            return SQLiteSessionStore(SESSION_STORE_PATH)
+        except Exception as e:
+            print(f"Session Store Error: {e}, falling back to memory")
+    elif SESSION_STORE != "memory":
+        print(f"Unknown SESSION_STORE '{SESSION_STORE}', using memory")
+    return MemorySessionStore()
+
+
+_store = _create_store()
+
+
+def new_session() -> dict:
+    """A fresh call: new id, new resume token, empty history."""
+    _stats["created"] += 1
+    return {
+        "session_id": uuid.uuid4().hex[:12],
+        "resume_token": secrets.token_urlsafe(24),
+        "conversation_history": ConversationHistory(),
+        "turn_count": 0,
+    }
+
+
+def _serialize(session: dict) -> str:
+    return json.dumps({
+        "session_id": session["session_id"],
+        "conversation_history": session["conversation_history"].to_dict(),
+        "turn_count": session.get("turn_count", 0),
+    }, ensure_ascii=False)
+
+
+@timed("session_store.load")
+async def resume_session(token: str):
+    """Loads the session for a resume token, or None if unknown or expired."""
+    try:
+        payload = await run_blocking("session_store", _store.get, _token_key(token))
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"Session Load Error: {e}")
+        payload = None
+    if payload is None:
+        _stats["resume_misses"] += 1
+        return None
+    data = json.loads(payload)
+    _stats["resumed"] += 1
+    return {
+        "session_id": data["session_id"],
+        "resume_token": token,
+        "conversation_history": ConversationHistory.from_dict(data["conversation_history"]),
+        "turn_count": data.get("turn_count", 0),
+    }
+
+
+@timed("session_store.save")
+async def save_session(session: dict):
+    """Persists the session after a turn; also pushes its expiry forward."""
+    try:
+        await run_blocking("session_store", _store.put, _token_key(session["resume_token"]), _serialize(session))
+        _stats["saves"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"Session Save Error: {e}")
+
+
+async def delete_session(session: dict):
+    """Drops a finished call so its token can no longer resume it."""
+    try:
+        await run_blocking("session_store", _store.delete, _token_key(session["resume_token"]))
+        _stats["deletes"] += 1
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"Session Delete Error: {e}")
+
+
+async def purge_expired_sessions() -> int:
+    try:
+        return await run_blocking("session_store", _store.purge_expired)
+    except Exception as e:
+        _stats["errors"] += 1
+        print(f"Session Purge Error: {e}")
+        return 0
+
+
+async def purge_loop(interval: float = 600):
+    """Background task: drops expired sessions every `interval` seconds."""
+    while True:
+        await purge_expired_sessions()
+        await asyncio.sleep(interval)
+
+
+def get_session_store_stats() -> dict:
+    try:
+        stored = _store.count()
+    except Exception:
+        stored = None
+    return {**_stats, "backend": _store.name, "stored": stored, "ttl_seconds": SESSION_TTL}
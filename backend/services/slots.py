@@ -0,0 +1,247 @@
+import os
+import re
+import time
+import itertools
+import threading
+
+from services import db
+from services.config import get_config_value, on_config_change
+
+# Capacity-aware availability.
+# Each date gets an in-memory occupancy index: fixed-length time buckets
+# holding the seats (and tables) in use. A booking occupies every bucket its
+# seating duration touches. The index is built from the date's Reservation
+# rows, rebuilt once it is SLOT_INDEX_TTL old, and answers checks without
+# touching the DB.
+
+# How long a date's index is trusted before the date is reloaded (seconds).
+# Bookings made through this backend are applied immediately via record_booking.
+SLOT_INDEX_TTL = float(os.getenv("SLOT_INDEX_TTL", "60"))
+
+_BENGALI_DIGITS = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
+
+_lock = threading.Lock()
+_days = {}  # "DD-MM-YYYY" -> DayOccupancy
+_settings = {"value": None}
+
+
+def parse_people(people) -> int:
+    """'2', '৪', '4 জন', 3 -> int. Unknown values count as a table for two."""
+    match = re.search(r"\d+", str(people or "").translate(_BENGALI_DIGITS))
+    return max(1, int(match.group())) if match else 2
+
+
+def _int_config(key: str, default: int) -> int:
+    try:
+        return int(get_config_value(key, str(default)))
+    except ValueError:
+        return default
+
+
+def get_settings() -> dict:
+    """
+    Operating hours, slot length and capacity from SystemConfig (env/defaults
+    otherwise). Cached until the config changes.
+    """
+    settings = _settings["value"]
+    if settings is None:
+        opening = db.parse_time_minutes(get_config_value("OPENING_TIME", "10:00 AM"))
+        closing = db.parse_time_minutes(get_config_value("CLOSING_TIME", "11:00 PM"))
+        settings = {
+            "opening": 10 * 60 if opening is None else opening,
+            "closing": 23 * 60 if closing is None else closing,
+            "slot_minutes": max(5, _int_config("SLOT_MINUTES", 30)),
+            "seating_minutes": max(5, _int_config("SEATING_MINUTES", 90)),
+            "seat_capacity": _int_config("SEAT_CAPACITY", 40),
+            "table_count": _int_config("TABLE_COUNT", 0),  # 0 = only count seats
+            "table_size": max(1, _int_config("TABLE_SIZE", 4)),
+        }
+        _settings["value"] = settings
+    return settings
+
+
+@on_config_change
+def _on_config_change(changed_keys):
+    # New hours/capacity change the bucket layout: rebuild lazily
+    _settings["value"] = None
+    with _lock:
+        _days.clear()
+
+
+class DayOccupancy:
+    """Seats and tables in use per time bucket for one date."""
+
+    def __init__(self, date: str, settings: dict):
+        self.date = date
+        self.settings = settings
+        self.slot = settings["slot_minutes"]
+        buckets = (24 * 60 + settings["seating_minutes"]) // self.slot + 1
+        self.seats = [0] * buckets
+        self.tables = [0] * buckets
+        self.ids = set()
+        # Bookings applied via record_booking: id -> (minutes, people, recorded_at)
+        self.recorded = {}
+        self.loaded_at = 0.0
+
+    def _span(self, minutes: int):
+        first = minutes // self.slot
+        last = (minutes + self.settings["seating_minutes"] - 1) // self.slot
+        return range(first, min(last, len(self.seats) - 1) + 1)
+
+    def _tables_for(self, people: int) -> int:
+        return -(-people // self.settings["table_size"])
+
+    def add(self, minutes: int, people: int):
+        tables = self._tables_for(people)
+        for b in self._span(minutes):
+            self.seats[b] += people
+            self.tables[b] += tables
+
+    def fits(self, minutes: int, people: int) -> bool:
+        capacity = self.settings["seat_capacity"]
+        table_count = self.settings["table_count"]
+        tables = self._tables_for(people)
+        for b in self._span(minutes):
+            if self.seats[b] + people > capacity:
+                return False
+            if table_count and self.tables[b] + tables > table_count:
+                return False
+        return True
+
+    def apply_rows(self, rows):
+        for booking_id, time_str, people in rows:
+            self.ids.add(booking_id)
+            minutes = db.parse_time_minutes(time_str)
+            if minutes is not None:
+                self.add(minutes, parse_people(people))
+
+    def carry_recorded(self, previous, fetch_started: float):
+        """
+        Re-applies bookings recorded on the previous index that this reload
+        may have missed: only those recorded after the fetch began (anything
+        older was committed before it, so if it is absent it was deleted).
+        """
+        for booking_id, (minutes, people, recorded_at) in previous.recorded.items():
+            if booking_id not in self.ids and recorded_at >= fetch_started:
+                self.recorded[booking_id] = (minutes, people, recorded_at)
+                self.add(minutes, people)
+
+
+_loading = set()  # dates being reloaded right now
+_local_ids = itertools.count(-1, -1)  # keys for bookings recorded without a DB id
+
+
+def _get_day(date: str) -> DayOccupancy:
+    """
+    The date's index. Past SLOT_INDEX_TTL the whole date is reloaded, so
+    bookings deleted or edited in the admin UI stop counting. The DB read
+    happens outside the lock; other callers keep using the old index meanwhile.
+    """
+    settings = get_settings()
+    with _lock:
+        day = _days.get(date)
+        if day is not None and (time.monotonic() - day.loaded_at < SLOT_INDEX_TTL or date in _loading):
+            return day
+        _loading.add(date)
+
+    fetch_started = time.monotonic()
+    try:
+        rows = db.fetch_reservations(date)
+    except Exception as e:
+        print(f"Slot Index Load Error: {e}")
+        rows = None
+
+    with _lock:
+        _loading.discard(date)
+        current = _days.get(date)
+        if rows is None:
+            # Keep what we have (or an empty index) and retry after the TTL
+            if current is None:
+                current = _days[date] = DayOccupancy(date, settings)
+            current.loaded_at = time.monotonic()
+            return current
+        fresh = DayOccupancy(date, settings)
+        fresh.apply_rows(rows)
+        if current is not None:
+            fresh.carry_recorded(current, fetch_started)
+        fresh.loaded_at = time.monotonic()
+        _days[date] = fresh
+        return fresh
+
+
+def record_booking(date_str: str, time_str: str, people, booking_id: int = None):
+    """
+    Applies a new booking to the index immediately (no reload needed).
+    Blocking: it may load the date from the DB, so async callers go through
+    run_blocking.
+    """
+    date = db.normalize_date(date_str)
+    minutes = db.parse_time_minutes(time_str)
+    if minutes is None:
+        return
+    day = _get_day(date)
+    party = parse_people(people)
+    with _lock:
+        day = _days.get(date, day)
+        if booking_id is None:
+            booking_id = next(_local_ids)
+        elif booking_id in day.ids or booking_id in day.recorded:
+            return  # already loaded from the table
+        day.recorded[booking_id] = (minutes, party, time.monotonic())
+        day.add(minutes, party)
+
+
+def _closed_reason(minutes: int, time_str: str, settings: dict):
+    if settings["opening"] <= minutes <= settings["closing"]:
+        return None
+    opening = db.format_time_minutes(settings["opening"])
+    closing = db.format_time_minutes(settings["closing"])
+    return f"Restaurant is closed at {time_str}. Open from {opening} to {closing}."
+
+
+def check_availability(date_str: str, time_str: str, people=None) -> dict:
+    """
+    Checks if a party of `people` fits at date/time, considering seating
+    duration and capacity.
+    """
+    minutes = db.parse_time_minutes(time_str)
+    if minutes is None:
+        return {"available": True, "reason": "Time format unclear, checking skipped."}
+
+    settings = get_settings()
+    closed = _closed_reason(minutes, time_str, settings)
+    if closed:
+        return {"available": False, "reason": closed}
+
+    party = parse_people(people)
+    day = _get_day(db.normalize_date(date_str))
+    if day.fits(minutes, party):
+        return {"available": True, "reason": "Slot is free."}
+    return {"available": False, "reason": f"Time {time_str} is fully booked for {party} people."}
+
+
+def find_alternatives(date_str: str, time_str: str = None, people=None, count: int = 3) -> list:
+    """
+    Returns up to `count` open slot times ("hh:mm AM") that fit the party,
+    nearest to time_str first (or earliest first when no time is given).
+    """
+    settings = get_settings()
+    party = parse_people(people)
+    day = _get_day(db.normalize_date(date_str))
+    requested = db.parse_time_minutes(time_str) if time_str else None
+
+    candidates = range(settings["opening"], settings["closing"] + 1, settings["slot_minutes"])
+    if requested is not None:
+        candidates = sorted(candidates, key=lambda m: (abs(m - requested), m))
+
+    free = []
+    for minutes in candidates:
+        if minutes != requested and day.fits(minutes, party):
+            free.append(minutes)
+            if len(free) >= count:
+                break
+    return [db.format_time_minutes(m) for m in sorted(free)]
+
+
+def get_slot_index_stats() -> dict:
+    return {"dates_indexed": len(_days), "settings": get_settings(), "ttl_seconds": SLOT_INDEX_TTL}
@@ -1,28 +1,55 @@
 import os
-import json
-from google.cloud import speech_v1 as speech
-from google.oauth2 import service_account
+import queue
+import asyncio
 
+from services import clients
+from services.lazy import LazyModule
 from services.config import get_config_value
+from services.executor import run_blocking
+from services.admission import upstream
+from services import resilience
+from services.metrics import timed
+
+# Per-attempt deadline for recognize (seconds)
+STT_TIMEOUT = float(os.getenv("STT_TIMEOUT", "10"))
+# Recognition model, and the one recognize fails over to while its circuit is open
+STT_MODEL = os.getenv("STT_MODEL", "default")
+STT_FALLBACK_MODEL = os.getenv("STT_FALLBACK_MODEL", "latest_long")
+# Upper bound on one streaming utterance (Google caps streams at ~5 minutes)
+STT_STREAM_TIMEOUT = float(os.getenv("STT_STREAM_TIMEOUT", "30"))
+
+# Imported on first use; it pulls in grpc
+speech = LazyModule("google.cloud.speech_v1")
 
 def get_google_speech_client():
     """
-    Create Google Cloud Speech client using credentials from config.
+    Returns the shared Google Cloud Speech client for the configured credentials.
     Uses same credentials as TTS (GOOGLE_TTS_CREDENTIALS).
+    The client (and its gRPC channel) is built once and reused until the
+    credentials change.
     """
     try:
         # Get JSON credentials from database config (same as TTS)
         credentials_json = get_config_value("GOOGLE_TTS_CREDENTIALS")
         
         if credentials_json and credentials_json.strip():
-            credentials_dict = json.loads(credentials_json)
-            credentials = service_account.Credentials.from_service_account_info(credentials_dict)
-            return speech.SpeechClient(credentials=credentials)
+            credentials = clients.get_google_credentials(credentials_json)
+            if credentials is None:
+                return None
+            return clients.get_or_create(
+                "google_speech",
+                clients.fingerprint(credentials_json),
+                lambda: speech.SpeechClient(credentials=credentials),
+            )
         
         # Fallback: Environment variable for credentials file path
         credentials_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
         if credentials_path and os.path.exists(credentials_path):
-            return speech.SpeechClient()
+            return clients.get_or_create(
+                "google_speech",
+                clients.fingerprint("env", credentials_path),
+                speech.SpeechClient,
+            )
         
         print("ERROR: No Google Cloud credentials found!")
         return None
@@ -31,40 +58,60 @@ def get_google_speech_client():
         print(f"Error creating Google Speech client: {e}")
         return None
 
+def _recognition_config(model: str = STT_MODEL):
+    return speech.RecognitionConfig(
+        encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
+        sample_rate_hertz=48000,  # WebM default
+        language_code="bn-BD",  # Bangladeshi Bengali
+        alternative_language_codes=["bn-IN", "en-US"],  # Fallbacks
+        enable_automatic_punctuation=True,
+        model=model,
+    )
+
+def _recognize(audio_bytes: bytes, timeout: float, model: str = STT_MODEL) -> str:
+    """
+    Blocking recognize call; runs in the upstream thread pool.
+    """
+    client = get_google_speech_client()
+    
+    if client is None:
+        print("ERROR: Google Cloud Speech client not available!")
+        return ""
+    
+    # Configure audio - WebM from browser
+    audio = speech.RecognitionAudio(content=audio_bytes)
+    config = _recognition_config(model)
+    
+    # Synchronous recognition (for short audio < 1 min)
+    response = client.recognize(config=config, audio=audio, timeout=timeout)
+    
+    # Combine all results
+    transcript = ""
+    for result in response.results:
+        transcript += result.alternatives[0].transcript + " "
+    
+    return transcript.strip()
+
+def _recognize_with(audio_bytes: bytes, model: str):
+    async def attempt(timeout: float) -> str:
+        async with upstream("stt"):
+            return await run_blocking("stt", _recognize, audio_bytes, timeout, model, timeout=timeout)
+    return attempt
+
+@timed("stt")
 async def transcribe_audio(audio_bytes: bytes) -> str:
     """
     Transcribes audio using Google Cloud Speech-to-Text.
     Optimized for Bengali (bn-BD) language.
+    The blocking gRPC call runs in the upstream pool, never on the event loop;
+    slow attempts are hedged and failures retried or failed over (resilience).
     """
+    models = [STT_MODEL] + [m for m in (STT_FALLBACK_MODEL,) if m and m != STT_MODEL]
     try:
-        client = get_google_speech_client()
-        
-        if client is None:
-            print("ERROR: Google Cloud Speech client not available!")
-            return ""
-        
-        # Configure audio - WebM from browser
-        audio = speech.RecognitionAudio(content=audio_bytes)
-        
-        config = speech.RecognitionConfig(
-            encoding=speech.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-            sample_rate_hertz=48000,  # WebM default
-            language_code="bn-BD",  # Bangladeshi Bengali
-            alternative_language_codes=["bn-IN", "en-US"],  # Fallbacks
-            enable_automatic_punctuation=True,
-            model="default",
+        transcript = await resilience.call(
+            "stt", [(f"stt:{m}", _recognize_with(audio_bytes, m)) for m in models], STT_TIMEOUT
         )
         
-        # Synchronous recognition (for short audio < 1 min)
-        response = client.recognize(config=config, audio=audio)
-        
-        # Combine all results
-        transcript = ""
-        for result in response.results:
-            transcript += result.alternatives[0].transcript + " "
-        
-        transcript = transcript.strip()
-        
         if transcript:
             print(f"Google STT: {transcript}")
             return transcript
@@ -75,3 +122,107 @@ async def transcribe_audio(audio_bytes: bytes) -> str:
     except Exception as e:
         print(f"Google STT Error: {e}")
         return ""
+
+
+class StreamingTranscriber:
+    """
+    Streams audio chunks to Google streaming_recognize while they arrive.
+
+    feed() queues WebM/Opus chunks from the socket, events() yields
+    ("partial", text) for interim results and a single ("final", text) as
+    soon as Google reports end of utterance. The blocking gRPC stream runs
+    in the upstream pool; results are handed back to the event loop.
+    """
+
+    def __init__(self):
+        self._chunks = queue.Queue()
+        self._events = asyncio.Queue()
+        self._task = None
+        self._closed = False
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._open())
+        self._task.add_done_callback(self._on_done)
+        return self
+
+    async def _open(self):
+        # A stream holds one STT slot for the whole utterance
+        async with upstream("stt"):
+            loop = asyncio.get_running_loop()
+            return await run_blocking("stt_stream", self._run, loop, timeout=STT_STREAM_TIMEOUT)
+
+    def feed(self, chunk: bytes):
+        if not self._closed:
+            self._chunks.put(chunk)
+
+    def finish(self):
+        """Client stopped sending audio; flush whatever Google has."""
+        if not self._closed:
+            self._closed = True
+            self._chunks.put(None)
+
+    async def events(self):
+        while True:
+            kind, text = await self._events.get()
+            if kind == "done":
+                return
+            yield kind, text
+            if kind == "final":
+                return
+
+    def _requests(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            yield speech.StreamingRecognizeRequest(audio_content=chunk)
+
+    def _run(self, loop):
+        client = get_google_speech_client()
+        if client is None:
+            print("ERROR: Google Cloud Speech client not available!")
+            return ""
+
+        streaming_config = speech.StreamingRecognitionConfig(
+            config=_recognition_config(),
+            interim_results=True,
+            single_utterance=True,
+        )
+        emit = lambda kind, text: loop.call_soon_threadsafe(self._events.put_nowait, (kind, text))
+
+        final_parts = []
+        responses = client.streaming_recognize(
+            config=streaming_config, requests=self._requests(), timeout=STT_STREAM_TIMEOUT
+        )
+        for response in responses:
+            for result in response.results:
+                if not result.alternatives:
+                    continue
+                text = result.alternatives[0].transcript.strip()
+                if result.is_final:
+                    # single_utterance: the first final result is the whole utterance,
+                    # hand it over now rather than waiting for the stream to close
+                    final_parts.append(text)
+                    emit("final", " ".join(final_parts).strip())
+                    self.finish()
+                else:
+                    emit("partial", " ".join(final_parts + [text]).strip())
+
+            if response.speech_event_type == speech.StreamingRecognizeResponse.SpeechEventType.END_OF_SINGLE_UTTERANCE:
+                # Stop uploading; Google still sends the final result(s)
+                self.finish()
+
+        transcript = " ".join(p for p in final_parts if p).strip()
+        print(f"Google STT (stream): {transcript or 'No transcription result'}")
+        return transcript
+
+    def _on_done(self, task):
+        self.finish()
+        try:
+            transcript = task.result()
+        except asyncio.CancelledError:
+            transcript = ""
+        except Exception as e:
+            print(f"Google STT Stream Error: {e}")
+            transcript = ""
+        self._events.put_nowait(("final", transcript))
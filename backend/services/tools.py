@@ -0,0 +1,87 @@
+import json
+import time
+import asyncio
+
+from services import slots
+from services.executor import run_blocking
+from services.metrics import observe
+
+# OpenAI function-calling tools that let the model consult real availability
+# instead of proposing times blindly.
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "check_availability",
+            "description": "Check whether the restaurant can seat a party at a given date and time. "
+                           "Call this before proposing or reviewing a reservation time.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string", "description": "Date as DD-MM-YYYY"},
+                    "time": {"type": "string", "description": "Time as hh:mm AM/PM, e.g. 07:30 PM"},
+                    "people": {"type": "integer", "description": "Number of guests"},
+                },
+                "required": ["date", "time"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "find_alternative_slots",
+            "description": "List open times on a date that can seat the party, nearest to the requested time first.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "date": {"type": "string", "description": "Date as DD-MM-YYYY"},
+                    "time": {"type": "string", "description": "Preferred time as hh:mm AM/PM"},
+                    "people": {"type": "integer", "description": "Number of guests"},
+                    "count": {"type": "integer", "description": "How many options to return (default 3)"},
+                },
+                "required": ["date"],
+            },
+        },
+    },
+]
+
+
+def _check_availability(date: str, time: str, people=None) -> dict:
+    return slots.check_availability(date, time, people)
+
+
+def _find_alternative_slots(date: str, time: str = None, people=None, count: int = 3) -> dict:
+    return {"date": date, "slots": slots.find_alternatives(date, time, people, min(int(count or 3), 10))}
+
+
+_HANDLERS = {
+    "check_availability": _check_availability,
+    "find_alternative_slots": _find_alternative_slots,
+}
+
+
+async def _run_tool(call: dict) -> dict:
+    started = time.perf_counter()
+    handler = _HANDLERS.get(call["name"])
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown tool {call['name']}")
+        args = json.loads(call["arguments"] or "{}")
+        # The slot index may need a DB load, so keep it off the event loop
+        result = await run_blocking("tool", handler, **args)
+    except Exception as e:
+        print(f"Tool Error ({call['name']}): {e}")
+        result = {"error": str(e)}
+    seconds = time.perf_counter() - started
+    observe("tool", seconds, started)
+    return {
+        "tool_call_id": call["id"],
+        "name": call["name"],
+        "content": json.dumps(result, ensure_ascii=False),
+        "seconds": seconds,
+    }
+
+
+async def execute_tool_calls(calls: list) -> list:
+    """Runs all tool calls of one model round concurrently, preserving order."""
+    return await asyncio.gather(*[_run_tool(call) for call in calls])
@@ -1,60 +1,192 @@
 import os
-import base64
-from google.cloud import texttospeech
+import asyncio
 
+from services import clients, phrases, tts_cache
+from services.lazy import LazyModule
 from services.config import get_config_value
-import json
-from google.oauth2 import service_account
+from services.executor import run_blocking, upstream_idle
+from services.admission import upstream
+from services import resilience
+from services.metrics import timed, detach_turn
+
+# Per-attempt deadline for synthesize_speech (seconds)
+TTS_TIMEOUT = float(os.getenv("TTS_TIMEOUT", "10"))
+# Voice used while the primary voice's circuit is open (its audio is not cached)
+TTS_FALLBACK_VOICE = os.getenv("TTS_FALLBACK_VOICE", "bn-IN-Standard-A")
+
+# Imported on first use; it pulls in grpc
+texttospeech = LazyModule("google.cloud.texttospeech")
+# Set to 0 to disable idle-time synthesis of likely-next prompts
+TTS_SPECULATE = os.getenv("TTS_SPECULATE", "1") != "0"
+
+# Synthesis in progress, by cache key: [task, waiters]. A second request for
+# the same text (a repeated sentence, or a speculative prompt the caller
+# then needs) joins it instead of paying for another Google call.
+_inflight = {}
+_speculative = set()  # keeps background speculation tasks referenced
+_stats = {"synthesized": 0, "joined": 0, "speculated": 0, "speculation_skipped": 0}
+
+# Everything that changes the synthesized audio; also the TTS cache key
+VOICE_PARAMS = {
+    "language_code": "bn-IN",
+    "name": "bn-IN-Wavenet-A",  # WaveNet - more natural than Standard
+    "audio_encoding": "MP3",  # default; a session may ask for OGG_OPUS instead
+    "speaking_rate": 1.0,  # Normal speed (0.25 to 4.0)
+    "pitch": 0.0,  # Normal pitch (-20 to 20)
+}
+
+# Fixed prompts are pre-warmed in each of these encodings
+TTS_PREWARM_ENCODINGS = [e.strip() for e in os.getenv("TTS_PREWARM_ENCODINGS", "MP3,OGG_OPUS").split(",") if e.strip()]
+
+def _cache_key(text: str, encoding: str) -> str:
+    return tts_cache.cache_key(text, **{**VOICE_PARAMS, "audio_encoding": encoding})
 
 def get_tts_client():
+    """
+    Returns the shared Google TTS client, rebuilt only when credentials change.
+    """
     creds_json = get_config_value("GOOGLE_TTS_CREDENTIALS")
     
     if creds_json:
-        try:
-            info = json.loads(creds_json)
-            credentials = service_account.Credentials.from_service_account_info(info)
-            return texttospeech.TextToSpeechClient(credentials=credentials)
-        except Exception as e:
-            print(f"Invalid Google Creds in DB: {e}")
-            pass
+        credentials = clients.get_google_credentials(creds_json)
+        if credentials is not None:
+            client = clients.get_or_create(
+                "google_tts",
+                clients.fingerprint(creds_json),
+                lambda: texttospeech.TextToSpeechClient(credentials=credentials),
+            )
+            if client is not None:
+                return client
+        print("Invalid Google Creds in DB, falling back to default credentials")
             
     # Fallback to default env vars
-    try:
-        return texttospeech.TextToSpeechClient()
-    except:
-        return None
+    return clients.get_or_create(
+        "google_tts",
+        clients.fingerprint("env", os.getenv("GOOGLE_APPLICATION_CREDENTIALS")),
+        texttospeech.TextToSpeechClient,
+    )
 
-async def synthesize_speech(text: str) -> bytes:
+def _synthesize(text: str, timeout: float, encoding: str = "MP3", voice: str = None) -> bytes:
     """
-    Synthesizes Bangla speech from text using Google Cloud TTS.
+    Blocking synthesize call; runs in the upstream thread pool.
     """
     client = get_tts_client()
     if not client:
         print("Google TTS Client not initialized")
         return None
 
-    try:
-        synthesis_input = texttospeech.SynthesisInput(text=text)
+    synthesis_input = texttospeech.SynthesisInput(text=text)
 
-        # WaveNet voice for more natural, professional speech
-        voice = texttospeech.VoiceSelectionParams(
-            language_code="bn-IN",
-            name="bn-IN-Wavenet-A",  # WaveNet - more natural than Standard
-            ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
-        )
+    # WaveNet voice for more natural, professional speech
+    voice = texttospeech.VoiceSelectionParams(
+        language_code=VOICE_PARAMS["language_code"],
+        name=voice or VOICE_PARAMS["name"],
+        ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
+    )
 
-        # Audio config with natural speaking rate
-        audio_config = texttospeech.AudioConfig(
-            audio_encoding=texttospeech.AudioEncoding.MP3,
-            speaking_rate=1.0,  # Normal speed (0.25 to 4.0)
-            pitch=0.0,  # Normal pitch (-20 to 20)
-        )
+    # Audio config with natural speaking rate
+    audio_config = texttospeech.AudioConfig(
+        audio_encoding=texttospeech.AudioEncoding[encoding],
+        speaking_rate=VOICE_PARAMS["speaking_rate"],
+        pitch=VOICE_PARAMS["pitch"],
+    )
 
-        response = client.synthesize_speech(
-            input=synthesis_input, voice=voice, audio_config=audio_config
-        )
+    response = client.synthesize_speech(
+        input=synthesis_input, voice=voice, audio_config=audio_config, timeout=timeout
+    )
+
+    return response.audio_content
+
+@timed("tts")
+async def synthesize_speech(text: str, persist: bool = False, encoding: str = "MP3") -> bytes:
+    """
+    Synthesizes Bangla speech from text using Google Cloud TTS.
+    Results are cached by (text, voice, audio config); persist=True also
+    stores them on disk (fixed prompts only). encoding is a Google
+    AudioEncoding name: "MP3" (default) or "OGG_OPUS".
+    The blocking gRPC call runs in the upstream pool, never on the event loop.
+    """
+    key = _cache_key(text, encoding)
+    cached = await tts_cache.get(key, disk=persist)
+    if cached is not None:
+        return cached
+
+    entry = _inflight.get(key)
+    if entry is None:
+        task = asyncio.create_task(_synthesize_and_store(key, text, persist, encoding))
+        entry = _inflight[key] = [task, 0]
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        _stats["joined"] += 1
+    entry[1] += 1
+    try:
+        return await asyncio.shield(entry[0])
+    except asyncio.CancelledError:
+        # Only the last waiter to give up cancels the shared synthesis
+        entry[1] -= 1
+        if entry[1] == 0:
+            entry[0].cancel()
+        raise
 
-        return response.audio_content
+def _synthesize_with(text: str, encoding: str, voice: str):
+    async def attempt(timeout: float):
+        async with upstream("tts"):
+            return voice, await run_blocking("tts", _synthesize, text, timeout, encoding, voice, timeout=timeout)
+    return attempt
+
+async def _synthesize_and_store(key: str, text: str, persist: bool, encoding: str) -> bytes:
+    _stats["synthesized"] += 1
+    voices = [VOICE_PARAMS["name"]] + [v for v in (TTS_FALLBACK_VOICE,) if v and v != VOICE_PARAMS["name"]]
+    try:
+        voice, audio = await resilience.call(
+            "tts", [(f"tts:{v}", _synthesize_with(text, encoding, v)) for v in voices], TTS_TIMEOUT
+        )
     except Exception as e:
         print(f"TTS Error: {e}")
         return None
+
+    if voice != VOICE_PARAMS["name"]:
+        # Keep the fallback voice out of the cache; the primary is used again once it recovers
+        return audio
+    await tts_cache.put(key, audio, persist=persist)
+    return audio
+
+def speculate(texts, persist: bool = True, encoding: str = "MP3"):
+    """
+    Synthesizes prompts the caller is likely to need next, in the background,
+    while the session is idle waiting for them to speak. Skipped when the
+    upstream pool has a queue, so it never delays a live synthesis.
+    """
+    if not TTS_SPECULATE:
+        return
+    for text in texts:
+        if tts_cache.contains(_cache_key(text, encoding)):
+            continue
+        if not upstream_idle():
+            _stats["speculation_skipped"] += 1
+            continue
+        _stats["speculated"] += 1
+        task = asyncio.create_task(_speculate_one(text, persist, encoding))
+        _speculative.add(task)
+        task.add_done_callback(_speculative.discard)
+
+async def _speculate_one(text: str, persist: bool, encoding: str):
+    detach_turn()  # runs after the turn; keep it out of the turn's timings
+    resilience.detach_deadline()  # and not cut short when the turn's deadline passes
+    await synthesize_speech(text, persist=persist, encoding=encoding)
+
+def get_tts_stats() -> dict:
+    return {**_stats, "in_flight": len(_inflight), "speculating": len(_speculative)}
+
+async def prewarm_fixed_phrases():
+    """
+    Makes sure every fixed prompt (greetings, retry, confirmation) is cached,
+    so they cost no Google call at runtime. Run in the background at startup.
+    """
+    results = await asyncio.gather(*(
+        synthesize_speech(text, persist=True, encoding=encoding)
+        for encoding in TTS_PREWARM_ENCODINGS
+        for text in phrases.fixed_phrases()
+    ))
+    warmed = sum(1 for audio in results if audio)
+    print(f"TTS cache pre-warmed {warmed}/{len(results)} fixed phrases ({', '.join(TTS_PREWARM_ENCODINGS)})")
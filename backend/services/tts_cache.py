@@ -0,0 +1,178 @@
+import os
+import json
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Content-addressed cache for synthesized audio, keyed on everything that
+# changes the output: text, voice and audio config.
+# Tier 1 is an in-process LRU; tier 2 is a directory of audio files shared by
+# all workers on the host, evicted oldest-first once it exceeds its size cap.
+TTS_CACHE_MEMORY_BYTES = int(os.getenv("TTS_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+TTS_CACHE_DISK_BYTES = int(os.getenv("TTS_CACHE_DISK_BYTES", str(256 * 1024 * 1024)))
+TTS_CACHE_DIR = os.getenv(
+    "TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".tts_cache")
+)
+
+_lock = threading.Lock()
+_memory = OrderedDict()  # key -> audio bytes
+_memory_bytes = 0
+_disk = {"bytes": None}  # lazily scanned total size of TTS_CACHE_DIR
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "disk_evictions": 0}
+
+
+def cache_key(text: str, **params) -> str:
+    payload = json.dumps({"text": text, **params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _path(key: str) -> str:
+    return os.path.join(TTS_CACHE_DIR, key[:2], key + ".bin")
+
+
+def _memory_put(key: str, audio: bytes):
+    global _memory_bytes
+    with _lock:
+        old = _memory.pop(key, None)
+        if old is not None:
+            _memory_bytes -= len(old)
+        _memory[key] = audio
+        _memory_bytes += len(audio)
+        while _memory_bytes > TTS_CACHE_MEMORY_BYTES and len(_memory) > 1:
+            _, evicted = _memory.popitem(last=False)
+            _memory_bytes -= len(evicted)
+            _stats["evictions"] += 1
+
+
+def _memory_get(key: str):
+    with _lock:
+        audio = _memory.get(key)
+        if audio is not None:
+            _memory.move_to_end(key)
+        return audio
+
+
+def _disk_read(key: str):
+    path = _path(key)
+    try:
+        with open(path, "rb") as f:
+            audio = f.read()
+        os.utime(path)  # mark as recently used for eviction
+        return audio
+    except FileNotFoundError:
+        return None
+
+
+def _disk_scan():
+    files = []
+    for root, _, names in os.walk(TTS_CACHE_DIR):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+    return files
+
+
+def _disk_write(key: str, audio: bytes):
+    path = _path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(audio)
+    # Rewriting a key (another worker stored it too) replaces its file, it does not add one
+    try:
+        replaced = os.path.getsize(path)
+    except FileNotFoundError:
+        replaced = 0
+    os.replace(tmp, path)  # atomic, so concurrent workers never read half a file
+
+    with _lock:
+        if _disk["bytes"] is None:
+            _disk["bytes"] = sum(size for _, size, _ in _disk_scan())
+        else:
+            _disk["bytes"] += len(audio) - replaced
+        over = _disk["bytes"] > TTS_CACHE_DISK_BYTES
+    if over:
+        _disk_evict()
+
+
+def _disk_evict():
+    """Deletes least recently used files until the store is under 90% of its cap."""
+    files = sorted(_disk_scan())
+    total = sum(size for _, size, _ in files)
+    target = TTS_CACHE_DISK_BYTES * 0.9
+    for _, size, path in files:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            _stats["disk_evictions"] += 1
+        except FileNotFoundError:
+            pass
+    with _lock:
+        _disk["bytes"] = total
+
+
+def contains(key: str) -> bool:
+    """True if key is in the memory tier (no disk access, no LRU update)."""
+    with _lock:
+        return key in _memory
+
+
+async def get(key: str, disk: bool = True):
+    """Returns cached audio for key from memory, then disk, or None."""
+    audio = _memory_get(key)
+    if audio is not None:
+        _stats["memory_hits"] += 1
+        return audio
+
+    if not disk:
+        _stats["misses"] += 1
+        return None
+
+    try:
+        audio = await asyncio.to_thread(_disk_read, key)
+    except OSError as e:
+        print(f"TTS cache read error: {e}")
+        audio = None
+    if audio is not None:
+        _stats["disk_hits"] += 1
+        _memory_put(key, audio)
+        return audio
+
+    _stats["misses"] += 1
+    return None
+
+
+async def put(key: str, audio: bytes, persist: bool = False):
+    """
+    Stores audio in memory, and on disk when persist=True. Only fixed prompts
+    are persisted so caller details read back by the LLM never hit the disk.
+    """
+    if not audio:
+        return
+    _stats["stores"] += 1
+    _memory_put(key, audio)
+    if persist:
+        try:
+            await asyncio.to_thread(_disk_write, key, audio)
+        except OSError as e:
+            print(f"TTS cache write error: {e}")
+
+
+def get_tts_cache_stats() -> dict:
+    lookups = _stats["memory_hits"] + _stats["disk_hits"] + _stats["misses"]
+    hits = _stats["memory_hits"] + _stats["disk_hits"]
+    return {
+        **_stats,
+        "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        "memory_entries": len(_memory),
+        "memory_bytes": _memory_bytes,
+        "disk_bytes": _disk["bytes"],
+        "disk_dir": TTS_CACHE_DIR,
+    }
@@ -0,0 +1,354 @@
+import os
+import math
+import array
+
+from services.lazy import LazyModule
+
+# PyAV (libopus) decodes, WebRTC's VAD classifies
+av = LazyModule("av")
+webrtcvad = LazyModule("webrtcvad")
+
+# Server-side voice activity detection on the browser's WebM/Opus audio.
+# Opus frames are read straight from the WebM container and decoded to PCM;
+# a frame is speech when the WebRTC VAD says so and it stands VAD_MIN_SNR_DB
+# above the clip's noise floor (steady hiss alone can fool the VAD). Clips
+# with too little speech are dropped before STT; the rest are trimmed to
+# their speech span and re-muxed into a shorter WebM that Google STT accepts
+# unchanged.
+
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() in ("1", "true", "yes")
+# WebRTC VAD aggressiveness, 0 (keeps most) to 3 (drops most non-speech)
+VAD_AGGRESSIVENESS = int(os.getenv("VAD_AGGRESSIVENESS", "3"))
+# Clips with less speech than this are dropped before STT (ms)
+VAD_MIN_SPEECH_MS = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))
+# Audio kept before the first and after the last voiced frame when trimming (ms)
+VAD_PAD_MS = int(os.getenv("VAD_PAD_MS", "300"))
+# Streaming: silence after speech that ends the utterance (ms)
+VAD_END_SILENCE_MS = int(os.getenv("VAD_END_SILENCE_MS", "700"))
+# Speech is at least this loud (dBFS)...
+VAD_MIN_DBFS = float(os.getenv("VAD_MIN_DBFS", "-50"))
+# ...and this far above the noise floor (dB)
+VAD_MIN_SNR_DB = float(os.getenv("VAD_MIN_SNR_DB", "6"))
+
+SAMPLE_RATE = 48000
+_CHUNK_SAMPLES = SAMPLE_RATE // 50  # the VAD takes 10/20/30 ms; 20 ms is one Opus frame
+
+_stats = {"clips": 0, "dropped": 0, "trimmed_ms": 0, "kept_ms": 0, "passthrough": 0, "stream_endpoints": 0}
+
+# Matroska element ids
+_EBML = 0x1A45DFA3
+_SEGMENT = 0x18538067
+_INFO = 0x1549A966
+_TRACKS = 0x1654AE6B
+_CLUSTER = 0x1F43B675
+_TIMECODE = 0xE7
+_BLOCK_GROUP = 0xA0
+_BLOCK = 0xA1
+_SIMPLE_BLOCK = 0xA3
+# Containers whose children we read in place (often written with unknown size)
+_TRANSPARENT = {_SEGMENT, _CLUSTER, _BLOCK_GROUP}
+_HEADER_ELEMENTS = {_EBML, _INFO, _TRACKS}
+_MAX_ELEMENT = 16 * 1024 * 1024
+
+
+def _read_vint(buf, pos: int, keep_marker: bool):
+    """EBML variable-length int at pos -> (value, length, unknown); None if incomplete."""
+    if pos >= len(buf):
+        return None
+    first = buf[pos]
+    if first == 0:
+        raise ValueError("Invalid EBML length")
+    length = 9 - first.bit_length()
+    if pos + length > len(buf):
+        return None
+    value = first if keep_marker else first & ((1 << (8 - length)) - 1)
+    for b in buf[pos + 1:pos + length]:
+        value = (value << 8) | b
+    unknown = not keep_marker and value == (1 << (7 * length)) - 1
+    return value, length, unknown
+
+
+def _encode_size(size: int) -> bytes:
+    for length in range(1, 9):
+        if size < (1 << (7 * length)) - 1:
+            return (size | (1 << (7 * length))).to_bytes(length, "big")
+    raise ValueError("Element too large")
+
+
+def _element(element_id: int, body: bytes) -> bytes:
+    return element_id.to_bytes((element_id.bit_length() + 7) // 8, "big") + _encode_size(len(body)) + body
+
+
+def opus_duration_ms(packet: bytes) -> float:
+    """Duration of an Opus packet from its TOC byte (RFC 6716 section 3.1)."""
+    if not packet:
+        return 0.0
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame = (10, 20, 40, 60)[config % 4]
+    elif config < 16:
+        frame = (10, 20)[config % 2]
+    else:
+        frame = (2.5, 5, 10, 20)[config % 4]
+    code = toc & 3
+    if code == 0:
+        count = 1
+    elif code in (1, 2):
+        count = 2
+    else:
+        count = packet[1] & 0x3F if len(packet) > 1 else 1
+    return frame * count
+
+
+class Frame:
+    __slots__ = ("start_ms", "duration_ms", "cluster_tc", "block", "_packet_at")
+
+    def __init__(self, start_ms, duration_ms, cluster_tc, block, packet_at):
+        self.start_ms = start_ms
+        self.duration_ms = duration_ms
+        self.cluster_tc = cluster_tc
+        self.block = block  # SimpleBlock body: track, timecode, flags, packet
+        self._packet_at = packet_at
+
+    @property
+    def packet(self) -> bytes:
+        return self.block[self._packet_at:]
+
+
+class WebmOpusReader:
+    """
+    Incremental WebM reader: feed() bytes as they arrive, get Opus frames
+    back. Header elements (EBML, Info, Tracks) are kept for re-muxing.
+    """
+
+    def __init__(self):
+        self._buf = b""
+        self._cluster_tc = 0
+        self.header = {}  # element id -> raw element bytes
+        self.duration_ms = 0.0
+
+    @property
+    def is_opus(self) -> bool:
+        return b"A_OPUS" in self.header.get(_TRACKS, b"")
+
+    def feed(self, data: bytes) -> list:
+        buf = self._buf + data
+        pos = 0
+        frames = []
+        while True:
+            element_id = _read_vint(buf, pos, keep_marker=True)
+            if element_id is None:
+                break
+            size = _read_vint(buf, pos + element_id[1], keep_marker=False)
+            if size is None:
+                break
+            element_id, id_len = element_id[0], element_id[1]
+            size, size_len, unknown = size
+            header_len = id_len + size_len
+
+            if element_id in _TRANSPARENT:
+                pos += header_len
+                if element_id == _CLUSTER:
+                    self._cluster_tc = 0
+                continue
+            if unknown or size > _MAX_ELEMENT:
+                raise ValueError(f"Unsupported element 0x{element_id:X}")
+            end = pos + header_len + size
+            if end > len(buf):
+                break
+
+            body = buf[pos + header_len:end]
+            if element_id == _TIMECODE:
+                self._cluster_tc = int.from_bytes(body, "big")
+            elif element_id in (_SIMPLE_BLOCK, _BLOCK):
+                frame = self._frame(body, element_id == _BLOCK)
+                if frame is not None:
+                    frames.append(frame)
+            elif element_id in _HEADER_ELEMENTS:
+                self.header[element_id] = buf[pos:end]
+            pos = end
+        self._buf = buf[pos:]
+        return frames
+
+    def _frame(self, body: bytes, from_block_group: bool):
+        track = _read_vint(body, 0, keep_marker=False)
+        if track is None or len(body) < track[1] + 3:
+            return None
+        offset = track[1]
+        relative = int.from_bytes(body[offset:offset + 2], "big", signed=True)
+        packet = body[offset + 3:]
+        duration = opus_duration_ms(packet) or 20.0
+        if from_block_group:
+            # Re-muxed as a SimpleBlock; audio frames are always keyframes
+            body = body[:offset + 2] + bytes([body[offset + 2] | 0x80]) + packet
+        start = self._cluster_tc + relative
+        self.duration_ms = max(self.duration_ms, start + duration)
+        return Frame(start, duration, self._cluster_tc, body, offset + 3)
+
+
+def _mux(header: dict, frames: list) -> bytes:
+    """Minimal WebM: the original EBML/Info/Tracks, then the given frames."""
+    clusters = []
+    current_tc, blocks = None, []
+    for frame in frames:
+        if frame.cluster_tc != current_tc and blocks:
+            clusters.append((current_tc, blocks))
+            blocks = []
+        current_tc = frame.cluster_tc
+        blocks.append(_element(_SIMPLE_BLOCK, frame.block))
+    if blocks:
+        clusters.append((current_tc, blocks))
+
+    body = [header.get(_INFO, b""), header[_TRACKS]]
+    for tc, cluster_blocks in clusters:
+        tc_bytes = tc.to_bytes(max(1, (tc.bit_length() + 7) // 8), "big")
+        body.append(_element(_CLUSTER, _element(_TIMECODE, tc_bytes) + b"".join(cluster_blocks)))
+    return header[_EBML] + _element(_SEGMENT, b"".join(body))
+
+
+class OpusDecoder:
+    """Decodes one track's Opus packets in order and measures each frame."""
+
+    def __init__(self):
+        self._codec = av.CodecContext.create("libopus", "r")
+        self._codec.sample_rate = SAMPLE_RATE
+        self._codec.layout = "mono"
+        self._resampler = av.AudioResampler(format="s16", layout="mono", rate=SAMPLE_RATE)
+        self._vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+
+    def measure(self, frame: Frame):
+        """(level in dBFS, share of its 20 ms chunks the VAD calls speech)."""
+        pcm = b""
+        for decoded in self._codec.decode(av.Packet(frame.packet)):
+            for out in self._resampler.resample(decoded):
+                pcm += bytes(out.planes[0])[:out.samples * 2]
+        samples = array.array("h", pcm)
+        if not samples:
+            return -100.0, 0.0
+        energy = sum(x * x for x in samples) / len(samples)
+        level = 10 * math.log10(max(energy, 1.0) / (32768.0 * 32768.0))
+        chunk = _CHUNK_SAMPLES * 2
+        chunks = [pcm[i:i + chunk] for i in range(0, len(pcm) - chunk + 1, chunk)]
+        speech = sum(1 for c in chunks if self._vad.is_speech(c, SAMPLE_RATE))
+        return level, speech / len(chunks) if chunks else 0.0
+
+
+def _is_speech(level: float, speech_share: float, floor: float) -> bool:
+    return speech_share >= 0.5 and level >= max(VAD_MIN_DBFS, floor + VAD_MIN_SNR_DB)
+
+
+def _voiced(frames: list) -> list:
+    """
+    Per-frame speech flags. The noise floor is the clip's 10th percentile
+    level, so steady noise, however loud, never counts as speech.
+    """
+    decoder = OpusDecoder()
+    measured = [decoder.measure(f) for f in frames]
+    levels = sorted(level for level, _ in measured)
+    floor = levels[len(levels) // 10]
+    return [_is_speech(level, share, floor) for level, share in measured]
+
+
+def filter_speech(audio: bytes):
+    """
+    Returns (audio, info) for a recorded clip. audio is None when the clip
+    holds no speech, else the clip trimmed to its speech span. Anything that
+    is not WebM/Opus or cannot be decoded passes through untouched.
+    Blocking (decodes the whole clip): async callers go through run_blocking.
+    """
+    info = {"duration_ms": None, "speech_ms": None, "kept_ms": None}
+    if not VAD_ENABLED:
+        return audio, info
+    _stats["clips"] += 1
+    try:
+        reader = WebmOpusReader()
+        frames = reader.feed(audio)
+        if not frames or not reader.is_opus or _EBML not in reader.header:
+            _stats["passthrough"] += 1
+            return audio, info
+
+        voiced = _voiced(frames)
+        speech_ms = sum(f.duration_ms for f, v in zip(frames, voiced) if v)
+        info["duration_ms"] = round(reader.duration_ms)
+        info["speech_ms"] = round(speech_ms)
+        if speech_ms < VAD_MIN_SPEECH_MS:
+            _stats["dropped"] += 1
+            info["kept_ms"] = 0
+            return None, info
+
+        first = next(f for f, v in zip(frames, voiced) if v)
+        last = next(f for f, v in zip(reversed(frames), reversed(voiced)) if v)
+        start = first.start_ms - VAD_PAD_MS
+        end = last.start_ms + last.duration_ms + VAD_PAD_MS
+        kept = [f for f in frames if f.start_ms + f.duration_ms > start and f.start_ms < end]
+        kept_ms = sum(f.duration_ms for f in kept)
+        info["kept_ms"] = round(kept_ms)
+        _stats["kept_ms"] += round(kept_ms)
+        if len(kept) == len(frames):
+            return audio, info
+        _stats["trimmed_ms"] += round(reader.duration_ms - kept_ms)
+        return _mux(reader.header, kept), info
+    except Exception as e:
+        print(f"VAD Error: {e}")
+        _stats["passthrough"] += 1
+        return audio, info
+
+
+class UtteranceSegmenter:
+    """
+    Finds where an utterance ends in continuous audio. feed() the same WebM
+    chunks that go to streaming STT; it returns "speech_start" once voice is
+    heard and "speech_end" after VAD_END_SILENCE_MS of silence following it.
+    The noise floor is tracked as the audio arrives.
+    """
+
+    def __init__(self):
+        self._reader = WebmOpusReader()
+        self._decoder = None
+        self._floor = None
+        self._voiced_ms = 0.0
+        self._silence_ms = 0.0
+        self.in_speech = False
+        self.ended = False
+
+    def feed(self, chunk: bytes) -> list:
+        if not VAD_ENABLED or self.ended:
+            return []
+        try:
+            frames = self._reader.feed(chunk)
+            if frames and self._decoder is None:
+                self._decoder = OpusDecoder()
+            measured = [(f, *self._decoder.measure(f)) for f in frames]
+        except Exception as e:
+            print(f"VAD Stream Error: {e}")
+            self.ended = True  # Leave endpointing to STT
+            return []
+        events = []
+        for frame, level, share in measured:
+            if self._floor is None or level < self._floor:
+                self._floor = level
+            else:
+                # Let the floor drift up slowly so a noisier room is learned
+                self._floor += (level - self._floor) * 0.005
+
+            if _is_speech(level, share, self._floor):
+                self._voiced_ms += frame.duration_ms
+                self._silence_ms = 0.0
+                if not self.in_speech and self._voiced_ms >= VAD_MIN_SPEECH_MS:
+                    self.in_speech = True
+                    events.append("speech_start")
+            else:
+                self._silence_ms += frame.duration_ms
+                if not self.in_speech and self._silence_ms >= VAD_END_SILENCE_MS:
+                    self._voiced_ms = 0.0  # isolated blips are not an utterance
+                if self.in_speech and self._silence_ms >= VAD_END_SILENCE_MS:
+                    self.ended = True
+                    _stats["stream_endpoints"] += 1
+                    events.append("speech_end")
+                    break
+        return events
+
+
+def get_vad_stats() -> dict:
+    return {**_stats, "enabled": VAD_ENABLED}
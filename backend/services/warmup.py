@@ -0,0 +1,82 @@
+import os
+import time
+import asyncio
+
+from services.lazy import get_import_stats
+
+# Upper bound on warm-up; past it the worker reports ready anyway, so a
+# slow upstream cannot keep it out of rotation forever
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "30"))
+
+_state = {
+    "ready": False,
+    "import_ms": None,   # main.py import time, set by main
+    "warmup_ms": None,   # whole warm-up, once finished
+    "steps": {},         # step -> milliseconds
+    "errors": {},        # step -> message
+}
+
+
+def set_import_time(seconds: float):
+    _state["import_ms"] = round(seconds * 1000, 1)
+
+
+def _warm_config():
+    from services.config import get_config_value
+    get_config_value("OPENAI_API_KEY")  # loads the whole SystemConfig table
+
+
+def _warm_sdks():
+    from services import stt, tts, llm
+    for module in (stt.speech, tts.texttospeech, llm.openai):
+        module.load()
+
+
+def _warm_clients():
+    from services import stt, tts, llm
+    stt.get_google_speech_client()
+    tts.get_tts_client()
+    llm.get_client()
+
+
+async def _step(name: str, coro):
+    started = time.perf_counter()
+    try:
+        await coro
+    except Exception as e:
+        _state["errors"][name] = str(e)
+        print(f"Warm-up {name} failed: {e}")
+    _state["steps"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _run():
+    from services.tts import prewarm_fixed_phrases
+    # Config first: the clients are built from its credentials
+    await _step("config", asyncio.to_thread(_warm_config))
+    await _step("sdk_imports", asyncio.to_thread(_warm_sdks))
+    await _step("clients", asyncio.to_thread(_warm_clients))
+    await _step("tts_cache", prewarm_fixed_phrases())
+
+
+async def warm_up():
+    """
+    Loads config, SDKs, clients and the TTS cache in the background after
+    startup; the worker is ready once this finishes (or times out).
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(_run(), WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        _state["errors"]["timeout"] = f"not finished after {WARMUP_TIMEOUT}s"
+        print(f"Warm-up timed out after {WARMUP_TIMEOUT}s, marking ready")
+    _state["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _state["ready"] = True
+    print(f"Warm-up finished in {_state['warmup_ms']} ms: {_state['steps']}")
+
+
+def is_ready() -> bool:
+    return _state["ready"]
+
+
+def get_startup_report() -> dict:
+    return {**_state, "sdk_import_ms": get_import_stats()}
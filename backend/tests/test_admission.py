@@ -0,0 +1,110 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import main
+from services import admission
+from services.admission import ProviderLimit, TokenBucket, UpstreamBusy
+
+
+@pytest.fixture(autouse=True)
+def sessions(monkeypatch):
+    monkeypatch.setattr(admission, "_sessions", {"active": 0, "max_active": 0, "admitted": 0, "rejected": 0})
+
+
+def test_bucket_spends_its_burst_then_refills_at_its_rate():
+    bucket = TokenBucket(rate=50, burst=2)
+
+    async def take(n):
+        deadline = time.monotonic() + 1
+        return [await bucket.acquire(deadline) for _ in range(n)]
+
+    first, second, third = asyncio.run(take(3))
+    assert first < 0.005 and second < 0.005
+    assert third == pytest.approx(0.02, abs=0.015)
+
+    # Idle time refills the bucket, but never past the burst
+    time.sleep(0.1)
+    assert max(asyncio.run(take(2))) < 0.005
+    assert asyncio.run(take(1))[0] > 0.005
+
+
+def test_bucket_without_a_rate_never_waits():
+    bucket = TokenBucket(rate=0, burst=1)
+    assert asyncio.run(bucket.acquire(time.monotonic())) == 0.0
+
+
+def test_rate_limit_past_the_max_wait_is_rejected(monkeypatch):
+    monkeypatch.setattr(admission, "UPSTREAM_MAX_WAIT", 0.05)
+    limit = ProviderLimit("tts", concurrency=4, rate=1, burst=1)
+
+    async def two_calls():
+        async with limit:
+            pass
+        with pytest.raises(UpstreamBusy):
+            async with limit:
+                pass
+
+    asyncio.run(two_calls())
+    assert (limit.stats["calls"], limit.stats["rejected"]) == (1, 1)
+
+
+def test_full_provider_rejects_after_the_max_wait(monkeypatch):
+    monkeypatch.setattr(admission, "UPSTREAM_MAX_WAIT", 0.05)
+    limit = ProviderLimit("stt", concurrency=1, rate=0, burst=1)
+
+    async def second_while_first_runs():
+        async with limit:
+            started = time.monotonic()
+            with pytest.raises(UpstreamBusy):
+                async with limit:
+                    pass
+            return time.monotonic() - started
+
+    waited = asyncio.run(second_while_first_runs())
+    assert waited == pytest.approx(0.05, abs=0.04)
+    assert limit.stats["rejected"] == 1
+    assert limit.stats["in_flight"] == 0
+
+
+def test_slot_freed_within_the_max_wait_is_taken(monkeypatch):
+    monkeypatch.setattr(admission, "UPSTREAM_MAX_WAIT", 1)
+    limit = ProviderLimit("llm", concurrency=1, rate=0, burst=1)
+
+    async def hold(seconds):
+        async with limit:
+            await asyncio.sleep(seconds)
+
+    async def queued_behind():
+        first = asyncio.create_task(hold(0.05))
+        await asyncio.sleep(0)
+        await hold(0)
+        await first
+
+    asyncio.run(queued_behind())
+    assert (limit.stats["calls"], limit.stats["rejected"], limit.stats["max_in_flight"]) == (2, 0, 1)
+
+
+def test_sessions_over_the_cap_are_refused(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_SESSIONS", 2)
+    assert admission.try_admit() and admission.try_admit()
+    assert not admission.try_admit()
+    admission.release()
+    assert admission.try_admit()
+    stats = admission.get_admission_stats()["sessions"]
+    assert (stats["active"], stats["admitted"], stats["rejected"], stats["max_active"]) == (2, 3, 1, 2)
+
+
+def test_caller_over_the_cap_gets_busy_and_1013(monkeypatch):
+    monkeypatch.setattr(admission, "MAX_SESSIONS", 0)
+    with TestClient(main.app).websocket_connect("/ws") as ws:
+        busy = ws.receive_json()
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert busy["type"] == "busy" and busy["reason"] == "sessions"
+    assert 0.8 * admission.BUSY_RETRY_AFTER <= busy["retry_after"] <= 1.5 * admission.BUSY_RETRY_AFTER
+    assert closed.value.code == 1013
+    assert admission.get_admission_stats()["sessions"]["active"] == 0
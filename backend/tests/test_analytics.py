@@ -0,0 +1,116 @@
+import json
+
+import pytest
+import sqlalchemy
+
+import reservations_report
+from benchmarks.fakes import SCHEMA
+from services import analytics
+from services.analytics import ReservationStats
+
+
+def row(id, time, people, date="20-10-2026", phone="01712345678", created="2026-10-18 10:15:00"):
+    return (id, f"Guest {id}", phone, date, time, people, created)
+
+
+def test_stats_fold_batches_into_running_totals():
+    stats = ReservationStats()
+    stats.add_batch([
+        row(1, "07:00 PM", "4"),
+        row(2, "7:00 PM", "2 জন", created="2026-10-18 11:00:00"),
+        row(3, "08:30 PM", "৩"),
+    ])
+    stats.add_batch([
+        row(4, "19:00", "6", date="2026-10-20"),
+        row(5, "sometime", "2", created="2026-10-18 11:30:00"),
+    ])
+    stats.add_batch([])
+
+    report = stats.summary(top=2)
+    assert report["reservations"] == 5
+    assert report["guests"] == 17
+    assert report["average_party_size"] == 3.4
+    assert report["unparsed_times"] == 1
+    # Three spellings of 7 PM, in either date format, are one slot
+    assert report["busiest_slots"] == [
+        {"date": "20-10-2026", "time": "07:00 PM", "bookings": 3, "guests": 12},
+        {"date": "20-10-2026", "time": "08:30 PM", "bookings": 1, "guests": 3},
+    ]
+    assert report["peak_booked_hours"] == [{"hour": 19, "bookings": 3}, {"hour": 20, "bookings": 1}]
+    assert report["peak_call_hours"] == [{"hour": 10, "bookings": 3}, {"hour": 11, "bookings": 2}]
+    assert stats.watermark == {"createdAt": "2026-10-18 11:30:00", "id": 5}
+
+
+def test_empty_table_has_no_averages():
+    report = ReservationStats().summary()
+    assert report["reservations"] == 0
+    assert report["average_party_size"] is None
+    assert report["busiest_slots"] == []
+
+
+def test_watermark_round_trip(tmp_path):
+    path = str(tmp_path / "watermark.json")
+    assert analytics.load_watermark(path) is None
+    analytics.save_watermark(path, {"createdAt": "2026-10-18 11:30:00", "id": 5})
+    assert analytics.load_watermark(path) == {"createdAt": "2026-10-18 11:30:00", "id": 5}
+    assert not (tmp_path / "watermark.json.tmp").exists()
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'reservations.db'}")
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(sqlalchemy.text(statement))
+    monkeypatch.setattr(analytics, "get_engine", lambda: engine)
+
+    def insert(*rows):
+        with engine.begin() as conn:
+            for r in rows:
+                conn.execute(sqlalchemy.text(
+                    "INSERT INTO Reservation (id, name, phone, date, time, people, createdAt) "
+                    "VALUES (:id, :name, :phone, :date, :time, :people, :created)"
+                ), dict(zip(("id", "name", "phone", "date", "time", "people", "created"), r)))
+
+    yield insert
+    engine.dispose()
+
+
+def report(tmp_path, capsys, *args):
+    assert reservations_report.main(["--json", "--state", str(tmp_path / "state.json"), *args]) == 0
+    return json.loads(capsys.readouterr().out)
+
+
+def test_incremental_run_reads_only_rows_after_the_watermark(db, tmp_path, capsys):
+    # Same createdAt second: the id breaks the tie
+    db(row(1, "07:00 PM", "4"), row(2, "07:00 PM", "2"), row(3, "08:00 PM", "2", created="2026-10-18 10:20:00"))
+    first = report(tmp_path, capsys, "--incremental", "--batch-size", "2")
+    assert first["since"] is None
+    assert first["reservations"] == 3
+    assert first["watermark"] == {"createdAt": "2026-10-18 10:20:00", "id": 3}
+
+    db(row(4, "09:00 PM", "5", created="2026-10-18 10:20:00"), row(5, "09:00 PM", "1", created="2026-10-18 12:00:00"))
+    second = report(tmp_path, capsys, "--incremental")
+    assert second["since"] == first["watermark"]
+    assert second["reservations"] == 2
+    assert second["guests"] == 6
+    assert second["watermark"] == {"createdAt": "2026-10-18 12:00:00", "id": 5}
+
+    # Nothing new: the watermark is kept, not cleared
+    third = report(tmp_path, capsys, "--incremental")
+    assert third["reservations"] == 0
+    assert third["watermark"] == second["watermark"]
+
+    # A full run still reads everything
+    assert report(tmp_path, capsys)["reservations"] == 5
+
+
+def test_repeat_same_day_bookings_are_grouped_by_phone_and_date(db, tmp_path, capsys):
+    db(
+        row(1, "07:00 PM", "4", phone="01711111111"),
+        row(2, "08:00 PM", "4", phone="01711111111"),
+        row(3, "07:00 PM", "2", phone="01711111111", date="21-10-2026"),
+        row(4, "07:00 PM", "2", phone="01822222222"),
+    )
+    repeats = report(tmp_path, capsys)["repeat_same_day_bookings"]
+    assert repeats == [{"phone": "********111", "date": "20-10-2026", "bookings": 2, "first_id": 1, "last_id": 2}]
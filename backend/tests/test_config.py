@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import pytest
+import sqlalchemy
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.fakes import SCHEMA
+from services import config
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    """SystemConfig in a SQLite file behind DATABASE_URL, with an empty cache."""
+    url = f"sqlite:///{tmp_path / 'config.db'}"
+    engine = sqlalchemy.create_engine(url)
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(sqlalchemy.text(statement))
+    monkeypatch.setattr(config, "DB_URL", url)
+    monkeypatch.setattr(config, "_engine", {"engine": None, "created": False})
+    monkeypatch.setattr(config, "_cache", {"values": {}, "loaded_at": 0.0, "updated_at": None, "row_count": 0, "version": 0})
+    monkeypatch.setattr(config, "_stats", dict.fromkeys(config._stats, 0))
+    monkeypatch.setattr(config, "_listeners", [])
+    monkeypatch.setattr(config, "_refreshing", {"active": False})
+    monkeypatch.setattr(config, "CONFIG_CACHE_TTL", 30)
+
+    def execute(sql, **params):
+        with engine.begin() as conn:
+            conn.execute(sqlalchemy.text(sql), params)
+
+    yield execute
+    if config._engine["engine"] is not None:
+        config._engine["engine"].dispose()
+    engine.dispose()
+
+
+def save(db, key, value, updated_at="2026-10-18 10:00:00"):
+    db("INSERT OR REPLACE INTO SystemConfig (key, value, updatedAt) VALUES (:key, :value, :updated_at)",
+       key=key, value=value, updated_at=updated_at)
+
+
+def expire():
+    config._cache["loaded_at"] = time.monotonic() - config.CONFIG_CACHE_TTL - 1
+
+
+def test_reads_within_the_ttl_are_served_from_the_snapshot(db):
+    save(db, "LLM_TOOLS_ENABLED", "false")
+    assert config.get_config_value("LLM_TOOLS_ENABLED") == "false"
+    save(db, "LLM_TOOLS_ENABLED", "true", updated_at="2026-10-18 11:00:00")
+    assert config.get_config_value("LLM_TOOLS_ENABLED") == "false"
+    assert config.get_config_value("MISSING_KEY", "fallback") == "fallback"
+    stats = config.get_config_cache_stats()
+    assert (stats["misses"], stats["hits"], stats["checks"]) == (1, 2, 1)
+
+
+def test_newer_updated_at_triggers_a_reload(db):
+    save(db, "RESTAURANT_NAME", "Old")
+    assert config.get_config_value("RESTAURANT_NAME") == "Old"
+    save(db, "RESTAURANT_NAME", "New", updated_at="2026-10-18 11:00:00")
+    expire()
+    assert config.get_config_value("RESTAURANT_NAME") == "New"
+    assert config.get_config_cache_stats()["reloads"] == 2
+
+
+def test_deleted_row_is_caught_by_the_row_count(db):
+    save(db, "A", "1", updated_at="2026-10-18 09:00:00")
+    save(db, "B", "2")
+    assert config.get_config_value("A") == "1"
+    # MAX(updatedAt) is unchanged, COUNT(*) is not
+    db("DELETE FROM SystemConfig WHERE key = 'A'")
+    expire()
+    assert config.get_config_value("A", "default") == "default"
+
+
+def test_unchanged_table_is_only_probed(db):
+    save(db, "A", "1")
+    config.get_config_value("A")
+    version = config.get_config_version()
+    expire()
+    config.get_config_value("A")
+    stats = config.get_config_cache_stats()
+    assert (stats["checks"], stats["reloads"]) == (2, 1)
+    assert config.get_config_version() == version
+
+
+def test_listeners_fire_only_when_a_value_changed(db):
+    save(db, "A", "1")
+    save(db, "B", "2")
+    config.get_config_value("A")
+    calls = []
+    config.on_config_change(calls.append)
+
+    # Forced reload of the same contents, and a touched row with the same value
+    config.invalidate_config_cache()
+    save(db, "A", "1", updated_at="2026-10-18 12:00:00")
+    expire()
+    config.get_config_value("A")
+    assert calls == []
+
+    save(db, "B", "3", updated_at="2026-10-18 13:00:00")
+    config.invalidate_config_cache()
+    assert calls == [{"B"}]
+
+
+def test_stale_snapshot_is_served_on_the_loop_while_a_thread_refreshes(db):
+    save(db, "A", "old")
+    config.get_config_value("A")
+    save(db, "A", "new", updated_at="2026-10-18 11:00:00")
+    expire()
+
+    async def on_the_loop():
+        stale = config.get_config_value("A")
+        while config._refreshing["active"]:
+            await asyncio.sleep(0.01)
+        return stale, config.get_config_value("A")
+
+    assert asyncio.run(on_the_loop()) == ("old", "new")
+
+
+def test_invalidate_endpoint_needs_the_secret(db, monkeypatch):
+    save(db, "A", "old")
+    config.get_config_value("A")
+    save(db, "A", "new", updated_at="2026-10-18 11:00:00")
+    client = TestClient(main.app)
+
+    monkeypatch.delenv("CONFIG_INVALIDATE_SECRET", raising=False)
+    assert client.post("/config/invalidate", headers={"X-Config-Secret": ""}).status_code == 403
+
+    monkeypatch.setenv("CONFIG_INVALIDATE_SECRET", "s3cret")
+    assert client.post("/config/invalidate").status_code == 403
+    assert client.post("/config/invalidate", headers={"X-Config-Secret": "wrong"}).status_code == 403
+    assert config.get_config_value("A") == "old"
+
+    response = client.post("/config/invalidate", headers={"X-Config-Secret": "s3cret"})
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok", "version": config.get_config_version()}
+    assert config.get_config_value("A") == "new"
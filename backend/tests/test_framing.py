@@ -0,0 +1,110 @@
+import pytest
+
+from services import framing
+from services.framing import (
+    FLAG_FINAL, HEADER, PROTOCOL_VERSION, FrameError, Protocol, pack_frame, unpack_frame,
+)
+
+
+def test_header_layout():
+    data = pack_frame("webm_opus", 0x1234, 7, b"abc", final=True)
+    assert data == bytes([2, 3, FLAG_FINAL, 0, 0x12, 0x34, 0, 0, 0, 7]) + b"abc"
+    assert HEADER.size == 10
+
+
+def test_pack_unpack_round_trip():
+    frame = unpack_frame(pack_frame("ogg_opus", 65535, 2 ** 32 - 1, b"\x00\xff"))
+    assert frame == ("ogg_opus", 65535, 2 ** 32 - 1, False, b"\x00\xff")
+
+
+@pytest.mark.parametrize("data", [
+    b"\x02\x03\x00",                                    # shorter than the header
+    bytes([1, 3, 0, 0, 0, 1, 0, 0, 0, 0]),              # wrong version
+    bytes([PROTOCOL_VERSION, 9, 0, 0, 0, 1, 0, 0, 0, 0]),  # unknown codec
+])
+def test_malformed_frames_are_rejected(data):
+    with pytest.raises(FrameError):
+        unpack_frame(data)
+
+
+@pytest.mark.parametrize("params", [{}, {"protocol": "1"}, {"protocol": "x", "codec": "ogg_opus"}])
+def test_old_clients_get_version_1(params):
+    protocol = Protocol.negotiate(params)
+    assert protocol.describe() == {"protocol": 1, "codec": "mp3"}
+    assert protocol.audio_frames(b"clip") == [b"clip"]
+    assert protocol.read_audio(b"rec") == (b"rec", True)
+
+
+def test_negotiation_clamps_codec():
+    protocol = Protocol.negotiate({"protocol": "2", "codec": "flac"})
+    assert protocol.describe() == {"protocol": 2, "codec": "mp3"}
+    assert protocol.tts_encoding == "MP3"
+
+    protocol = Protocol.negotiate({"protocol": "3", "codec": "ogg_opus"})
+    assert protocol.version == PROTOCOL_VERSION
+    assert protocol.tts_encoding == "OGG_OPUS"
+
+
+def test_each_clip_is_one_final_frame():
+    protocol = Protocol(PROTOCOL_VERSION, "ogg_opus")
+    audio = bytes(range(256)) * 100
+    (frame,) = [unpack_frame(f) for f in protocol.audio_frames(audio)]
+    assert (frame.stream_id, frame.seq, frame.final) == (1, 0, True)
+    assert frame.payload == audio
+
+    # The next clip is a new stream; an empty clip is still one final frame
+    (empty,) = protocol.audio_frames(b"")
+    assert unpack_frame(empty)[1:4] == (2, 0, True)
+
+
+def test_inbound_chunks_are_reassembled():
+    protocol = Protocol(PROTOCOL_VERSION)
+    audio = None
+    for seq, chunk in enumerate([b"ab", b"cd", b"ef"]):
+        payload, final = protocol.read_audio(pack_frame("webm_opus", 5, seq, chunk, final=seq == 2))
+        audio = protocol.collect(payload, final)
+    assert audio == b"abcdef"
+
+
+def test_repeated_and_out_of_order_chunks_are_skipped():
+    protocol = Protocol(PROTOCOL_VERSION)
+    assert protocol.read_audio(pack_frame("webm_opus", 1, 1, b"late")) == (None, False)
+    assert protocol.read_audio(pack_frame("webm_opus", 1, 0, b"a")) == (b"a", False)
+    assert protocol.read_audio(pack_frame("webm_opus", 1, 0, b"a")) == (None, False)
+    assert protocol.read_audio(pack_frame("webm_opus", 1, 2, b"c")) == (None, False)
+    assert protocol.read_audio(pack_frame("webm_opus", 1, 1, b"b", final=True)) == (b"b", True)
+    assert protocol.read_audio(pack_frame("webm_opus", 1, 1, b"b", final=True)) == (None, False)
+
+
+def test_new_stream_drops_the_unfinished_one():
+    protocol = Protocol(PROTOCOL_VERSION)
+    protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 1, 0, b"stale")))
+    payload, final = protocol.read_audio(pack_frame("webm_opus", 2, 0, b"fresh", final=True))
+    assert protocol.collect(payload, final) == b"fresh"
+
+
+def test_output_codec_is_not_accepted_as_input():
+    protocol = Protocol(PROTOCOL_VERSION)
+    with pytest.raises(FrameError):
+        protocol.read_audio(pack_frame("mp3", 1, 0, b"x", final=True))
+
+
+def test_oversized_utterance_is_rejected_and_its_tail_discarded(monkeypatch):
+    monkeypatch.setattr(framing, "MAX_UTTERANCE_BYTES", 4)
+    protocol = Protocol(PROTOCOL_VERSION)
+    assert protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 1, 0, b"abc"))) is None
+    with pytest.raises(FrameError):
+        protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 1, 1, b"de")))
+    # The rest of that utterance, final chunk included, produces nothing
+    assert protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 1, 2, b"f"))) is None
+    assert protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 1, 3, b"g", final=True))) is None
+    # The next one is collected as usual
+    assert protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 2, 0, b"ok", final=True))) == b"ok"
+
+
+def test_new_stream_clears_an_overflowed_one(monkeypatch):
+    monkeypatch.setattr(framing, "MAX_UTTERANCE_BYTES", 4)
+    protocol = Protocol(PROTOCOL_VERSION)
+    with pytest.raises(FrameError):
+        protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 1, 0, b"toolong")))
+    assert protocol.collect(*protocol.read_audio(pack_frame("webm_opus", 2, 0, b"abcd", final=True))) == b"abcd"
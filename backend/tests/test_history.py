@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from services import history
+from services.history import ConversationHistory, estimate_tokens
+from services.response_parser import REVIEW_TAG
+
+REVIEW = {"name": "রহিম", "phone": "01712345678", "date": "20-10-2026", "time": "19:00", "people": "4"}
+
+
+def turn(n: int, words: int = 40) -> list:
+    return [
+        {"role": "user", "content": f"turn {n} " + "word " * words},
+        {"role": "assistant", "content": f"reply {n} " + "word " * words},
+    ]
+
+
+def review_turn(data: dict = REVIEW) -> list:
+    return [
+        {"role": "user", "content": "হ্যাঁ"},
+        {"role": "assistant", "content": f"{REVIEW_TAG} " + json.dumps(data, ensure_ascii=False)},
+    ]
+
+
+def reviewed(messages: list, data: dict = REVIEW) -> ConversationHistory:
+    """History whose last reviewed summary comes after `messages`, as main records it."""
+    h = ConversationHistory(messages + review_turn(data))
+    h.reservation.set_review(data)
+    return h
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(history, "HISTORY_TOKEN_BUDGET", 300)
+    monkeypatch.setattr(history, "HISTORY_MIN_TURNS", 2)
+
+
+def test_estimate_counts_bengali_per_character():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 40) == 11
+    assert estimate_tokens("আমি") == 4
+
+
+def test_short_history_is_left_alone(budget):
+    h = ConversationHistory(turn(1) + turn(2))
+    h.compact()
+    assert len(h) == 4
+    assert h.compacted_turns == 0
+    assert h.state_message() is None
+
+
+def test_compaction_drops_whole_turns_oldest_first(budget):
+    h = reviewed([m for n in range(10) for m in turn(n)])
+    h.compact()
+    assert h.token_count() <= 300
+    assert h[0]["role"] == "user"
+    assert REVIEW_TAG in h[-1]["content"]
+    assert h.compacted_turns == 11 - len(h) // 2
+
+
+def test_recent_turns_are_kept_even_over_budget(budget):
+    h = reviewed([m for n in range(5) for m in turn(n, words=400)])
+    for m in turn(5, words=400):
+        h.append(m)
+    h.compact()
+    assert [m["content"].split()[:2] for m in h if m["role"] == "user"] == [["হ্যাঁ"], ["turn", "5"]]
+    assert h.token_count() > 300
+
+
+def test_turns_before_the_first_review_are_never_dropped(budget):
+    # The name is only in this turn; nothing else would carry it forward
+    messages = [{"role": "user", "content": "আমার নাম রহিম"}, {"role": "assistant", "content": "ধন্যবাদ রহিম"}]
+    h = ConversationHistory(messages + [m for n in range(10) for m in turn(n)])
+    h.compact()
+    assert h.compacted_turns == 0
+    assert h[0]["content"] == "আমার নাম রহিম"
+    assert h.state_message() is None
+
+
+def test_name_from_a_dropped_turn_survives_in_the_state_message(budget):
+    messages = [{"role": "user", "content": "আমার নাম রহিম"}, {"role": "assistant", "content": "ধন্যবাদ রহিম"}]
+    h = reviewed(messages + [m for n in range(10) for m in turn(n)])
+    h.compact()
+    assert h.compacted_turns > 0
+    assert [m for m in h if m["content"] == "আমার নাম রহিম"] == []
+    note = h.state_message()
+    assert '"name": "রহিম"' in note["content"]
+    assert '"time": "19:00"' in note["content"]
+
+
+def test_turns_after_the_review_are_kept(budget):
+    # A correction after the review is not in the reviewed payload yet
+    h = reviewed([m for n in range(3) for m in turn(n)])
+    h.append({"role": "user", "content": "সময়টা রাত ৮টা করে দিন " + "word " * 200})
+    h.append({"role": "assistant", "content": "ঠিক আছে " + "word " * 200})
+    h.append({"role": "user", "content": "আর একজন বাড়বে " + "word " * 200})
+    h.compact()
+    assert h.token_count() > 300
+    assert h[0]["content"].startswith("সময়টা রাত ৮টা")
+
+
+def test_tool_calls_count_toward_the_budget():
+    call = {"role": "assistant", "content": None, "tool_calls": [
+        {"function": {"name": "check_availability", "arguments": '{"date": "20-10-2026"}'}},
+    ]}
+    assert ConversationHistory([call]).token_count() > ConversationHistory([{"role": "assistant"}]).token_count()
+
+
+def test_dropped_turns_survive_in_the_state_message(budget):
+    messages = [{"role": "user", "content": "আমার নম্বর 01712345678"}, {"role": "assistant", "content": "ধন্যবাদ"}]
+    messages += [m for n in range(10) for m in turn(n)]
+    h = reviewed(messages, {**REVIEW, "phone": "01712345678"})
+    h.compact()
+    assert [m for m in h if m["content"] == "আমার নম্বর 01712345678"] == []
+    note = h.state_message()
+    assert note["role"] == "system"
+    assert "01712345678" in note["content"]
+
+
+def test_round_trip_through_the_session_store(budget):
+    h = reviewed([m for n in range(10) for m in turn(n)])
+    h.append({"role": "user", "content": "01812345678"})
+    h.compact()
+    restored = ConversationHistory.from_dict(h.to_dict())
+    assert list(restored) == list(h)
+    assert restored.compacted_turns == h.compacted_turns
+    assert restored.reservation.review == REVIEW
+    assert restored.reservation.fields == {**REVIEW, "phone": "01812345678"}
@@ -0,0 +1,75 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services import llm, response_cache
+from services.history import ConversationHistory
+from services.phrases import LLM_ERROR_TEXT
+
+
+def chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text, tool_calls=None))])
+
+
+class FakeStream:
+    """Streams the given deltas, then raises `error` if set."""
+
+    def __init__(self, deltas, error=None):
+        self.deltas = deltas
+        self.error = error
+
+    async def chunks(self):
+        for delta in self.deltas:
+            yield chunk(delta)
+        if self.error:
+            raise self.error
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def model(monkeypatch):
+    """Replaces the OpenAI stream; set .stream (or .error to fail before the first token)."""
+    fake = SimpleNamespace(stream=None, error=None)
+
+    async def call(kind, targets, timeout, discard=None):
+        if fake.error:
+            raise fake.error
+        return fake.stream
+
+    monkeypatch.setattr(llm.resilience, "call", call)
+    monkeypatch.setattr(llm, "get_client", lambda: None)
+    monkeypatch.setattr(llm, "tools_enabled", lambda: False)
+    monkeypatch.setattr(llm, "prompt_prefix", lambda: [])
+    monkeypatch.setattr(response_cache, "enabled", lambda: False)
+    return fake
+
+
+def run(history):
+    async def collect():
+        return [delta async for delta in llm.stream_ai_response("কাল রাতে টেবিল", history)]
+    return asyncio.run(collect())
+
+
+def test_reply_is_recorded(model):
+    model.stream = FakeStream(["জি, ", "কতজন?"])
+    history = ConversationHistory()
+    assert run(history) == ["জি, ", "কতজন?"]
+    assert history[-1] == {"role": "assistant", "content": "জি, কতজন?"}
+
+
+def test_failure_after_text_records_what_was_spoken(model):
+    model.stream = FakeStream(["জি, ", "কতজন"], error=RuntimeError("connection reset"))
+    history = ConversationHistory()
+    assert run(history) == ["জি, ", "কতজন"]
+    assert history[-1] == {"role": "assistant", "content": "জি, কতজন ..."}
+
+
+def test_failure_before_text_records_the_error_reply(model):
+    model.error = RuntimeError("503")
+    history = ConversationHistory()
+    assert run(history) == [LLM_ERROR_TEXT]
+    assert [m["role"] for m in history] == ["user", "assistant"]
+    assert history[-1]["content"] == LLM_ERROR_TEXT
@@ -0,0 +1,35 @@
+import asyncio
+import time
+
+from services.pipeline import AudioInbox
+
+
+def test_full_inbox_drops_the_oldest_utterance():
+    inbox = AudioInbox(2, max_age=10)
+    assert inbox.put(b"one") and inbox.put(b"two")
+    assert not inbox.put(b"three")
+    assert inbox.dropped == 1
+
+    async def drain():
+        return [await inbox.get(), await inbox.get()]
+
+    assert asyncio.run(drain()) == [b"two", b"three"]
+
+
+def test_stale_utterance_is_skipped():
+    inbox = AudioInbox(2, max_age=0.02)
+    inbox.put(b"stale")
+    time.sleep(0.05)
+    inbox.put(b"fresh")
+    assert asyncio.run(inbox.get()) == b"fresh"
+    assert inbox.dropped == 1
+
+
+def test_get_waits_for_the_next_utterance():
+    inbox = AudioInbox(2, max_age=10)
+
+    async def later():
+        asyncio.get_running_loop().call_later(0.01, inbox.put, b"hello")
+        return await asyncio.wait_for(inbox.get(), 1)
+
+    assert asyncio.run(later()) == b"hello"
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+import sqlalchemy
+
+from benchmarks.fakes import SCHEMA
+from services import reservations
+
+
+def booking(n: int) -> dict:
+    return {"name": f"Guest {n}", "phone": "01712345678", "date": "2026-10-20", "time": "7:30 PM", "people": "4"}
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    """A fresh writer over a SQLite copy of the schema; slot index updates are recorded."""
+    engine = sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'reservations.db'}")
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(sqlalchemy.text(statement))
+    monkeypatch.setattr(reservations, "get_engine", lambda: engine)
+    monkeypatch.setattr(reservations, "_state", {"queue": None, "worker": None})
+    monkeypatch.setattr(reservations, "_pending", {})
+    monkeypatch.setattr(reservations, "_stats", dict.fromkeys(reservations._stats, 0))
+    monkeypatch.setattr(reservations, "RESERVATION_BATCH_WINDOW", 0.05)
+    engine.recorded = []
+    monkeypatch.setattr(reservations, "_record_bookings", engine.recorded.extend)
+    yield engine
+    engine.dispose()
+
+
+def rows(engine) -> list:
+    with engine.connect() as conn:
+        return conn.execute(sqlalchemy.text(
+            "SELECT id, name, date, time, idempotencyKey FROM Reservation ORDER BY id"
+        )).fetchall()
+
+
+def run(coro_fn):
+    async def main():
+        try:
+            return await coro_fn()
+        finally:
+            await reservations.stop_writer()
+    return asyncio.run(main())
+
+
+def test_burst_is_written_as_one_batch(engine):
+    async def burst():
+        return await asyncio.gather(*(reservations.save_reservation(booking(n), f"call-{n}") for n in range(5)))
+
+    ids = run(burst)
+    assert len(set(ids)) == 5 and None not in ids
+    stats = reservations.get_reservation_writer_stats()
+    assert (stats["batches"], stats["written"], stats["max_batch"]) == (1, 5, 5)
+    stored = rows(engine)
+    assert [r.id for r in stored] == ids
+    # Stored in the frontend's formats
+    assert (stored[0].date, stored[0].time) == ("20-10-2026", "07:30 PM")
+    assert [booking_id for _, booking_id in engine.recorded] == ids
+
+
+def test_repeated_key_returns_the_stored_booking(engine):
+    async def confirm_twice():
+        first = await reservations.save_reservation(booking(1), "call-1")
+        # A resumed call confirms again after the first write finished
+        again = await reservations.save_reservation(booking(1), "call-1")
+        return first, again
+
+    first, again = run(confirm_twice)
+    assert first is not None and again == first
+    assert len(rows(engine)) == 1
+
+
+def test_concurrent_confirms_share_one_write(engine):
+    async def confirm_together():
+        return await asyncio.gather(
+            reservations.save_reservation(booking(1), "call-1"),
+            reservations.save_reservation(booking(1), "call-1"),
+        )
+
+    first, second = run(confirm_together)
+    assert first == second is not None
+    assert reservations.get_reservation_writer_stats()["deduplicated"] == 1
+    assert len(rows(engine)) == 1
+
+
+def test_failed_write_resolves_every_caller(engine, monkeypatch):
+    monkeypatch.setattr(reservations, "get_engine", lambda: None)
+
+    async def burst():
+        return await asyncio.gather(*(reservations.save_reservation(booking(n), f"call-{n}") for n in range(3)))
+
+    assert run(burst) == [None, None, None]
+    stats = reservations.get_reservation_writer_stats()
+    assert (stats["failed"], stats["pending"]) == (3, 0)
+    assert engine.recorded == []
+
+
+def test_writer_keeps_going_after_a_failed_batch(engine, monkeypatch):
+    engines = iter([None])
+    monkeypatch.setattr(reservations, "get_engine", lambda: next(engines, engine))
+
+    async def two_batches():
+        failed = await reservations.save_reservation(booking(1), "call-1")
+        stored = await reservations.save_reservation(booking(2), "call-2")
+        return failed, stored
+
+    failed, stored = run(two_batches)
+    assert failed is None and stored is not None
+    assert [r.idempotencyKey for r in rows(engine)] == ["call-2"]
+
+
+def test_shutdown_flushes_the_queue(engine):
+    async def submit_and_stop():
+        futures = [reservations.submit_reservation(booking(n), f"call-{n}") for n in range(3)]
+        await reservations.stop_writer()
+        assert all(f.done() for f in futures)
+        return [f.result() for f in futures]
+
+    ids = run(submit_and_stop)
+    assert None not in ids
+    assert [r.id for r in rows(engine)] == ids
+    assert reservations.get_reservation_writer_stats()["queued"] == 0
+
+
+def test_shutdown_past_its_deadline_leaves_nobody_waiting(engine, monkeypatch):
+    monkeypatch.setattr(reservations, "RESERVATION_WRITE_TIMEOUT", 0)
+
+    async def submit_and_stop():
+        futures = [reservations.submit_reservation(booking(n), f"call-{n}") for n in range(3)]
+        await reservations.stop_writer()
+        return [f.result() for f in futures]
+
+    # Nothing was flushed in time: every booking is left to the browser
+    assert run(submit_and_stop) == [None, None, None]
+    stats = reservations.get_reservation_writer_stats()
+    assert (stats["queued"], stats["pending"]) == (0, 0)
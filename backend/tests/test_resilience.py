@@ -0,0 +1,201 @@
+import asyncio
+import builtins
+
+import pytest
+
+from services import resilience
+from services.admission import UpstreamBusy
+from services.resilience import CircuitBreaker, Target, UpstreamError
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture(autouse=True)
+def fresh(monkeypatch):
+    monkeypatch.setattr(resilience, "_targets", {})
+    monkeypatch.setattr(resilience, "UPSTREAM_BACKOFF", 0)
+    monkeypatch.setattr(resilience, "UPSTREAM_RETRIES", 1)
+    monkeypatch.setattr(resilience, "UPSTREAM_HEDGE", True)
+    monkeypatch.setattr(resilience, "BREAKER_FAILURES", 3)
+    monkeypatch.setattr(resilience, "BREAKER_COOLDOWN", 30)
+
+
+def upstream(*outcomes):
+    """fn(timeout) that plays outcomes in order: a value, an exception, or ("sleep", seconds, value)."""
+    calls = []
+
+    async def fn(timeout):
+        outcome = outcomes[min(len(calls), len(outcomes) - 1)]
+        calls.append(timeout)
+        if isinstance(outcome, tuple):
+            await asyncio.sleep(outcome[1])
+            return outcome[2]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    fn.calls = calls
+    return fn
+
+
+def call(alternatives, timeout=1.0, **kwargs):
+    return asyncio.run(resilience.call("tts", alternatives, timeout, **kwargs))
+
+
+def test_breaker_opens_after_consecutive_failures(monkeypatch):
+    breaker = CircuitBreaker()
+    breaker.failure()
+    breaker.failure()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.failures == 0
+    for _ in range(3):
+        breaker.failure()
+    assert breaker.state == "open" and breaker.opens == 1
+    assert not breaker.allow()
+
+
+def test_half_open_breaker_lets_one_probe_through(monkeypatch):
+    breaker = CircuitBreaker()
+    for _ in range(3):
+        breaker.failure()
+    monkeypatch.setattr(resilience, "BREAKER_COOLDOWN", 0)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # one probe at a time
+
+    breaker.abandon()  # a cancelled probe proves nothing
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.state == "open" and breaker.opens == 2
+
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+
+def test_hedge_delay_tracks_p95(monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_MIN_SAMPLES", 20)
+    target = Target("t")
+    for _ in range(19):
+        target.record(0.1)
+    assert target.hedge_delay() is None
+    target.record(0.1)
+    assert target.hedge_delay() == pytest.approx(0.1)
+    for _ in range(10):
+        target.record(2.0)
+    assert target.hedge_delay() == pytest.approx(2.0)
+
+
+def test_p95_is_resorted_every_ten_samples_once_the_window_is_full(monkeypatch):
+    sorts = []
+
+    def counting_sorted(values):
+        sorts.append(1)
+        return builtins.sorted(values)
+
+    monkeypatch.setattr(resilience, "sorted", counting_sorted, raising=False)
+    target = Target("t")
+    for _ in range(resilience.HEDGE_WINDOW):
+        target.record(0.1)
+    sorts.clear()
+    for _ in range(30):
+        target.record(0.1)
+    assert len(sorts) == 3
+
+
+def test_retries_then_succeeds():
+    fn = upstream(HTTPError(503), b"ok")
+    assert call([("tts:a", fn)]) == b"ok"
+    stats = resilience._targets["tts:a"].stats
+    assert (stats["calls"], stats["failures"], stats["retries"], stats["successes"]) == (2, 1, 1, 1)
+
+
+def test_client_errors_are_not_retried():
+    fn = upstream(HTTPError(400), b"ok")
+    with pytest.raises(UpstreamError):
+        call([("tts:a", fn)])
+    assert len(fn.calls) == 1
+
+
+def test_open_circuit_fails_over_at_once():
+    primary = upstream(HTTPError(500))
+    fallback = upstream(b"fallback")
+    for _ in range(2):
+        assert call([("tts:a", primary), ("tts:b", fallback)]) == b"fallback"
+    assert resilience._targets["tts:a"].breaker.state == "open"
+    calls_before = len(primary.calls)
+
+    assert call([("tts:a", primary), ("tts:b", fallback)]) == b"fallback"
+    assert len(primary.calls) == calls_before
+    assert resilience._targets["tts:a"].stats["short_circuited"] == 1
+    assert resilience._targets["tts:b"].stats["failovers"] == 3
+
+
+def test_slow_attempt_is_hedged(monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(resilience, "HEDGE_MIN_DELAY", 0.01)
+    target = resilience._target("tts:a")
+    for _ in range(5):
+        target.record(0.02)
+    fn = upstream(("sleep", 5, b"slow"), ("sleep", 0, b"hedge"))
+    assert call([("tts:a", fn)], timeout=2.0) == b"hedge"
+    assert (target.stats["hedged"], target.stats["hedge_wins"]) == (1, 1)
+
+
+def test_hedging_stays_within_budget(monkeypatch):
+    monkeypatch.setattr(resilience, "HEDGE_BUDGET", 0.0)
+    target = resilience._target("tts:a")
+    target.stats["hedged"] = 1
+    assert not resilience._may_hedge("tts", target)
+    target.stats["hedged"] = 0
+    assert resilience._may_hedge("tts", target)
+
+
+def test_timeouts_and_failures_count_toward_p95(monkeypatch):
+    monkeypatch.setattr(resilience, "UPSTREAM_RETRIES", 0)
+    with pytest.raises(UpstreamError):
+        call([("tts:a", upstream(("sleep", 1, b"late")))], timeout=0.05)
+    target = resilience._targets["tts:a"]
+    assert target.stats["timeouts"] == 1
+    assert list(target._samples) == [pytest.approx(0.05, abs=0.04)]
+
+    with pytest.raises(UpstreamError):
+        call([("tts:a", upstream(HTTPError(500)))])
+    assert len(target._samples) == 2
+
+
+def test_turn_deadline_bounds_every_attempt():
+    fn = upstream(("sleep", 1, b"late"))
+
+    async def turn():
+        with resilience.deadline(0.1):
+            return await resilience.call("tts", [("tts:a", fn)], 5.0)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(asyncio.wait_for(turn(), 1.0))
+    assert fn.calls[0] <= 0.1
+
+
+def test_busy_upstream_is_not_a_provider_failure():
+    with pytest.raises(UpstreamBusy):
+        call([("tts:a", upstream(UpstreamBusy("no slot")))])
+    target = resilience._targets["tts:a"]
+    assert target.stats["failures"] == 0 and target.breaker.failures == 0
+
+
+def test_discard_releases_a_losing_result():
+    released = []
+
+    async def discard(result):
+        released.append(result)
+
+    async def scenario():
+        loser = asyncio.create_task(asyncio.sleep(0, result="stream"))
+        await loser
+        await resilience._discard(loser, discard)
+
+    asyncio.run(scenario())
+    assert released == ["stream"]
@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+
+from services import response_cache
+from services.response_parser import ReservationState
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    version = {"value": 1}
+    monkeypatch.setattr(response_cache, "get_config_version", lambda: version["value"])
+    monkeypatch.setattr(response_cache, "local_now", lambda: datetime(2026, 10, 20, 19, 0))
+    monkeypatch.setattr(response_cache, "_entries", response_cache.OrderedDict())
+    return version
+
+
+def state(**fields):
+    return ReservationState(fields)
+
+
+def test_normalize_folds_case_punctuation_and_digits():
+    assert response_cache.normalize("  হ্যাঁ।  ঠিক আছে! ") == "হ্যাঁ ঠিক আছে"
+    assert response_cache.normalize("Two PEOPLE, ২ জন") == "two people 2 জন"
+
+
+def test_same_words_at_the_same_stage_share_a_key():
+    key = response_cache.cache_key("দুইজন।", state(date="20-10-2026"))
+    assert key == response_cache.cache_key("দুইজন", state(date="20-10-2026"))
+    assert key != response_cache.cache_key("দুইজন", state(date="21-10-2026"))
+    assert key != response_cache.cache_key("দুইজন", None)
+
+
+def test_identity_enters_the_key_only_as_known_or_not():
+    rahim = response_cache.cache_key("yes", state(name="Rahim", phone="01712345678"))
+    karim = response_cache.cache_key("yes", state(name="Karim", phone="01812345678"))
+    assert rahim == karim
+    assert rahim != response_cache.cache_key("yes", state(name="Rahim"))
+
+
+def test_review_config_and_day_change_the_key(cache, monkeypatch):
+    reviewed = state()
+    reviewed.set_review({"people": "2"})
+    key = response_cache.cache_key("yes", state(people="2"))
+    assert key != response_cache.cache_key("yes", reviewed)
+
+    cache["value"] = 2
+    assert key != response_cache.cache_key("yes", state(people="2"))
+    cache["value"] = 1
+    monkeypatch.setattr(response_cache, "local_now", lambda: datetime(2026, 10, 21, 9, 0))
+    assert key != response_cache.cache_key("yes", state(people="2"))
+
+
+@pytest.mark.parametrize("utterance, personal", [
+    ("আমার নাম রহিম", True),
+    ("my phone is 0171 234", True),
+    ("০১৭১২৩৪৫৬৭৮", True),
+    ("দুইজন, সন্ধ্যা সাতটায়", False),
+    ("yes please", False),
+])
+def test_is_personal(utterance, personal):
+    assert response_cache.is_personal(utterance) is personal
+
+
+def test_store_and_lookup():
+    assert response_cache.lookup("k") is None
+    response_cache.store("k", "কয়জন আসবেন?")
+    assert response_cache.lookup("k") == "কয়জন আসবেন?"
+
+
+@pytest.mark.parametrize("reply, kwargs", [
+    ("Checking. [REVIEW_DETAILS] {}", {}),
+    ("Done. [CONFIRM_RESERVATION]", {}),
+    ("7 PM is free.", {"tool_calls": True}),
+    ("ধন্যবাদ Rahim!", {"reservation": ReservationState({"name": "Rahim"})}),
+    ("আপনার নম্বর ০১৭১২৩৪৫৬৭৮?", {}),
+    ("", {}),
+])
+def test_uncacheable_replies_are_not_stored(reply, kwargs):
+    response_cache.store("k", reply, **kwargs)
+    assert response_cache.lookup("k") is None
+
+
+def test_entries_expire(monkeypatch):
+    monkeypatch.setattr(response_cache, "LLM_CACHE_TTL", -1)
+    response_cache.store("k", "ok")
+    assert response_cache.lookup("k") is None
+    assert "k" not in response_cache._entries
+
+
+def test_least_recently_used_is_evicted(monkeypatch):
+    monkeypatch.setattr(response_cache, "LLM_CACHE_SIZE", 2)
+    response_cache.store("a", "A")
+    response_cache.store("b", "B")
+    response_cache.lookup("a")
+    response_cache.store("c", "C")
+    assert [response_cache.lookup(k) for k in "abc"] == ["A", None, "C"]
+
+
+def test_config_change_clears_the_cache():
+    response_cache.store("k", "ok")
+    response_cache._on_config_change({"SYSTEM_PROMPT"})
+    assert response_cache.lookup("k") is None
@@ -0,0 +1,96 @@
+import pytest
+
+from services.response_parser import (
+    CONFIRM_TAG, REVIEW_TAG, ReservationState, ResponseScanner, scan_response,
+)
+
+REPLY = (
+    'ধন্যবাদ! আপনার বুকিং **দেখে নিন**। [REVIEW_DETAILS] '
+    '{"name": "Rahim {VIP}", "phone": "01712345678", "note": "say \\"hi\\"", "people": "4"} '
+    'সন্ধ্যা 7.30 ঠিক আছে? Table for four. [CONFIRM_RESERVATION]'
+)
+
+
+def feed_in_pieces(text: str, size: int) -> list:
+    scanner = ResponseScanner()
+    events = []
+    for i in range(0, len(text), size):
+        events += scanner.feed(text[i:i + size])
+    return events + scanner.flush()
+
+
+def test_sentences_tags_and_json_in_stream_order():
+    assert scan_response(REPLY) == [
+        ("sentence", "ধন্যবাদ!"),
+        ("sentence", "আপনার বুকিং দেখে নিন।"),
+        ("tag", REVIEW_TAG),
+        ("json", {"name": "Rahim {VIP}", "phone": "01712345678", "note": 'say "hi"', "people": "4"}),
+        ("sentence", "সন্ধ্যা 7.30 ঠিক আছে?"),
+        ("sentence", "Table for four."),
+        ("tag", CONFIRM_TAG),
+    ]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 16])
+def test_events_do_not_depend_on_delta_boundaries(size):
+    assert feed_in_pieces(REPLY, size) == scan_response(REPLY)
+
+
+def test_sentence_is_emitted_as_soon_as_it_ends():
+    scanner = ResponseScanner()
+    assert scanner.feed("আপনার নাম কী") == []
+    assert scanner.feed("? আর ফোন") == [("sentence", "আপনার নাম কী?")]
+    assert scanner.flush() == [("sentence", "আর ফোন")]
+
+
+def test_period_needs_following_whitespace():
+    scanner = ResponseScanner()
+    assert scanner.feed("At 7.") == []
+    assert scanner.feed("30 pm.") == []
+    assert scanner.feed(" Done") == [("sentence", "At 7.30 pm.")]
+
+
+def test_unknown_brackets_stay_in_the_text():
+    assert scan_response("Call [0171] now.") == [("sentence", "Call [0171] now.")]
+    long = "[" + "x" * 40 + "] ok"
+    assert scan_response(long) == [("sentence", long)]
+
+
+def test_invalid_json_is_reported_as_none():
+    assert scan_response('{"name": oops}') == [("json", None)]
+
+
+def test_unterminated_json_is_never_spoken():
+    assert scan_response('Sure. {"name": "Ra') == [("sentence", "Sure.")]
+
+
+def test_text_keeps_the_raw_reply():
+    scanner = ResponseScanner()
+    scanner.feed("**Hi** ")
+    scanner.feed("[REVIEW_DETAILS]")
+    assert scanner.text == "**Hi** [REVIEW_DETAILS]"
+
+
+def test_reservation_state_gathers_fields_from_history():
+    state = ReservationState()
+    state.observe({"role": "user", "content": "আমার নম্বর ০১৭১২-৩৪৫ ৬৭৮"})
+    state.observe({"role": "assistant", "tool_calls": [
+        {"function": {"arguments": '{"date": "20-10-2026", "time": "7:00 PM", "people": "4"}'}},
+        {"function": {"arguments": "not json"}},
+    ]})
+    assert state.gathered() == {"phone": "01712345678", "date": "20-10-2026", "time": "7:00 PM", "people": "4"}
+    assert state.confirmation_data() is None  # no name yet
+
+    state.fields["name"] = "Rahim"
+    assert state.confirmation_data()["name"] == "Rahim"
+
+
+def test_reviewed_payload_wins_and_survives_a_round_trip():
+    state = ReservationState({"name": "Old"})
+    review = {"name": "Rahim", "phone": "01712345678", "people": "2"}
+    state.set_review(review)
+    assert state.confirmation_data() is review
+
+    restored = ReservationState.from_dict(state.to_dict())
+    assert restored.confirmation_data() == review
+    assert restored.fields["name"] == "Rahim"
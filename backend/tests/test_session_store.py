@@ -0,0 +1,97 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from services import session_store
+from services.response_parser import ReservationState
+from services.session_store import MemorySessionStore, SQLiteSessionStore
+
+REVIEW = {"name": "রহিম", "phone": "01712345678", "date": "20-10-2026", "time": "07:00 PM", "people": "4"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, monkeypatch, tmp_path):
+    if request.param == "sqlite":
+        store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    else:
+        store = MemorySessionStore()
+    monkeypatch.setattr(session_store, "_store", store)
+    monkeypatch.setattr(session_store, "_stats", dict.fromkeys(session_store._stats, 0))
+    return store
+
+
+def saved_call() -> dict:
+    session = session_store.new_session()
+    history = session["conversation_history"]
+    history.append({"role": "user", "content": "আমার নাম রহিম, নম্বর 01712345678"})
+    history.append({"role": "assistant", "content": "[REVIEW_DETAILS] ..."})
+    history.reservation.set_review(REVIEW)
+    session["turn_count"] = 1
+    asyncio.run(session_store.save_session(session))
+    return session
+
+
+def test_resume_restores_the_call(store):
+    session = saved_call()
+    resumed = asyncio.run(session_store.resume_session(session["resume_token"]))
+    assert resumed["session_id"] == session["session_id"]
+    assert resumed["turn_count"] == 1
+    assert list(resumed["conversation_history"]) == list(session["conversation_history"])
+    assert resumed["conversation_history"].reservation.review == REVIEW
+    assert session_store.get_session_store_stats()["resumed"] == 1
+
+
+def test_expired_token_does_not_resume(store, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_TTL", -1)
+    session = saved_call()
+    assert asyncio.run(session_store.resume_session(session["resume_token"])) is None
+    assert session_store.get_session_store_stats()["resume_misses"] == 1
+
+
+def test_wrong_token_does_not_resume(store):
+    session = saved_call()
+    assert asyncio.run(session_store.resume_session(session["resume_token"] + "x")) is None
+    assert asyncio.run(session_store.resume_session(session_store._token_key(session["resume_token"]))) is None
+
+
+def test_only_a_hash_of_the_token_is_stored(tmp_path, monkeypatch):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.db"))
+    monkeypatch.setattr(session_store, "_store", store)
+    session = saved_call()
+    keys = [row[0] for row in sqlite3.connect(store.path).execute("SELECT token_key FROM sessions")]
+    assert keys == [session_store._token_key(session["resume_token"])]
+    assert session["resume_token"] not in keys[0]
+
+
+def test_deleted_session_does_not_resume(store):
+    session = saved_call()
+    asyncio.run(session_store.delete_session(session))
+    assert asyncio.run(session_store.resume_session(session["resume_token"])) is None
+    assert store.count() == 0
+
+
+def test_purge_loop_drops_expired_sessions(store, monkeypatch):
+    monkeypatch.setattr(session_store, "SESSION_TTL", -1)
+    saved_call()
+    monkeypatch.setattr(session_store, "SESSION_TTL", 60)
+    live = saved_call()
+    assert store.count() == 2
+
+    async def purge_once():
+        task = asyncio.create_task(session_store.purge_loop(interval=60))
+        while store.count() > 1:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    asyncio.run(asyncio.wait_for(purge_once(), 5))
+    assert asyncio.run(session_store.resume_session(live["resume_token"])) is not None
+
+
+def test_reservation_state_round_trip():
+    state = ReservationState({"phone": "01712345678", "date": "20-10-2026"}, review=REVIEW)
+    restored = ReservationState.from_dict(state.to_dict())
+    assert restored.fields == state.fields
+    assert restored.review == REVIEW
+    assert restored.confirmation_data() == REVIEW
+    assert ReservationState.from_dict({}).to_dict() == {"fields": {}, "review": None}
@@ -0,0 +1,107 @@
+import pytest
+
+from services import slots
+
+DATE = "20-10-2026"
+SETTINGS = {
+    "opening": 10 * 60, "closing": 23 * 60, "slot_minutes": 30, "seating_minutes": 90,
+    "seat_capacity": 10, "table_count": 0, "table_size": 4,
+}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """The Reservation rows fetch_reservations returns: (id, time, people)."""
+    rows = []
+    monkeypatch.setitem(slots._settings, "value", dict(SETTINGS))
+    monkeypatch.setattr(slots, "_days", {})
+    monkeypatch.setattr(slots.db, "fetch_reservations", lambda date: list(rows))
+    return rows
+
+
+def available(time_str, people):
+    return slots.check_availability(DATE, time_str, people)["available"]
+
+
+@pytest.mark.parametrize("people, expected", [
+    ("4", 4), (3, 3), ("৪ জন", 4), ("about 6 people", 6), ("0", 1), (None, 2), ("a few", 2),
+])
+def test_parse_people(people, expected):
+    assert slots.parse_people(people) == expected
+
+
+def test_booking_occupies_its_whole_seating(table):
+    table.append((1, "06:00 PM", "8"))
+    assert available("06:00 PM", 2)
+    assert not available("06:00 PM", 3)
+    assert not available("07:00 PM", 3)   # 90 minutes: 6:00-7:30
+    assert not available("05:00 PM", 3)   # a 5:00 party would still be seated at 6:00
+    assert available("07:30 PM", 10)
+    assert available("04:30 PM", 10)
+
+
+def test_table_count_limits_parties(table, monkeypatch):
+    monkeypatch.setitem(slots._settings["value"], "table_count", 2)
+    table.append((1, "07:00 PM", "5"))  # two tables of four
+    assert not available("07:00 PM", 1)
+    assert available("09:00 PM", 8)
+    assert not available("09:00 PM", 9)
+
+
+def test_closed_hours_and_unclear_times(table):
+    result = slots.check_availability(DATE, "08:00 AM", 2)
+    assert not result["available"] and "closed" in result["reason"]
+    assert available("sometime", 2)
+
+
+def test_alternatives_are_nearest_free_slots(table):
+    table.append((1, "07:00 PM", "10"))
+    assert slots.find_alternatives(DATE, "07:00 PM", 2) == ["05:00 PM", "05:30 PM", "08:30 PM"]
+    assert slots.find_alternatives(DATE, None, 2, count=2) == ["10:00 AM", "10:30 AM"]
+
+
+def test_recorded_booking_counts_without_a_reload(table):
+    assert available("07:00 PM", 10)
+    slots.record_booking(DATE, "7:00 pm", "6", booking_id=5)
+    assert not available("07:00 PM", 5)
+
+    # The same booking coming back from the table is not counted twice
+    table.append((5, "07:00 PM", "6"))
+    slots.record_booking("2026-10-20", "07:00 PM", "6", booking_id=5)
+    assert available("07:00 PM", 4)
+
+
+def test_reload_after_ttl_forgets_deleted_bookings(table, monkeypatch):
+    table.append((1, "07:00 PM", "10"))
+    assert not available("07:00 PM", 1)
+    table.clear()
+    assert not available("07:00 PM", 1)  # still within the TTL
+    monkeypatch.setattr(slots, "SLOT_INDEX_TTL", 0)
+    assert available("07:00 PM", 10)
+
+
+def test_reload_keeps_bookings_recorded_while_it_ran(table, monkeypatch):
+    assert available("07:00 PM", 10)
+    monkeypatch.setattr(slots, "SLOT_INDEX_TTL", 0)
+
+    def fetch_while_booking(date):
+        # Committed after this read started, so the rows do not include it
+        slots.record_booking(DATE, "07:00 PM", "6", booking_id=9)
+        return []
+
+    monkeypatch.setattr(slots.db, "fetch_reservations", fetch_while_booking)
+    day = slots._get_day(DATE)
+    assert 9 in day.recorded
+    assert not day.fits(19 * 60, 5)
+
+
+def test_failed_reload_keeps_the_current_index(table, monkeypatch):
+    table.append((1, "07:00 PM", "10"))
+    assert not available("07:00 PM", 1)
+    monkeypatch.setattr(slots, "SLOT_INDEX_TTL", 0)
+
+    def broken(date):
+        raise RuntimeError("db down")
+
+    monkeypatch.setattr(slots.db, "fetch_reservations", broken)
+    assert not available("07:00 PM", 1)
@@ -0,0 +1,98 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services import stt
+
+
+def result(text, is_final=False):
+    return SimpleNamespace(alternatives=[SimpleNamespace(transcript=text)], is_final=is_final)
+
+
+def response(*results):
+    return SimpleNamespace(results=list(results), speech_event_type=0)
+
+
+class FakeSpeechClient:
+    """streaming_recognize that answers every chunk with an interim result."""
+
+    def __init__(self, final_after=None):
+        self.final_after = final_after  # End the utterance after this many chunks
+        self.chunks = []
+
+    def streaming_recognize(self, config, requests, timeout):
+        for n, request in enumerate(requests, 1):
+            self.chunks.append(request.audio_content)
+            if n == self.final_after:
+                yield response(result("book a table", is_final=True))
+            else:
+                yield response(result(f"part {n}"))
+        if self.final_after is None:
+            yield response(result("hello world", is_final=True))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def no_greeting(websocket, protocol):
+        pass
+
+    async def handle_turn(websocket, session, transcript):
+        await websocket.send_json({"type": "turn", "transcript": transcript})
+
+    monkeypatch.setattr(main, "send_greeting", no_greeting)
+    monkeypatch.setattr(main, "speculate", lambda *args, **kwargs: None)
+    monkeypatch.setattr(main, "handle_turn", handle_turn)
+    return TestClient(main.app)
+
+
+def use_speech(monkeypatch, fake):
+    monkeypatch.setattr(stt, "get_google_speech_client", lambda: fake)
+    return fake
+
+
+def test_stream_relays_partials_and_starts_turn_on_stream_end(client, monkeypatch):
+    fake = use_speech(monkeypatch, FakeSpeechClient())
+    with client.websocket_connect("/ws") as ws:
+        assert ws.receive_json()["type"] == "session"
+        ws.send_json({"type": "stream_start"})
+        ws.send_bytes(b"audio-1")
+        assert ws.receive_json() == {"type": "partial_transcript", "content": "part 1"}
+        ws.send_bytes(b"audio-2")
+        assert ws.receive_json() == {"type": "partial_transcript", "content": "part 2"}
+        ws.send_json({"type": "stream_end"})
+        assert ws.receive_json() == {"type": "turn", "transcript": "hello world"}
+    assert fake.chunks == [b"audio-1", b"audio-2"]
+
+
+def test_final_result_starts_turn_before_stream_end(client, monkeypatch):
+    fake = use_speech(monkeypatch, FakeSpeechClient(final_after=1))
+    with client.websocket_connect("/ws") as ws:
+        assert ws.receive_json()["type"] == "session"
+        ws.send_json({"type": "stream_start"})
+        ws.send_bytes(b"audio-1")
+        assert ws.receive_json() == {"type": "turn", "transcript": "book a table"}
+        # The utterance is over; the rest of the recording is not uploaded
+        ws.send_bytes(b"audio-2")
+        ws.send_json({"type": "stream_end"})
+    assert fake.chunks == [b"audio-1"]
+
+
+def test_new_stream_start_replaces_the_open_stream(client, monkeypatch):
+    use_speech(monkeypatch, FakeSpeechClient())
+    with client.websocket_connect("/ws") as ws:
+        assert ws.receive_json()["type"] == "session"
+        ws.send_json({"type": "stream_start"})
+        ws.send_bytes(b"audio-1")
+        assert ws.receive_json()["content"] == "part 1"
+        # Caller starts over: the first stream is closed and the new one gets the audio
+        ws.send_json({"type": "stream_start"})
+        ws.send_bytes(b"audio-2")
+        ws.send_json({"type": "stream_end"})
+        messages = [ws.receive_json() for _ in range(3)]
+    assert messages == [
+        {"type": "stop_audio"},
+        {"type": "partial_transcript", "content": "part 1"},
+        {"type": "turn", "transcript": "hello world"},
+    ]
@@ -0,0 +1,53 @@
+import asyncio
+import os
+
+import pytest
+
+from services import tts_cache
+
+
+@pytest.fixture
+def cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(tts_cache, "TTS_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(tts_cache, "TTS_CACHE_DISK_BYTES", 1000)
+    monkeypatch.setattr(tts_cache, "_disk", {"bytes": None})
+    monkeypatch.setattr(tts_cache, "_memory", tts_cache.OrderedDict())
+    monkeypatch.setattr(tts_cache, "_memory_bytes", 0)
+    monkeypatch.setattr(tts_cache, "_stats", dict.fromkeys(tts_cache._stats, 0))
+    return tmp_path
+
+
+def on_disk(path) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def test_disk_bytes_track_new_files(cache):
+    asyncio.run(tts_cache.put("a" * 64, b"x" * 100, persist=True))
+    asyncio.run(tts_cache.put("b" * 64, b"x" * 200, persist=True))
+    assert tts_cache.get_tts_cache_stats()["disk_bytes"] == on_disk(cache) == 300
+
+
+def test_rewriting_a_key_does_not_grow_the_count(cache):
+    asyncio.run(tts_cache.put("b" * 64, b"x" * 10, persist=True))
+    for size in (300, 300, 300, 250):
+        asyncio.run(tts_cache.put("a" * 64, b"x" * size, persist=True))
+        assert tts_cache.get_tts_cache_stats()["disk_bytes"] == on_disk(cache) == 10 + size
+    # A count that drifted up would have evicted early
+    assert tts_cache.get_tts_cache_stats()["disk_evictions"] == 0
+    assert len(os.listdir(cache)) == 2
+
+
+def test_eviction_brings_the_store_under_its_cap(cache):
+    for n in range(5):
+        asyncio.run(tts_cache.put(f"{n}" * 64, b"x" * 300, persist=True))
+    stats = tts_cache.get_tts_cache_stats()
+    assert stats["disk_bytes"] == on_disk(cache) <= 900
+    assert stats["disk_evictions"] > 0
+
+
+def test_disk_tier_refills_memory(cache):
+    asyncio.run(tts_cache.put("a" * 64, b"audio", persist=True))
+    tts_cache._memory.clear()
+    assert asyncio.run(tts_cache.get("a" * 64)) == b"audio"
+    assert tts_cache.contains("a" * 64)
+    assert tts_cache.get_tts_cache_stats()["disk_hits"] == 1
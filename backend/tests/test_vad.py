@@ -0,0 +1,116 @@
+from pathlib import Path
+
+import pytest
+
+from services import vad
+
+DATA = Path(__file__).parent / "data"
+
+
+def clip(name: str) -> bytes:
+    return (DATA / name).read_bytes()
+
+
+def stream(audio: bytes, size: int = 4000) -> list:
+    segmenter = vad.UtteranceSegmenter()
+    events = []
+    for i in range(0, len(audio), size):
+        events += segmenter.feed(audio[i:i + size])
+    return events
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(vad, "VAD_ENABLED", True)
+
+
+def test_enabled_by_default(monkeypatch):
+    import importlib
+
+    monkeypatch.delenv("VAD_ENABLED", raising=False)
+    try:
+        assert importlib.reload(vad).VAD_ENABLED is True
+    finally:
+        importlib.reload(vad)
+
+
+def test_disabled_passes_everything_through(monkeypatch):
+    monkeypatch.setattr(vad, "VAD_ENABLED", False)
+    audio = clip("room_noise.webm")
+    assert vad.filter_speech(audio) == (audio, {"duration_ms": None, "speech_ms": None, "kept_ms": None})
+
+
+def test_reader_parses_browser_clip():
+    reader = vad.WebmOpusReader()
+    frames = reader.feed(clip("speech.webm"))
+    assert reader.is_opus
+    assert len(frames) == 150
+    assert all(f.duration_ms == 20 for f in frames)
+    assert reader.duration_ms == pytest.approx(3000, abs=20)
+
+
+def test_reader_accepts_any_chunking():
+    audio = clip("speech_in_noise.webm")
+    reader = vad.WebmOpusReader()
+    frames = []
+    for i in range(0, len(audio), 997):
+        frames += reader.feed(audio[i:i + 997])
+    assert [f.packet for f in frames] == [f.packet for f in vad.WebmOpusReader().feed(audio)]
+
+
+def test_speech_is_kept_whole(enabled):
+    audio = clip("speech.webm")
+    kept, info = vad.filter_speech(audio)
+    assert kept == audio
+    assert info["speech_ms"] >= 2000
+
+
+@pytest.mark.parametrize("name", ["silence.webm", "room_noise.webm", "loud_hiss.webm"])
+def test_non_speech_is_dropped_before_stt(enabled, name):
+    audio, info = vad.filter_speech(clip(name))
+    assert audio is None
+    assert info["speech_ms"] == 0
+
+
+@pytest.mark.parametrize("name", ["speech_in_noise.webm", "speech_in_silence.webm"])
+def test_speech_is_trimmed_to_its_span(enabled, name):
+    original = clip(name)
+    audio, info = vad.filter_speech(original)
+    assert audio is not None and len(audio) < len(original)
+    assert info["speech_ms"] >= 2000
+    assert info["kept_ms"] < info["duration_ms"]
+
+    # The trimmed clip is still WebM/Opus, starting just before the speech
+    reader = vad.WebmOpusReader()
+    frames = reader.feed(audio)
+    assert reader.is_opus
+    assert sum(f.duration_ms for f in frames) == info["kept_ms"]
+    # (the recording itself opens with a short pause before the first word)
+    assert 1000 - vad.VAD_PAD_MS <= frames[0].start_ms < 1000 + 500
+
+    # ...and still holds all of it
+    assert vad.filter_speech(audio)[1]["speech_ms"] == pytest.approx(info["speech_ms"], abs=100)
+
+
+def test_unparseable_audio_passes_through(enabled):
+    audio = b"RIFF\x00\x00\x00\x00WAVEfmt "
+    assert vad.filter_speech(audio)[0] == audio
+
+
+def test_clip_passes_through_without_a_decoder(enabled, monkeypatch):
+    def missing():
+        raise ModuleNotFoundError("No module named 'av'")
+
+    monkeypatch.setattr(vad, "OpusDecoder", missing)
+    audio = clip("room_noise.webm")
+    assert vad.filter_speech(audio)[0] == audio
+
+
+@pytest.mark.parametrize("name", ["speech_in_noise.webm", "speech_in_silence.webm"])
+def test_segmenter_finds_utterance_end(enabled, name):
+    assert stream(clip(name)) == ["speech_start", "speech_end"]
+
+
+@pytest.mark.parametrize("name", ["room_noise.webm", "loud_hiss.webm", "silence.webm"])
+def test_segmenter_ignores_noise(enabled, name):
+    assert stream(clip(name)) == []
@@ -31,6 +31,7 @@ export async function saveReservation(data: {
     date: string;
     time: string;
     people: string;
+    idempotencyKey?: string;
 }) {
     // Normalize date format to DD-MM-YYYY
     const normalizedDate = normalizeDateFormat(data.date);
@@ -40,16 +41,21 @@ export async function saveReservation(data: {
     console.log("Saving reservation:", { ...data, date: normalizedDate, time: normalizedTime });
 
     try {
-        // Create reservation directly (no duplicate checking)
-        const reservation = await prisma.reservation.create({
-            data: {
-                name: data.name,
-                phone: data.phone,
-                date: normalizedDate,
-                time: normalizedTime,
-                people: String(data.people),
-            },
-        });
+        const fields = {
+            name: data.name,
+            phone: data.phone,
+            date: normalizedDate,
+            time: normalizedTime,
+            people: String(data.people),
+        };
+        // With an idempotency key (from the voice backend) a retry returns the stored row
+        const reservation = data.idempotencyKey
+            ? await prisma.reservation.upsert({
+                where: { idempotencyKey: data.idempotencyKey },
+                update: {},
+                create: { ...fields, idempotencyKey: data.idempotencyKey },
+            })
+            : await prisma.reservation.create({ data: fields });
         return { success: true, id: reservation.id };
     } catch (error) {
         console.error("Database Error:", error);
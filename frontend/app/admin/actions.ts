@@ -77,6 +77,8 @@ export async function updateConfig(prevState: any, formData: FormData) {
             });
         }
 
+        await invalidateBackendConfig();
+
         revalidatePath('/admin/settings');
         return { success: true, message: 'Configuration Updated' };
     } catch (error) {
@@ -84,6 +86,25 @@ export async function updateConfig(prevState: any, formData: FormData) {
     }
 }
 
+// Tell the voice backend to drop its cached SystemConfig snapshot.
+// Best effort: the backend re-checks the table on its own TTL anyway.
+async function invalidateBackendConfig() {
+    const backendUrl = process.env.BACKEND_URL || 'http://localhost:8000';
+    try {
+        const response = await fetch(`${backendUrl}/config/invalidate`, {
+            method: 'POST',
+            cache: 'no-store',
+            // Shared with the backend's CONFIG_INVALIDATE_SECRET
+            headers: { 'X-Config-Secret': process.env.CONFIG_INVALIDATE_SECRET || '' },
+        });
+        if (!response.ok) {
+            console.warn(`Backend config invalidation rejected: ${response.status}`);
+        }
+    } catch (error) {
+        console.warn('Backend config invalidation failed:', error);
+    }
+}
+
 export async function getConfig() {
     // Check auth
     if (!(await cookies()).get('admin_session')) return null;
@@ -20,6 +20,7 @@ export default function VoiceAgent() {
         reviewData,
         saveError,
         saveSuccess,
+        interimTranscript,
         resetReservationStatus
     } = useVoiceAssistant();
 
@@ -222,6 +223,9 @@ export default function VoiceAgent() {
                                     </>
                                 )}
                             </div>
+                            {interimTranscript && agentState !== 'speaking' && (
+                                <p className="mt-1 text-xs text-muted-foreground italic">{interimTranscript}</p>
+                            )}
                             <div
                                 className="absolute -bottom-2 right-6 w-4 h-4 bg-card border-b border-r border-border"
                                 style={{ clipPath: 'polygon(0 0, 100% 0, 50% 100%)' }}
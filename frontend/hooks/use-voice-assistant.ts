@@ -1,5 +1,12 @@
 import { useState, useRef, useEffect, useCallback } from 'react';
 import { Message, ConnectionStatus, AgentState } from '@/types';
+import { PROTOCOL_VERSION, packFrame, preferredOutputCodec, unpackClip } from '@/utils/audio-frames';
+
+// Upload speech while it is recorded (streaming recognition with interim text);
+// NEXT_PUBLIC_STREAMING_STT=false sends one recording per utterance instead
+const STREAMING_STT = process.env.NEXT_PUBLIC_STREAMING_STT !== 'false';
+// MediaRecorder timeslice in streaming mode (ms)
+const STREAM_CHUNK_MS = 250;
 
 export function useVoiceAssistant() {
     const [messages, setMessages] = useState<Message[]>([]);
@@ -9,11 +16,22 @@ export function useVoiceAssistant() {
     const [reviewData, setReviewData] = useState<any | null>(null);
     const [saveError, setSaveError] = useState<string | null>(null);
     const [saveSuccess, setSaveSuccess] = useState<boolean>(false);
+    // What the recognizer has heard so far of the utterance being streamed
+    const [interimTranscript, setInterimTranscript] = useState<string>('');
 
     // Use ref alongside state for stable access in callbacks
     const reviewDataRef = useRef<any | null>(null);
+    // Confirmed booking the backend is still writing, and the last key it reported saved
+    const pendingSaveRef = useRef<{ payload: any; idempotencyKey: string } | null>(null);
+    const savedKeyRef = useRef<string | null>(null);
 
     const websocketRef = useRef<WebSocket | null>(null);
+    // Resume token for the current call; reconnecting with it continues the conversation
+    const resumeTokenRef = useRef<string | null>(null);
+    // Binary framing agreed in the `session` message (1 = whole audio files, no header)
+    const protocolRef = useRef<number>(1);
+    const uploadStreamRef = useRef<number>(0);
+    const uploadSeqRef = useRef<number>(0);
     const mediaRecorderRef = useRef<MediaRecorder | null>(null);
     const audioChunksRef = useRef<Blob[]>([]);
 
@@ -33,6 +51,8 @@ export function useVoiceAssistant() {
 
     // We need a stable reference to startRecording to call it from audio.onended
     const startRecordingRef = useRef<() => void>(() => { });
+    // Stable reference to connect for retrying after a `busy` rejection
+    const connectRef = useRef<() => void>(() => { });
 
     const stopPlaying = useCallback(() => {
         if (currentAudioRef.current) {
@@ -61,6 +81,7 @@ export function useVoiceAssistant() {
     }, []);
 
     const disconnect = useCallback(() => {
+        resumeTokenRef.current = null; // Deliberate hang-up: next connect starts a new call
         if (websocketRef.current) {
             websocketRef.current.close();
             websocketRef.current = null;
@@ -112,8 +133,8 @@ export function useVoiceAssistant() {
         setAgentState('speaking');
 
         const audioBlob = audioQueueRef.current.shift()!;
-        // Ensure correct MIME type for MP3 audio from backend
-        const typedBlob = new Blob([audioBlob], { type: 'audio/mpeg' });
+        // Framed clips carry their codec's MIME type; plain ones are MP3
+        const typedBlob = new Blob([audioBlob], { type: audioBlob.type || 'audio/mpeg' });
         const audioUrl = URL.createObjectURL(typedBlob);
         console.log('Playing audio, blob size:', typedBlob.size, 'url:', audioUrl);
         const audio = new Audio(audioUrl);
@@ -235,23 +256,93 @@ export function useVoiceAssistant() {
         // For localhost, use port 8000 (backend dev server)
         // For production, use the same host (assumes backend is proxied or on same domain)
         const wsHost = isLocalhost ? 'localhost:8000' : window.location.host;
-        const wsUrl = `${wsProtocol}//${wsHost}/ws`;
+        // Ask for framed, chunked audio; a server that does not know it answers with protocol 1
+        const params = new URLSearchParams({ protocol: String(PROTOCOL_VERSION), codec: preferredOutputCodec() });
+        if (resumeTokenRef.current) {
+            params.set('resume', resumeTokenRef.current);
+        }
+        const wsUrl = `${wsProtocol}//${wsHost}/ws?${params}`;
         
         console.log('Connecting to WebSocket:', wsUrl);
         const ws = new WebSocket(wsUrl);
+        ws.binaryType = 'arraybuffer';
+        protocolRef.current = 1;
 
         ws.onopen = () => {
             setStatus('connected');
             console.log('WS Connected to:', wsUrl);
         };
 
+        const showSaved = (id: number) => {
+            setSaveSuccess(true);
+            setSaveError(null);
+            setMessages(prev => [...prev, { role: 'ai', content: `[System]: Reservation Saved (ID: ${id})` }]);
+            // Clear review data after processing
+            setReviewData(null);
+            reviewDataRef.current = null;
+        };
+
+        const saveInBrowser = async (payload: any, idempotencyKey: string) => {
+            if (!payload) {
+                console.error("No payload for reservation confirmation");
+                setMessages(prev => [...prev, { role: 'ai', content: '[System]: Error - No data to save' }]);
+                return;
+            }
+            const { saveReservation } = await import('@/app/actions');
+            try {
+                console.log('Saving reservation with payload:', payload);
+                const result = await saveReservation({ ...payload, idempotencyKey });
+                if (result.success) {
+                    console.log('Reservation saved successfully:', result.id);
+                    showSaved(result.id);
+                    return;
+                }
+                console.error('Save failed:', result.error);
+                setSaveError(result.error || 'Failed to save reservation');
+                setSaveSuccess(false);
+                setMessages(prev => [...prev, { role: 'ai', content: `[System]: Error - ${result.error}` }]);
+            } catch (err) {
+                console.error("Action Error", err);
+                setSaveError('Failed to save reservation');
+                setSaveSuccess(false);
+                setMessages(prev => [...prev, { role: 'ai', content: '[System]: Failed to save reservation' }]);
+            }
+            setReviewData(null);
+            reviewDataRef.current = null;
+        };
+
         ws.onmessage = async (event) => {
             console.log('WS Message received, type:', typeof event.data, 'isBlob:', event.data instanceof Blob);
             if (typeof event.data === 'string') {
                 const data = JSON.parse(event.data);
                 console.log('JSON message:', data.type);
-                if (data.type === 'text') {
+                if (data.type === 'session') {
+                    resumeTokenRef.current = data.resume_token;
+                    protocolRef.current = data.protocol || 1;
+                } else if (data.type === 'text') {
+                    setInterimTranscript(''); // Replaced by the final transcript, or the utterance was not understood
                     setMessages(prev => [...prev, { role: data.role, content: data.content }]);
+                } else if (data.type === 'partial_transcript') {
+                    setInterimTranscript(data.content);
+                } else if (data.type === 'busy') {
+                    // Server is at capacity; it closes the socket after this
+                    const retryAfter = data.retry_after || 5;
+                    setMessages(prev => [...prev, { role: 'ai', content: `[System]: All lines are busy. Retrying in ${Math.round(retryAfter)} seconds...` }]);
+                    setTimeout(() => {
+                        if (!websocketRef.current || websocketRef.current.readyState === WebSocket.CLOSED) {
+                            connectRef.current();
+                        }
+                    }, retryAfter * 1000);
+                } else if (data.type === 'stop_audio') {
+                    // Caller interrupted: drop the rest of the previous reply
+                    stopPlaying();
+                } else if (data.type === 'no_speech') {
+                    // Server heard only silence/noise: listen again without a turn
+                    if (shouldAutoRestartRef.current) {
+                        startRecordingRef.current();
+                    } else {
+                        setAgentState('idle');
+                    }
                 } else if (data.type === 'review_details') {
                     // Show Review Card - update both state and ref
                     setReviewData(data.data);
@@ -259,6 +350,7 @@ export function useVoiceAssistant() {
                 } else if (data.type === 'end_session') {
                     // Server signals conversation is complete - stop auto-restart loop
                     console.log('Session ended by server');
+                    resumeTokenRef.current = null;
                     shouldAutoRestartRef.current = false;
                     shouldDisconnectAfterPromptRef.current = true;
                 } else if (data.type === 'reservation_confirmed') {
@@ -268,40 +360,39 @@ export function useVoiceAssistant() {
                     // Prefer server-sent data, fallback to ref (not state due to closure issues)
                     const payload = data.data || reviewDataRef.current;
 
-                    if (payload) {
-                        const { saveReservation } = await import('@/app/actions');
-                        try {
-                            console.log('Saving reservation with payload:', payload);
-                            const result = await saveReservation(payload);
-                            if (result.success) {
-                                console.log('Reservation saved successfully:', result.id);
-                                setSaveSuccess(true);
-                                setSaveError(null);
-                                setMessages(prev => [...prev, { role: 'ai', content: `[System]: Reservation Saved (ID: ${result.id})` }]);
-                            } else {
-                                console.error('Save failed:', result.error);
-                                setSaveError(result.error || 'Failed to save reservation');
-                                setSaveSuccess(false);
-                                setMessages(prev => [...prev, { role: 'ai', content: `[System]: Error - ${result.error}` }]);
-                            }
-                        } catch (err) {
-                            console.error("Action Error", err);
-                            setSaveError('Failed to save reservation');
-                            setSaveSuccess(false);
-                            setMessages(prev => [...prev, { role: 'ai', content: '[System]: Failed to save reservation' }]);
-                        }
-                        // Clear review data after processing
-                        setReviewData(null);
-                        reviewDataRef.current = null;
+                    if (savedKeyRef.current === data.idempotency_key) {
+                        // reservation_saved overtook this message; nothing left to do
+                    } else if (data.saving && payload) {
+                        // The backend is writing it; reservation_saved follows with the id
+                        pendingSaveRef.current = { payload, idempotencyKey: data.idempotency_key };
+                    } else if (payload) {
+                        await saveInBrowser(payload, data.idempotency_key);
                     } else {
                         console.error("No payload for reservation confirmation");
                         setMessages(prev => [...prev, { role: 'ai', content: '[System]: Error - No data to save' }]);
                     }
+                } else if (data.type === 'reservation_saved') {
+                    pendingSaveRef.current = null;
+                    savedKeyRef.current = data.idempotency_key;
+                    if (data.booking_id) {
+                        // Already stored by the backend
+                        console.log('Reservation saved by backend:', data.booking_id);
+                        showSaved(data.booking_id);
+                    } else {
+                        // Backend write failed: store it from here under the same key
+                        await saveInBrowser(data.data || reviewDataRef.current, data.idempotency_key);
+                    }
                 }
-            } else if (event.data instanceof Blob) {
+            } else if (event.data instanceof ArrayBuffer) {
                 // Queue audio instead of playing immediately
-                console.log('Audio blob received, size:', event.data.size, 'type:', event.data.type);
-                queueAudio(event.data);
+                console.log('Audio received, size:', event.data.byteLength);
+                if (protocolRef.current >= PROTOCOL_VERSION) {
+                    // Framed: one message per clip, typed by its codec
+                    const clip = unpackClip(event.data);
+                    if (clip) queueAudio(clip);
+                } else {
+                    queueAudio(new Blob([event.data], { type: 'audio/mpeg' }));
+                }
             } else {
                 console.warn('Unknown message type:', typeof event.data, event.data);
             }
@@ -310,6 +401,12 @@ export function useVoiceAssistant() {
         ws.onclose = () => {
             setStatus('disconnected');
             console.log('WS Disconnected');
+            const pending = pendingSaveRef.current;
+            if (pending) {
+                // Hung up before reservation_saved arrived; the upsert is idempotent
+                pendingSaveRef.current = null;
+                saveInBrowser(pending.payload, pending.idempotencyKey);
+            }
         };
 
         ws.onerror = (e) => {
@@ -318,7 +415,7 @@ export function useVoiceAssistant() {
         };
 
         websocketRef.current = ws;
-    }, [queueAudio]);
+    }, [queueAudio, stopPlaying]);
 
     const startRecording = useCallback(async () => {
         try {
@@ -329,6 +426,26 @@ export function useVoiceAssistant() {
             mediaRecorderRef.current = mediaRecorder;
             audioChunksRef.current = [];
             isRecordingRef.current = true;
+            setInterimTranscript('');
+
+            // Streaming: chunks go out as they are recorded, between stream_start and stream_end
+            const ws = websocketRef.current;
+            const streaming = STREAMING_STT && ws?.readyState === WebSocket.OPEN;
+            if (streaming) {
+                uploadStreamRef.current = (uploadStreamRef.current + 1) & 0xffff;
+                uploadSeqRef.current = 0;
+                ws!.send(JSON.stringify({ type: 'stream_start' }));
+            }
+            const sendChunk = (chunk: Blob) => {
+                const socket = websocketRef.current;
+                if (socket?.readyState !== WebSocket.OPEN) return;
+                if (protocolRef.current >= PROTOCOL_VERSION) {
+                    const header = packFrame('webm_opus', uploadStreamRef.current, uploadSeqRef.current++, false);
+                    socket.send(new Blob([header, chunk]));
+                } else {
+                    socket.send(chunk);
+                }
+            };
 
             // Max Recording Timeout (Safety valve)
             const MAX_DURATION = 15000; // 15 seconds for longer inputs like phone numbers
@@ -386,16 +503,39 @@ export function useVoiceAssistant() {
 
             mediaRecorder.ondataavailable = (event) => {
                 if (event.data.size > 0) {
-                    audioChunksRef.current.push(event.data);
+                    if (streaming) {
+                        sendChunk(event.data);
+                    } else {
+                        audioChunksRef.current.push(event.data);
+                    }
                 }
             };
 
             mediaRecorder.onstop = () => {
                 clearTimeout(maxTimeout); // Clear safety timeout
+                if (streaming) {
+                    // The last chunk was sent by ondataavailable; the server closes the utterance
+                    if (websocketRef.current?.readyState === WebSocket.OPEN) {
+                        websocketRef.current.send(JSON.stringify({ type: 'stream_end' }));
+                        setAgentState('thinking');
+                    }
+                    stream.getTracks().forEach(track => track.stop());
+                    if (audioContext.state !== 'closed') {
+                        audioContext.close();
+                    }
+                    return;
+                }
                 const audioBlob = new Blob(audioChunksRef.current, { type: 'audio/webm' });
                 // Only send if we have data and socket is open
                 if (websocketRef.current && websocketRef.current.readyState === WebSocket.OPEN && audioBlob.size > 0) {
-                    websocketRef.current.send(audioBlob);
+                    if (protocolRef.current >= PROTOCOL_VERSION) {
+                        // One frame per recording: a new stream id, marked final
+                        uploadStreamRef.current = (uploadStreamRef.current + 1) & 0xffff;
+                        const header = packFrame('webm_opus', uploadStreamRef.current, 0, true);
+                        websocketRef.current.send(new Blob([header, audioBlob]));
+                    } else {
+                        websocketRef.current.send(audioBlob);
+                    }
                     setAgentState('thinking');
                 }
 
@@ -406,7 +546,7 @@ export function useVoiceAssistant() {
                 }
             };
 
-            mediaRecorder.start();
+            mediaRecorder.start(streaming ? STREAM_CHUNK_MS : undefined);
             setAgentState('listening');
             setPermissionError(null);
         } catch (err: any) {
@@ -455,6 +595,10 @@ export function useVoiceAssistant() {
         startRecordingRef.current = startRecording;
     }, [startRecording]);
 
+    useEffect(() => {
+        connectRef.current = connect;
+    }, [connect]);
+
     const resetReservationStatus = useCallback(() => {
         setSaveSuccess(false);
         setSaveError(null);
@@ -468,6 +612,7 @@ export function useVoiceAssistant() {
         reviewData,
         saveError,
         saveSuccess,
+        interimTranscript,
         connect,
         disconnect,
         startRecording,
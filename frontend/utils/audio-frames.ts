@@ -0,0 +1,43 @@
+/**
+ * Client side of the /ws binary frame protocol (see backend/services/framing.py).
+ *
+ * Every binary message starts with a 10-byte big-endian header:
+ *   version u8 | codec u8 | flags u8 | reserved u8 | stream id u16 | sequence u32
+ * One stream is one clip; its last chunk carries FLAG_FINAL. Uploads may be
+ * chunked; the server sends each synthesized clip as one final frame, since
+ * an <audio> element can only play a complete file.
+ */
+export const PROTOCOL_VERSION = 2;
+const HEADER_BYTES = 10;
+const FLAG_FINAL = 0x01;
+
+export type AudioCodec = 'mp3' | 'ogg_opus' | 'webm_opus';
+
+const CODEC_IDS: Record<AudioCodec, number> = { mp3: 1, ogg_opus: 2, webm_opus: 3 };
+const CODEC_MIME: Record<number, string> = { 1: 'audio/mpeg', 2: 'audio/ogg; codecs=opus', 3: 'audio/webm' };
+
+/** Opus when the browser can play it (smaller payloads), MP3 otherwise. */
+export function preferredOutputCodec(): AudioCodec {
+    if (typeof Audio === 'undefined') return 'mp3';
+    return new Audio().canPlayType('audio/ogg; codecs=opus') ? 'ogg_opus' : 'mp3';
+}
+
+export function packFrame(codec: AudioCodec, streamId: number, seq: number, final: boolean): ArrayBuffer {
+    const header = new ArrayBuffer(HEADER_BYTES);
+    const view = new DataView(header);
+    view.setUint8(0, PROTOCOL_VERSION);
+    view.setUint8(1, CODEC_IDS[codec]);
+    view.setUint8(2, final ? FLAG_FINAL : 0);
+    view.setUint16(4, streamId & 0xffff);
+    view.setUint32(6, seq);
+    return header;
+}
+
+/** The clip in a server frame, typed by its codec; null if it is not a version 2 frame. */
+export function unpackClip(data: ArrayBuffer): Blob | null {
+    if (data.byteLength < HEADER_BYTES) return null;
+    const view = new DataView(data);
+    if (view.getUint8(0) !== PROTOCOL_VERSION) return null;
+    const codec = view.getUint8(1);
+    return new Blob([data.slice(HEADER_BYTES)], { type: CODEC_MIME[codec] || 'audio/mpeg' });
+}